@@ -0,0 +1,383 @@
+# analog_historian.py
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from tag_registry import TAGS
+import scada_db as db
+
+DEFAULT_PERIOD = 1.0
+BLOCK_POINTS = 1024
+FLUSH_INTERVAL = 60.0
+
+
+class SwingingDoor:
+    """
+    Deadband and swinging-door compression of one signal. add(t, value) takes every sample and
+    returns the points it archives, oldest first. Samples within `deadband` of the last one
+    passed on are dropped; of the rest, a point is only archived when the samples since the
+    previous archived point no longer fit in a corridor of +-`deviation` around a straight
+    line. Rebuilt by linear interpolation between archived points, the signal stays within
+    deadband + deviation of every sample. A point is archived at least every `max_interval` seconds.
+    """
+
+    def __init__(self, deadband: float = 0, deviation: float = 0, max_interval: float = 3600.0):
+        self.deadband = deadband
+        self.deviation = deviation
+        self.max_interval = max_interval
+        self.anchor = None
+        self.held = None
+        self.passed = None
+        self.snapshot = None
+        self.upper = self.lower = 0.0
+
+    def add(self, t: float, value):
+        point = (t, value)
+        previous, self.snapshot = self.snapshot, point
+        passed = self.passed
+        if passed is not None and abs(value - passed[1]) <= self.deadband and t - passed[0] < self.max_interval:
+            return []
+        archived = []
+        # The last sample before a change ends the flat stretch the deadband dropped.
+        if previous is not None and previous is not passed:
+            self._door(previous, archived)
+        self.passed = point
+        self._door(point, archived)
+        return archived
+
+    def _door(self, point, archived):
+        t, value = point
+        if self.anchor is None:
+            self.anchor = point
+            archived.append(point)
+            return
+        t0, v0 = self.anchor
+        if t <= t0:
+            return
+        upper = (value + self.deviation - v0) / (t - t0)
+        lower = (value - self.deviation - v0) / (t - t0)
+        if self.held is not None:
+            # The line from the anchor to this point must pass within the deviation of every point
+            # since the anchor, i.e. its slope must lie in the corridor they left open. That bounds the
+            # error by the deviation, where the classic door test (corridor not yet empty) allows twice it.
+            slope = (value - v0) / (t - t0)
+            if not self.lower <= slope <= self.upper or t - t0 > self.max_interval:
+                # The door opened: the last point that still fitted becomes the new anchor.
+                archived.append(self.held)
+                self.anchor = self.held
+                t0, v0 = self.held
+                upper = (value + self.deviation - v0) / (t - t0)
+                lower = (value - self.deviation - v0) / (t - t0)
+            else:
+                upper, lower = min(upper, self.upper), max(lower, self.lower)
+        self.upper, self.lower = upper, lower
+        self.held = point
+
+    def tail(self):
+        """The points after the last archived one that rebuild the signal up to the latest sample."""
+        points = [point for point in (self.held, self.snapshot) if point is not None and point is not self.anchor]
+        return points[:1] if len(points) == 2 and points[0] is points[1] else points
+
+    def close(self):
+        """Archives the tail, so the signal is complete up to the latest sample, and returns it."""
+        archived = self.tail()
+        if archived:
+            self.anchor = self.passed = archived[-1]
+            self.held = None
+        return archived
+
+
+def encode_block(points):
+    """
+    (start_time, end_time, count, times, vals) of a block of points. Times are stored as
+    millisecond steps and values as differences, each column zlib compressed on its own.
+    """
+    start = points[0][0]
+    offsets = [round((t - start) * 1000) for t, _ in points]
+    steps = array('q', (b - a for a, b in zip([0] + offsets, offsets)))
+    values = [int(value) for _, value in points]
+    deltas = array('i', (b - a for a, b in zip([0] + values, values)))
+    return start, points[-1][0], len(points), zlib.compress(steps.tobytes(), 9), zlib.compress(deltas.tobytes(), 9)
+
+
+def decode_block(start: float, count: int, times: bytes, vals: bytes):
+    """The points of a block stored by encode_block."""
+    steps, deltas = array('q'), array('i')
+    steps.frombytes(zlib.decompress(times))
+    deltas.frombytes(zlib.decompress(vals))
+    points, offset, value = [], 0, 0
+    for step, delta in zip(steps, deltas):
+        offset += step
+        value += delta
+        points.append((start + offset / 1000, value))
+    return points[:count]
+
+
+class AnalogHistorian:
+    """
+    Long-term history of the analog tags that have a `compression` in the registry, in raw units.
+    record(state) samples them at most every `period` seconds (call it on every poll cycle) and
+    feeds each one through its SwingingDoor. Archived points collect in an open block per tag,
+    which is handed to the writer every `flush_interval` seconds, replacing its previous
+    version, and closed at `block_points` points. A writer thread started by start() encodes
+    the blocks handed to it and stores them in AnalogHistory, so record() never waits for the
+    disk; blocks that fail to store are retried every flush_interval. Reads combine the stored
+    blocks, those not written yet, the open ones and the uncompressed tail, so they are current
+    to the latest sample. trend_report() serves the DB page; samples recorded after close()
+    has begun are ignored.
+    """
+
+    def __init__(self, tags=None, period: float = DEFAULT_PERIOD, block_points: int = BLOCK_POINTS,
+                 flush_interval: float = FLUSH_INTERVAL, clock=time.time):
+        tags = tags if tags is not None else [tag for tag in TAGS if tag.compression is not None]
+        self.tags = {tag.name: tag for tag in tags}
+        self.doors = {tag.name: SwingingDoor(*tag.compression) for tag in tags}
+        self.blocks = {name: [] for name in self.doors}
+        self.period = period
+        self.block_points = block_points
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.samples = 0
+        self._last_sample = None
+        self._last_flush = clock()
+        self._dirty = set()
+        # {(tag, block start): points} handed to the writer and not stored yet.
+        self._unwritten = {}
+        # Guards the doors, the open blocks and _unwritten between the poller, the writer and readers.
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = None
+
+    def start(self):
+        """Starts the writer thread; returns the historian for chaining."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="analog-historian", daemon=True)
+            self._writer.start()
+        return self
+
+    def record(self, state, changes=None):
+        """Samples every historized tag of a connected PLC, unless the last sample is less than `period` old."""
+        now = self.clock()
+        if not state.plc_connected or (self._last_sample is not None and now - self._last_sample < self.period):
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._last_sample = now
+            self.samples += 1
+            for name, door in self.doors.items():
+                archived = door.add(now, getattr(state, name))
+                if archived:
+                    self._archive(name, archived)
+            if now - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def _archive(self, name, points):
+        block = self.blocks[name]
+        block.extend(points)
+        self._dirty.add(name)
+        if len(block) >= self.block_points:
+            self._hand_over(name, block)
+            self.blocks[name] = []
+            self._dirty.discard(name)
+
+    def _hand_over(self, name, block):
+        """Queues a copy of a block for the writer, replacing a queued older version of it."""
+        with self._lock:
+            self._unwritten[(name, block[0][0])] = list(block)
+        self._wake.set()
+
+    def flush(self):
+        """Hands the open block of every tag that archived points since the last flush to the writer."""
+        with self._lock:
+            self._last_flush = self.clock()
+            for name in self._dirty:
+                if self.blocks[name]:
+                    self._hand_over(name, self.blocks[name])
+            self._dirty = set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write_unwritten()
+        self._write_unwritten()
+
+    def _write_unwritten(self):
+        """Encodes and stores every queued block in one transaction."""
+        with self._lock:
+            unwritten = list(self._unwritten.items())
+        if not unwritten:
+            return
+        blocks = [(name,) + encode_block(points) for (name, _), points in unwritten]
+        if db.write_analog_blocks(blocks):
+            with self._lock:
+                for key, points in unwritten:
+                    # A newer version queued meanwhile stays for the next write.
+                    if self._unwritten.get(key) is points:
+                        del self._unwritten[key]
+
+    def close(self, timeout: float = 10.0):
+        """
+        Stops recording, archives the tail of every tag, then stops the writer after it has
+        stored every block. If it is still busy after `timeout` seconds, it finishes on its own.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for name, door in self.doors.items():
+                archived = door.close()
+                if archived:
+                    self._archive(name, archived)
+            self.flush()
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join(timeout)
+        if self._writer is None or not self._writer.is_alive():
+            self._write_unwritten()
+
+    def points(self, tag: str, since: float, until: float):
+        """
+        The archived points of a tag between since and until (epoch seconds), with the last one
+        before since and the first one after until, so the signal can be rebuilt over the whole range.
+        """
+        with self._lock:
+            blocks = {start: points for (name, start), points in self._unwritten.items() if name == tag}
+            open_block = list(self.blocks[tag])
+            tail = self.doors[tag].tail()
+        if open_block:
+            blocks[open_block[0][0]] = open_block
+        for start, count, times, vals in db.read_analog_blocks(tag, since, until):
+            if start not in blocks:
+                blocks[start] = decode_block(start, count, times, vals)
+        points = [point for start in sorted(blocks) for point in blocks[start]]
+        points.extend(tail)
+        times = [t for t, _ in points]
+        lo = max(bisect_right(times, since) - 1, 0)
+        hi = bisect_left(times, until) + 1
+        return points[lo:hi]
+
+    def value_at(self, tag: str, t: float):
+        """The interpolated value of a tag at time t, or None outside its recorded history."""
+        points = self.points(tag, t, t)
+        return _interpolate(points, [p[0] for p in points], t)
+
+    def trend(self, tag: str, since: float, until: float, buckets: int = 300):
+        """
+        The tag between since and until downsampled to at most `buckets` (start, min, max, mean)
+        rows, from the signal rebuilt by linear interpolation; mean is time-weighted. Buckets
+        outside the recorded history are left out.
+        """
+        points = self.points(tag, since, until)
+        if not points:
+            return []
+        times = [t for t, _ in points]
+        values = [value for _, value in points]
+        width = (until - since) / buckets
+        rows = []
+        for bucket in range(buckets):
+            start = since + bucket * width
+            lo, hi = max(start, times[0]), min(start + width, times[-1])
+            if lo > hi:
+                continue
+            first, last = bisect_right(times, lo), bisect_left(times, hi)
+            xs = [lo] + times[first:last] + [hi]
+            ys = [_interpolate(points, times, lo)] + values[first:last] + [_interpolate(points, times, hi)]
+            if hi > lo:
+                area = sum((xs[i + 1] - xs[i]) * (ys[i] + ys[i + 1]) for i in range(len(xs) - 1)) / 2
+                mean = area / (hi - lo)
+            else:
+                mean = ys[0]
+            rows.append((start, min(ys), max(ys), mean))
+        return rows
+
+    def trend_report(self, hours: float = 24.0, buckets: int = 24):
+        """
+        The trend of every historized tag over the last `hours`, `buckets` rows per tag in display
+        units, as the (columns, rows, error) triple of the scada_db query helpers.
+        """
+        until = self.clock()
+        rows = []
+        for name, tag in self.tags.items():
+            for start, low, high, mean in self.trend(name, until - hours * 3600, until, buckets):
+                rows.append((name, time.strftime('%Y-%m-%d %H:%M', time.localtime(start)),
+                             round(tag.scaled(low), 2), round(tag.scaled(high), 2), round(tag.scaled(mean), 2)))
+        return ['tag', 'from', 'min', 'max', 'mean'], rows, None
+
+
+def _interpolate(points, times, t):
+    """The value of the polyline through points at time t, or None outside it."""
+    if not points or t < times[0] or t > times[-1]:
+        return None
+    index = bisect_left(times, t)
+    t1, v1 = points[index]
+    if t1 == t or index == 0:
+        return v1
+    t0, v0 = points[index - 1]
+    return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+
+
+def benchmark(days: float = 2.0, period: float = 1.0):
+    """
+    Records `days` of 1-second samples of simulated tags, then reports the stored size, the
+    size projected to a year, the worst reconstruction error and the time of a trend query.
+    """
+    import math
+    import os
+    import random
+    import tempfile
+    from app_state import AppState
+
+    rng = random.Random(1)
+    previous_db = db.DB_NAME
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    db.DB_NAME = scratch.name
+    clock = [1.7e9]
+    samples = {}
+    try:
+        db.create_tables()
+        historian = AnalogHistorian(clock=lambda: clock[0]).start()
+        state = AppState()
+        state.plc_connected = True
+        spots = 20
+        for second in range(int(days * 86400 / period)):
+            clock[0] += period
+            day = clock[0] % 86400 / 86400
+            # Office temperature: a daily swing of +-3 C with +-0.1 C sensor noise.
+            state.o3_temp = round(720 + 30 * math.sin(2 * math.pi * day) + rng.choice((-1, 0, 0, 1)))
+            state.measured_light = max(0, round(80 * math.sin(math.pi * (day - 0.25) * 2)) + rng.choice((0, 0, 1)))
+            if rng.random() < 0.002:
+                spots = min(40, max(0, spots + rng.choice((-1, 1))))
+            state.p_spots_taken, state.p_spots_total = spots, 40
+            historian.record(state)
+            for name in historian.doors:
+                samples.setdefault(name, []).append((clock[0], getattr(state, name)))
+        historian.close()
+        stored = dict(db.connect_db().execute(
+            "SELECT tag, SUM(LENGTH(times) + LENGTH(vals) + 40) FROM AnalogHistory GROUP BY tag").fetchall())
+        since, until = samples['o3_temp'][0][0], samples['o3_temp'][-1][0]
+        for name, series in samples.items():
+            points = historian.points(name, since, until)
+            times = [t for t, _ in points]
+            error = max(abs(_interpolate(points, times, t) - value) for t, value in series)
+            print(f"{name:<15} {len(series)} samples -> {len(points)} points, {stored.get(name, 0) / 1024:.1f} KiB, "
+                  f"{stored.get(name, 0) * 365 / days / 2 ** 20:.2f} MiB per year, max error {error} raw")
+        runs = 20
+        started = time.perf_counter()
+        for _ in range(runs):
+            rows = historian.trend('o3_temp', since, until, 500)
+        elapsed = (time.perf_counter() - started) / runs
+        file_size = os.path.getsize(scratch.name)
+    finally:
+        db.DB_NAME = previous_db
+        db.remove_database(scratch.name)
+    print(f"trend of o3_temp over {days:g} days in {len(rows)} buckets: {elapsed * 1000:.1f} ms; "
+          f"database file {file_size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    benchmark()
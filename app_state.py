@@ -1,152 +1,188 @@
 # app_state.py
+from array import array
+from tag_registry import TAGS
+
+# Boolean tags, packed eight to a byte in registry order. The value is the default.
+BOOL_TAGS = {tag.name: tag.default for tag in TAGS if tag.kind == 'bool'}
+# Integer tags, kept in a typed array.
+ANALOG_TAGS = {tag.name: tag.default for tag in TAGS if tag.kind == 'int'}
+# Language and configuration entered in the UI.
+SETTINGS = {
+    'lang': 'en',
+    'cfg_work_days': (False,) * 7,
+    'cfg_work_start': "0", 'cfg_work_end': "0", 'cfg_heat_off_days': False,
+    'cfg_cold_start': "0", 'cfg_cold_end': "0",
+    'cfg_work_temp': "0.0", 'cfg_work_temp_tol': "0.0", 'cfg_non_work_temp': "0.0", 'cfg_non_work_temp_tol': "0.0",
+    'cfg_park_spots': "0", 'cfg_max_park_spots': "0",
+    'cfg_light_thresh': "0", 'cfg_light_tol': "0",
+    'cfg_auto_lights_lobby': False, 'cfg_wdonly_lights_l': False, 'cfg_lobby_lights_mode': "dark",
+    'cfg_auto_lights_bldg': False, 'cfg_wdonly_lights_b': False, 'cfg_bldg_lights_mode': "dark",
+    'cfg_sim_io': False, 'cfg_test_fire': False, 'cfg_test_security': False,
+}
+
+
+def _pack(values):
+    bits = bytearray((len(values) + 7) // 8)
+    for index, value in enumerate(values):
+        if value:
+            bits[index >> 3] |= 1 << (index & 7)
+    return bytes(bits)
+
+
+_DEFAULT_BITS = _pack(list(BOOL_TAGS.values()))
+_DEFAULT_ANALOGS = array('i', ANALOG_TAGS.values())
+_BOOL_TAG_NAMES = list(BOOL_TAGS)
+_BIT_INDEX = {tag: index for index, tag in enumerate(BOOL_TAGS)}
+
+
+def bit_index(tag: str) -> int:
+    """Position of a boolean tag in AppState.bits and ChangeSet.bits."""
+    return _BIT_INDEX[tag]
+
+
+def bit_mask(tags) -> int:
+    """An integer with the bits of the given boolean tags set, to test against ChangeSet.bits."""
+    mask = 0
+    for tag in tags:
+        mask |= 1 << _BIT_INDEX[tag]
+    return mask
+
+
+def set_bits(bits: int):
+    """Yields the positions of the set bits of an integer, lowest first."""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class _Bit:
+    """Descriptor for a boolean tag stored as one bit of AppState.bits."""
+
+    __slots__ = ('byte', 'mask')
+
+    def __init__(self, index: int):
+        self.byte = index >> 3
+        self.mask = 1 << (index & 7)
+
+    def __get__(self, state, owner=None):
+        if state is None:
+            return self
+        return bool(state.bits[self.byte] & self.mask)
+
+    def __set__(self, state, value):
+        if value:
+            state.bits[self.byte] |= self.mask
+        else:
+            state.bits[self.byte] &= ~self.mask
+
+
+class _Analog:
+    """Descriptor for an integer tag stored in AppState.analogs."""
+
+    __slots__ = ('index',)
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __get__(self, state, owner=None):
+        if state is None:
+            return self
+        return state.analogs[self.index]
+
+    def __set__(self, state, value):
+        state.analogs[self.index] = int(value)
+
+
+class _Setting:
+    """Descriptor for a UI setting stored in AppState.settings."""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, state, owner=None):
+        if state is None:
+            return self
+        return state.settings[self.name]
+
+    def __set__(self, state, value):
+        state.settings[self.name] = value
+
 
 class AppState:
+    """
+    Everything the app knows about the building. Boolean tags live in the `bits` bitset,
+    integer tags in the `analogs` array and UI settings in the `settings` dict; every one of
+    them is still read and written as a plain attribute (state.l_smoke, state.o3_temp, ...).
+    Settings are replaced, never mutated in place, so snapshots can share their values.
+    """
+
+    __slots__ = ('bits', 'analogs', 'settings', 'ui_refs')
+
     def __init__(self):
-        self.lang = 'en'
+        self.bits = bytearray(_DEFAULT_BITS)
+        self.analogs = array('i', _DEFAULT_ANALOGS)
+        self.settings = dict(SETTINGS)
         self.ui_refs = {}
-        self.plc_connected = False
-        self.config_altered = False
-        self.l_mvmnt = False
-        self.l_smoke = False
-        self.l_light = False
-        self.l_door_open = False
-        self.l_rfid_ok = False
-        self.l_security = False
-        self.o1_smoke = False
-        self.o1_mvmnt = False
-        self.o1_door_open = False
-        self.o1_rfid_ok = False
-        self.o2_smoke = False
-        self.o2_mvmnt = False
-        self.o2_door_open = False
-        self.o2_rfid_ok = False
-        self.c1_smoke = False
-        self.c1_mvmnt = False
-        self.c1_light = False
-        self.o3_smoke = False
-        self.o3_mvmnt = False
-        self.o3_door_open = False
-        self.o3_rfid_ok = False
-        self.o3_heating = False
-        self.o3_cooling = False
-        self.o3_temp = 0
-        self.c2_smoke = False
-        self.c2_mvmnt = False
-        self.c2_light = False
-        self.p_spots_total = 0
-        self.p_spots_taken = 0
-        self.p_obj_det = False
-        self.p_gate_open = False
-        self.p_gate_closed = True
-        self.p_gate_close = False
-        self.p_inside_cycle = False
-        self.p_outside_cycle = False
-        self.p_full_bulb = False
-        self.force_lobby_door = False
-        self.force_park_open = False
-        self.force_park_close = False
-        self.warn_config_altered = False
-        self.warn_auto_security_impossible = False
-        self.warn_fire_det = False
-        self.warn_pgate_open = False
-        self.warn_pspot_miscount = False
-        self.err_light_config = False
-        self.err_pgate_force = False
-        self.err_pspot_config = False
-        self.err_temp_config = False
-        self.err_work_day_config = False
-        self.err_cold_month_config = False
-        self.call_security = False
-        self.call_fire_dept = False
-        self.fire_sprinklers_on = False
-        self.emergency = False
-        self.cfg_work_days = [False] * 7
-        self.cfg_work_start = "0"
-        self.cfg_work_end = "0"
-        self.cfg_heat_off_days = False
-        self.cfg_cold_start = "0"
-        self.cfg_cold_end = "0"
-        self.cfg_work_temp = "0.0"
-        self.cfg_work_temp_tol = "0.0"
-        self.cfg_non_work_temp = "0.0"
-        self.cfg_park_spots = "0"
-        self.cfg_max_park_spots = "0"
-        self.cfg_light_thresh = "0"
-        self.cfg_light_tol = "0"
-        self.cfg_auto_lights_lobby = False
-        self.cfg_wdonly_lights_l = False
-        self.cfg_lobby_lights_mode = "dark"
-        self.cfg_auto_lights_bldg = False
-        self.cfg_wdonly_lights_b = False
-        self.cfg_bldg_lights_mode = "dark"
-        self.cfg_sim_io = False
-        self.cfg_test_fire = False
-        self.cfg_test_security = False
-        self.measured_light = 0
 
     def get_snapshot(self):
-        """Creates a copy of the current state data."""
-        snapshot = AppState()
-        for attr, value in self.__dict__.items():
-            if attr != 'ui_refs':
-                if isinstance(value, list):
-                    setattr(snapshot, attr, value[:])
-                else:
-                    setattr(snapshot, attr, value)
+        """Creates a copy of the current state data: one copy each of the bitset, the analogs and the settings."""
+        snapshot = AppState.__new__(AppState)
+        snapshot.bits = bytearray(self.bits)
+        snapshot.analogs = array('i', self.analogs)
+        snapshot.settings = self.settings.copy()
+        snapshot.ui_refs = {}
         return snapshot
 
-    def reset_to_defaults(self):
-        """Resets dynamic values to their default state, typically on PLC disconnect."""
-        self.plc_connected = False
-        self.l_mvmnt = False
-        self.l_smoke = False
-        self.l_light = False
-        self.l_door_open = False
-        self.l_rfid_ok = False
-        self.l_security = False
-        self.o1_smoke = False
-        self.o1_mvmnt = False
-        self.o1_door_open = False
-        self.o1_rfid_ok = False
-        self.o2_smoke = False
-        self.o2_mvmnt = False
-        self.o2_door_open = False
-        self.o2_rfid_ok = False
-        self.c1_smoke = False
-        self.c1_mvmnt = False
-        self.c1_light = False
-        self.o3_smoke = False
-        self.o3_mvmnt = False
-        self.o3_door_open = False
-        self.o3_rfid_ok = False
-        self.o3_heating = False
-        self.o3_cooling = False
-        self.o3_temp = 0
-        self.c2_smoke = False
-        self.c2_mvmnt = False
-        self.c2_light = False
-        self.p_spots_total = int(self.cfg_park_spots) if self.cfg_park_spots.isdigit() else 0
-        self.p_spots_taken = 0
-        self.p_obj_det = False
-        self.p_gate_open = False
-        self.p_gate_closed = True
-        self.p_gate_close = False
-        self.p_inside_cycle = False
-        self.p_outside_cycle = False
-        self.p_full_bulb = False
-        self.measured_light = 0
-        self.warn_config_altered = False
-        self.warn_auto_security_impossible = False
-        self.warn_fire_det = False
-        self.warn_pgate_open = False
-        self.warn_pspot_miscount = False
-        self.err_light_config = False
-        self.err_pgate_force = False
-        self.err_pspot_config = False
-        self.err_temp_config = False
-        self.err_work_day_config = False
-        self.err_cold_month_config = False
-        self.call_security = False
-        self.call_fire_dept = False
-        self.fire_sprinklers_on = False
-        self.emergency = False
+    def changes_since(self, previous):
+        """Returns the ChangeSet from a previous snapshot to the current state."""
+        return ChangeSet(previous, self)
+
+
+class ChangeSet:
+    """
+    What changed between two states: `bits` is the XOR of their bitsets (bit i is set when the
+    i-th tag of BOOL_TAGS flipped) and `analogs` lists the integer tags whose value changed.
+    `previous` is the older state, for consumers that need the values before the change.
+    An empty change set is falsy, so idle cycles can be skipped with a single test.
+    """
+
+    __slots__ = ('previous', 'bits', 'analogs')
+
+    def __init__(self, previous, current):
+        self.previous = previous
+        self.bits = 0 if previous.bits == current.bits else (
+            int.from_bytes(previous.bits, 'little') ^ int.from_bytes(current.bits, 'little'))
+        self.analogs = [] if previous.analogs == current.analogs else [
+            tag for tag, old, new in zip(ANALOG_TAGS, previous.analogs, current.analogs) if old != new]
+
+    def __bool__(self):
+        return bool(self.bits or self.analogs)
+
+    def __contains__(self, tag):
+        index = _BIT_INDEX.get(tag)
+        if index is None:
+            return tag in self.analogs
+        return bool(self.bits >> index & 1)
+
+    def __or__(self, other):
+        """The changes of two consecutive change sets, relative to the older `previous`."""
+        merged = ChangeSet.__new__(ChangeSet)
+        merged.previous = self.previous
+        merged.bits = self.bits | other.bits
+        merged.analogs = self.analogs + [tag for tag in other.analogs if tag not in self.analogs]
+        return merged
+
+    def tags(self):
+        """Names of the changed tags: flipped boolean tags in BOOL_TAGS order, then changed analogs."""
+        return [_BOOL_TAG_NAMES[index] for index in set_bits(self.bits)] + self.analogs
+
+
+for _index, _tag in enumerate(BOOL_TAGS):
+    setattr(AppState, _tag, _Bit(_index))
+for _index, _tag in enumerate(ANALOG_TAGS):
+    setattr(AppState, _tag, _Analog(_index))
+for _tag in SETTINGS:
+    setattr(AppState, _tag, _Setting(_tag))
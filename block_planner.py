@@ -0,0 +1,62 @@
+MAX_READ_COILS = 2000
+MAX_READ_REGISTERS = 125
+
+# Cost of one extra Modbus transaction expressed in unused items read. A transaction costs a full
+# round trip plus ~100 bytes of TCP/IP and MBAP framing, while an unused coil costs 1/8 byte and an
+# unused register 2 bytes, so it pays to read across fairly wide gaps before splitting a block.
+COIL_TRANSACTION_COST = 800
+REGISTER_TRANSACTION_COST = 50
+
+
+class ReadPlan:
+    """The block reads chosen by plan_read_blocks and what they cost."""
+
+    def __init__(self, blocks, addresses, bits_per_item):
+        self.blocks = blocks
+        self.addresses = sorted(set(addresses))
+        self.bits_per_item = bits_per_item
+        self.transactions = len(blocks)
+        self.items_read = sum(count for _, count in blocks)
+        self.wasted_items = self.items_read - len(self.addresses)
+        self.wasted_bits = self.wasted_items * bits_per_item
+
+    def unread(self):
+        """Returns the addresses not covered by any block (always empty for a valid plan)."""
+        return [addr for addr in self.addresses
+                if not any(start <= addr < start + count for start, count in self.blocks)]
+
+    def report(self, kind):
+        """Returns a one-line summary of the plan, e.g. for the startup log."""
+        blocks = ", ".join(f"{start}+{count}" for start, count in self.blocks)
+        return (f"{kind}: {len(self.addresses)} addresses in {self.transactions} transaction(s) [{blocks}], "
+                f"{self.items_read} read, {self.wasted_items} unused ({self.wasted_bits} wasted bits)")
+
+
+def plan_read_blocks(addresses, max_count: int, transaction_cost: int, bits_per_item: int = 1) -> ReadPlan:
+    """
+    Computes the cheapest set of contiguous block reads covering every address.
+    A block costs transaction_cost plus one unit per item it spans and may not span more than
+    max_count items (the Modbus PDU limit). Sorted addresses are partitioned optimally with a
+    dynamic program, so gaps are bridged exactly when that is cheaper than another round trip.
+    """
+    addrs = sorted(set(addresses))
+    n = len(addrs)
+    best = [0] + [float('inf')] * n
+    cut = [0] * (n + 1)
+    for j in range(1, n + 1):
+        for i in range(j, 0, -1):
+            span = addrs[j - 1] - addrs[i - 1] + 1
+            if span > max_count:
+                break
+            cost = best[i - 1] + transaction_cost + span
+            if cost < best[j]:
+                best[j], cut[j] = cost, i
+
+    blocks = []
+    j = n
+    while j > 0:
+        i = cut[j]
+        blocks.append((addrs[i - 1], addrs[j - 1] - addrs[i - 1] + 1))
+        j = i - 1
+    blocks.reverse()
+    return ReadPlan(blocks, addrs, bits_per_item)
@@ -0,0 +1,89 @@
+# card_guard.py
+import time
+from collections import Counter
+import scada_db as db
+
+
+class UnknownCardGuard:
+    """
+    Per-reader rate limit on the badges that match no card. Every unknown badge is counted in
+    UnknownCards (see scada_db.unknown_card_record), but only `burst` of them, refilled at
+    `rate` per second, also get an 'unsuccessful_rfid_access' Log row, so a faulty reader or
+    a brute-force attempt cannot flood the Log. Memory is bounded by the number of readers.
+    """
+
+    def __init__(self, rate: float = 0.2, burst: int = 5, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.buckets = {}
+        self.attempts = Counter()
+        self.logged = Counter()
+
+    def allow(self, reader: str) -> bool:
+        """Takes a token from the reader's bucket; False when it is empty."""
+        now = self.clock()
+        tokens, updated = self.buckets.get(reader, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        self.buckets[reader] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+    def unknown_card_records(self, reader: str, card_number: str):
+        """The event records of an unknown badge at a reader (its location name)."""
+        self.attempts[reader] += 1
+        records = [db.unknown_card_record(reader, card_number)]
+        if self.allow(reader):
+            self.logged[reader] += 1
+            records.append(db.rfid_event_record(reader, None, False))
+        return records
+
+    def summary(self) -> str:
+        """One line per reader that saw unknown badges: attempts, logged and suppressed."""
+        return "\n".join(f"{reader}: {attempts} unknown badges, {self.logged[reader]} logged, "
+                         f"{attempts - self.logged[reader]} suppressed by the rate limit"
+                         for reader, attempts in self.attempts.most_common())
+
+
+def benchmark(badges: int = 2000):
+    """Compares the cost of a flood of random unknown badges, registered in Cards versus guarded."""
+    import random
+    import tempfile
+    from event_journal import EventJournal
+
+    rng = random.Random(1)
+    numbers = [f"{rng.randrange(10 ** 10):010d}" for _ in range(badges)]
+    previous_db = db.DB_NAME
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    db.DB_NAME = scratch.name
+    try:
+        db.create_tables()
+        started = time.perf_counter()
+        for number in numbers:
+            card_id = db.get_or_create_card(number)
+            db.record_rfid_event('Lobby', card_id, db.has_access(card_id, 'Lobby'))
+        registered = time.perf_counter() - started
+        db.execute_query("DELETE FROM Cards")
+
+        guard, journal = UnknownCardGuard(), EventJournal().start()
+        started = time.perf_counter()
+        for number in numbers + numbers:
+            card_id, allowed = db.authorize_card(number, 'Lobby')
+            if card_id is None:
+                journal.write_events(guard.unknown_card_records('Lobby', number))
+        guarded = time.perf_counter() - started
+        journal.close()
+        _, cards, _ = db.execute_query("SELECT COUNT(*) FROM Cards")
+        _, counted, _ = db.execute_query("SELECT COUNT(*), SUM(attempts) FROM UnknownCards")
+    finally:
+        db.DB_NAME = previous_db
+        db.remove_database(scratch.name)
+    print(f"{badges} unknown badges: registered in Cards {registered / badges * 1e6:.0f} us per badge, "
+          f"guarded {guarded / (2 * badges) * 1e6:.1f} us per badge (each seen twice)")
+    print(f"Cards rows {cards[0][0]}, UnknownCards rows {counted[0][0]} counting {counted[0][1]} attempts")
+    print(guard.summary())
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -6,7 +6,8 @@ TEXTS = {
         "dashboard_title": "Building SCADA - Dashboard", "config_title": "Building SCADA - Config",
         "login": "Login", "username": "Username", "password": "Password",
         "invalid_credentials": "Invalid username or password!", "plc_connected": "PLC Connected",
-        "plc_disconnected": "PLC Disconnected", "dashboard": "Dashboard", "config_panel": "Config Panel",
+        "plc_disconnected": "PLC Disconnected",
+        "plc_disconnected_stale": "PLC Disconnected - showing last known values", "dashboard": "Dashboard", "config_panel": "Config Panel",
         "logout": "Logout", "floor_0": "Floor 0", "floor_1": "Floor 1", "floor_2": "Floor 2",
         "parking_lot": "Parking Lot", "quick_controls": "Quick Controls", "alerts": "Alerts",
         "no_alerts": "No active alerts.", "lobby": "Lobby", "office_1": "Office 1", "office_2": "Office 2",
@@ -44,8 +45,10 @@ TEXTS = {
         "enable_sim_io": "Enable Simulated I/O", "test_fire": "Test Fire System",
         "test_security": "Test Security System", "submit_changes": "Submit Changes",
         "changes_submitted": "PLC Changes Submitted!", "sql_query": "SQL Query",
-        "exec_query": "Execute Query", "view_log": "View Log", "view_people": "View People",
-        "view_cards": "View Cards", "add_person": "Add Person", "add_card": "Add Card",
+        "exec_query": "Execute Query", "view_log": "View Log", "view_active_alarms": "Active Alarms",
+        "view_daily_summary": "Daily Summary", "view_unknown_cards": "Unknown Cards",
+        "view_analog_trends": "Analog Trends (24 h)", "view_pre_alarm_changes": "Before Alarms (10 min)",
+        "view_people": "View People", "view_cards": "View Cards", "add_person": "Add Person", "add_card": "Add Card",
         "remove_card": "Remove Card", "remove_person": "Remove Person",
         "db_results": "Query Results", "error_executing_query": "Error:",
         "no_results": "No results to display.", 'view_access': "View Access", 'add_access': "Add Access",
@@ -64,7 +67,9 @@ TEXTS = {
         "dashboard_title": "SCADA - Контролно табло", "config_title": "SCADA - Конфигурация",
         "login": "Вход", "username": "Потребител", "password": "Парола",
         "invalid_credentials": "Грешно потребителско име или парола!", "plc_connected": "ПЛК свързан",
-        "plc_disconnected": "ПЛК не е свързан", "dashboard": "Контролно табло",
+        "plc_disconnected": "ПЛК не е свързан",
+        "plc_disconnected_stale": "ПЛК не е свързан - показани са последните известни стойности",
+        "dashboard": "Контролно табло",
         "config_panel": "Конфигурационен панел", "logout": "Изход", "floor_0": "Етаж 0",
         "floor_1": "Етаж 1", "floor_2": "Етаж 2", "parking_lot": "Паркинг",
         "quick_controls": "Управление", "alerts": "Аларми", "no_alerts": "Няма активни аларми.",
@@ -105,6 +110,9 @@ TEXTS = {
         "test_fire": "Тест на пожарна система", "test_security": "Тест на охранителна система",
         "submit_changes": "Запази промените", "changes_submitted": "Промените в ПЛК са изпратени!",
         "sql_query": "SQL Заявка", "exec_query": "Изпълни заявка", "view_log": "Виж събития",
+        "view_active_alarms": "Активни аларми", "view_daily_summary": "Дневна справка",
+        "view_unknown_cards": "Непознати карти", "view_analog_trends": "Аналогови трендове (24 ч)",
+        "view_pre_alarm_changes": "Преди алармите (10 мин)",
         "view_people": "Виж хора", "view_cards": "Виж карти", "add_person": "Добави човек",
         "add_card": "Добави карта", "remove_card": "Премахни карта", "remove_person": "Премахни човек",
         "db_results": "Резултати от заявката", "error_executing_query": "Грешка:",
@@ -156,6 +164,10 @@ USERS = {
     "": {"password": "", "role": "administrator"}
 }
 
+SITES = [
+    {'name': 'Building', 'ip': '127.0.0.1', 'port': 502},
+]
+
 ALERT_DEFS = [
     (25, 'emergency', 'emergency_txt', ft.Icons.WARNING, ft.Colors.RED_ACCENT_400),
     (24, 'fire_sprinklers_on', 'fire_sprinklers_on_txt', ft.Icons.FIRE_EXTINGUISHER, ft.Colors.BLUE_ACCENT),
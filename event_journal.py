@@ -0,0 +1,139 @@
+# event_journal.py
+import datetime
+import itertools
+import threading
+import time
+from collections import deque
+import scada_db as db
+
+
+class EventJournal:
+    """
+    Write-behind journal for the poll loop. write_events and record_rfid_event only stamp the
+    records and append them to a deque; a writer thread commits everything queued every
+    `flush_interval` seconds, or as soon as `max_pending` batches are waiting, in a single
+    transaction. It has the journal interface of scada_db, so it can be passed wherever
+    scada_db is the default (check_and_log_events, PLCManager). Batches whose transaction
+    fails stay queued, ahead of newer ones, and are retried on the next flush.
+    close() writes out what is still queued; records arriving after it are written synchronously.
+    """
+
+    def __init__(self, flush_interval: float = 0.5, max_pending: int = 200, write_batches=None):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.write_batches = write_batches or db.write_event_batches
+        self.pending = deque()
+        self.batches_written = 0
+        self.transactions = 0
+        self.failed_transactions = 0
+        self._queued = itertools.count(1)
+        self._last_queued = 0
+        self._written = 0
+        self._wake = threading.Event()
+        self._written_changed = threading.Condition()
+        self._closed = False
+        self._writer = None
+
+    def start(self):
+        """Starts the writer thread; returns the journal for chaining."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="event-journal", daemon=True)
+            self._writer.start()
+        return self
+
+    def write_events(self, records, timestamp=None):
+        """Queues a batch of event records (see scada_db.write_event_batches) stamped with the current time."""
+        batch = (list(records), timestamp or datetime.datetime.now())
+        if self._closed:
+            self.write_batches([batch])
+            return
+        self.pending.append(batch)
+        self._last_queued = next(self._queued)
+        if len(self.pending) >= self.max_pending:
+            self._wake.set()
+
+    def record_rfid_event(self, location_name: str, card_id: int, success: bool):
+        """Queues the RFID access record of a decision, as scada_db.record_rfid_event writes it."""
+        self.write_events([db.rfid_event_record(location_name, card_id, success)])
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write_pending()
+        self._write_pending()
+
+    def _write_pending(self):
+        """Writes every batch queued so far in one transaction, putting them back when it fails."""
+        count = len(self.pending)
+        if not count:
+            return
+        batches = [self.pending.popleft() for _ in range(count)]
+        if not self.write_batches(batches):
+            self.pending.extendleft(reversed(batches))
+            self.failed_transactions += 1
+            return
+        self.batches_written += count
+        self.transactions += 1
+        with self._written_changed:
+            self._written += count
+            self._written_changed.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Waits until everything queued before the call is committed. Returns False on timeout."""
+        target = self._last_queued
+        if self._writer is None or not self._writer.is_alive():
+            self._write_pending()
+            return True
+        self._wake.set()
+        with self._written_changed:
+            return self._written_changed.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self, timeout: float = 10.0):
+        """
+        Stops the writer thread after it has written everything still queued. If it is still busy
+        after `timeout` seconds, it is left to finish the queue on its own.
+        """
+        self._closed = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join(timeout)
+        if self._writer is None or not self._writer.is_alive():
+            self._write_pending()
+
+
+def benchmark(events: int = 2000, burst: int = 20):
+    """Compares the time the poll loop spends logging bursts of events, direct versus write-behind."""
+    import tempfile
+
+    previous_db = db.DB_NAME
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    db.DB_NAME = scratch.name
+    try:
+        db.create_tables()
+        bursts = [[(db.LOG_EVENT, 'alarm_was_triggered', 'Lobby', True)] * burst for _ in range(events // burst)]
+        started = time.perf_counter()
+        for records in bursts:
+            for record in records:
+                db.write_events([record])
+        direct = time.perf_counter() - started
+        _, before, _ = db.execute_query("SELECT COUNT(*) FROM Log")
+
+        journal = EventJournal().start()
+        started = time.perf_counter()
+        for records in bursts:
+            journal.write_events(records)
+        queued = time.perf_counter() - started
+        journal.close()
+        _, after, _ = db.execute_query("SELECT COUNT(*) FROM Log")
+    finally:
+        db.DB_NAME = previous_db
+        db.remove_database(scratch.name)
+    print(f"{events} events in bursts of {burst}: direct {direct / len(bursts) * 1000:.2f} ms per burst, "
+          f"write-behind {queued / len(bursts) * 1e6:.1f} us per burst in the poll loop, "
+          f"{journal.transactions} transactions for {after[0][0] - before[0][0]} rows")
+
+
+if __name__ == "__main__":
+    benchmark()
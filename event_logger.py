@@ -0,0 +1,76 @@
+from app_state import bit_index, set_bits
+from tag_registry import TAGS, SECURITY_TAG
+import scada_db as db
+
+# attr: (event logged when set, event logged when cleared, location, is_momentary)
+EVENT_DEFINITIONS = {tag.name: (tag.event, tag.event_off, tag.location, tag.momentary)
+                     for tag in TAGS if tag.event}
+
+
+class EventEngine:
+    """
+    Edge detector compiled once from the tag registry. Every event tag gets its bit position
+    and the records its rising and falling edges produce, prebuilt; intrusion tags get the
+    'alarm_was_triggered' record of their location. detect() finds all edges of a cycle with
+    a few integer operations on the packed bitsets and only then touches the tags that flipped,
+    so its cost depends on the number of edges, not on the number of monitored signals.
+    """
+
+    def __init__(self, tags=TAGS, security_tag: str = SECURITY_TAG):
+        self.event_mask = 0
+        self.on_rise, self.on_fall = {}, {}
+        for tag in tags:
+            if tag.event:
+                index = bit_index(tag.name)
+                self.event_mask |= 1 << index
+                self.on_rise[index] = ((db.LOG_EVENT, tag.event, tag.location, tag.momentary),)
+                resolve = (db.RESOLVE_EVENT, tag.event, tag.location, None)
+                if tag.event_off:
+                    self.on_fall[index] = ((db.LOG_EVENT, tag.event_off, tag.location, True), resolve)
+                else:
+                    self.on_fall[index] = (resolve,)
+        self.intrusion_mask = 0
+        self.on_intrusion = {}
+        for tag in tags:
+            if tag.alarm == 'intrusion':
+                index = bit_index(tag.name)
+                self.intrusion_mask |= 1 << index
+                self.on_intrusion[index] = (db.LOG_EVENT, 'alarm_was_triggered', tag.location, True)
+        self.security_mask = 1 << bit_index(security_tag)
+
+    def detect(self, old: int, new: int) -> list:
+        """The event records for a transition between two bitsets given as little-endian integers."""
+        records = []
+        flipped = (old ^ new) & self.event_mask
+        if flipped:
+            rising = flipped & new
+            for index in set_bits(flipped):
+                records.extend(self.on_rise[index] if rising >> index & 1 else self.on_fall[index])
+        if new & self.security_mask:
+            triggered = new & ~old & self.intrusion_mask
+            if triggered:
+                # One record per location, even when its movement and door bits rise together.
+                records.extend(dict.fromkeys(self.on_intrusion[index] for index in set_bits(triggered)))
+        return records
+
+
+ENGINE = EventEngine()
+
+
+def detect_events(current, previous) -> list:
+    """The (action, event_name, location_name, is_resolved) records for a transition between two states."""
+    return ENGINE.detect(int.from_bytes(previous.bits, 'little'), int.from_bytes(current.bits, 'little'))
+
+
+def check_and_log_events(current, previous, journal=db):
+    """
+    Compares current and previous states and hands the resulting event records to the journal
+    in one batch. journal provides write_events(records); it is the scada_db module unless a
+    caller wants to intercept the writes. Returns the records.
+    """
+    if not previous:
+        return []
+    records = detect_events(current, previous)
+    if records:
+        journal.write_events(records)
+    return records
@@ -0,0 +1,117 @@
+import asyncio
+import random
+import time
+
+
+class PLCMemory:
+    """In-process image of the PLC's %M coils and %MW holding registers."""
+
+    def __init__(self, coils: int = 1024, registers: int = 1024):
+        self.coils = [False] * coils
+        self.registers = [0] * registers
+
+
+class FakeResponse:
+    """Minimal stand-in for a pymodbus response: bits/registers and isError()."""
+
+    def __init__(self, bits=None, registers=None, error=False):
+        self.bits = bits or []
+        self.registers = registers or []
+        self.error = error
+
+    def isError(self):
+        return self.error
+
+
+class FakeModbusClient:
+    """
+    Blocking Modbus client served from a PLCMemory instead of a socket. Every request sleeps
+    rtt (+ up to jitter) seconds to model the network; an unreachable client fails to connect
+    after connect_delay seconds. Mirrors the subset of ModbusTcpClient used by PLCManager.
+    """
+
+    def __init__(self, memory: PLCMemory, rtt: float = 0.0, jitter: float = 0.0,
+                 reachable: bool = True, connect_delay: float = 0.0):
+        self.memory = memory
+        self.rtt = rtt
+        self.jitter = jitter
+        self.reachable = reachable
+        self.connect_delay = connect_delay
+        self.connected = False
+        self.transactions = 0
+
+    def _latency(self):
+        self.transactions += 1
+        return self.rtt + (random.uniform(0.0, self.jitter) if self.jitter else 0.0)
+
+    def is_socket_open(self):
+        return self.connected
+
+    def connect(self):
+        time.sleep(self.connect_delay)
+        self.connected = self.reachable
+        return self.connected
+
+    def close(self):
+        self.connected = False
+
+    def _execute(self, operation, *args):
+        time.sleep(self._latency())
+        return operation(*args)
+
+    def read_coils(self, address, *, count=1):
+        return self._execute(_read_coils, self.memory, address, count)
+
+    def read_holding_registers(self, address, *, count=1):
+        return self._execute(_read_registers, self.memory, address, count)
+
+    def write_coil(self, address, value):
+        return self._execute(_write_coils, self.memory, address, [value])
+
+    def write_coils(self, address, values):
+        return self._execute(_write_coils, self.memory, address, values)
+
+    def write_register(self, address, value):
+        return self._execute(_write_registers, self.memory, address, [value])
+
+    def write_registers(self, address, values):
+        return self._execute(_write_registers, self.memory, address, values)
+
+
+class FakeAsyncModbusClient(FakeModbusClient):
+    """Asyncio counterpart of FakeModbusClient, mirroring AsyncModbusTcpClient."""
+
+    async def connect(self):
+        await asyncio.sleep(self.connect_delay)
+        self.connected = self.reachable
+        return self.connected
+
+    async def _execute(self, operation, *args):
+        await asyncio.sleep(self._latency())
+        return operation(*args)
+
+
+def _read_coils(memory, address, count):
+    if address < 0 or address + count > len(memory.coils):
+        return FakeResponse(error=True)
+    return FakeResponse(bits=memory.coils[address:address + count])
+
+
+def _read_registers(memory, address, count):
+    if address < 0 or address + count > len(memory.registers):
+        return FakeResponse(error=True)
+    return FakeResponse(registers=memory.registers[address:address + count])
+
+
+def _write_coils(memory, address, values):
+    if address < 0 or address + len(values) > len(memory.coils):
+        return FakeResponse(error=True)
+    memory.coils[address:address + len(values)] = [bool(v) for v in values]
+    return FakeResponse()
+
+
+def _write_registers(memory, address, values):
+    if address < 0 or address + len(values) > len(memory.registers):
+        return FakeResponse(error=True)
+    memory.registers[address:address + len(values)] = [int(v) & 0xFFFF for v in values]
+    return FakeResponse()
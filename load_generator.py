@@ -0,0 +1,268 @@
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict, deque
+from app_state import AppState
+from event_logger import check_and_log_events, EVENT_DEFINITIONS
+from fake_plc import PLCMemory, FakeAsyncModbusClient
+from plc_logic import READ_COILS_MAP
+from poll_scheduler import PollScheduler, TagGroup
+from site_registry import SiteRegistry, SitePoller
+from tag_registry import TAGS
+import scada_db as db
+
+UI_REFRESH_PERIOD = 0.25
+
+
+def _one_per_coil(tags):
+    """Drops tags that share a coil with an earlier one; they always flip together."""
+    coils = {}
+    for tag in tags:
+        coils.setdefault(tag.coil, tag.name)
+    return list(coils.values())
+
+
+ROOM_SMOKE_TAGS = _one_per_coil(tag for tag in TAGS if tag.alarm == 'smoke')
+INTRUSION_TAGS = _one_per_coil(tag for tag in TAGS if tag.alarm == 'intrusion')
+
+
+class Scenario:
+    """A timeline of (seconds, tag, value) flips of the PLC bits the app reads."""
+
+    def __init__(self, name: str, steps):
+        self.name = name
+        self.steps = sorted(steps, key=lambda step: step[0])
+        unknown = {tag for _, tag, _ in self.steps if tag not in READ_COILS_MAP}
+        if unknown:
+            raise ValueError(f"Scenario '{name}' flips unknown tags: {', '.join(sorted(unknown))}")
+
+    @property
+    def duration(self) -> float:
+        return self.steps[-1][0] if self.steps else 0.0
+
+    @classmethod
+    def fire(cls, spread: float = 1.0, hold: float = 5.0):
+        """Smoke spreads through every room within `spread` seconds; the PLC raises the alarm chain."""
+        steps = [(0.0, 'warn_fire_det', True), (0.0, 'call_fire_dept', True)]
+        for index, tag in enumerate(ROOM_SMOKE_TAGS):
+            steps.append((spread * index / len(ROOM_SMOKE_TAGS), tag, True))
+        steps += [(spread / 3, 'emergency', True), (spread / 3, 'fire_sprinklers_on', True)]
+        clear = spread + hold
+        steps += [(clear, tag, False) for tag in ROOM_SMOKE_TAGS]
+        steps += [(clear + 0.5, tag, False)
+                  for tag in ('fire_sprinklers_on', 'emergency', 'warn_fire_det', 'call_fire_dept')]
+        return cls('fire', steps)
+
+    @classmethod
+    def intrusion(cls, duration: float = 10.0, rate: float = 20.0, seed: int = 1):
+        """With the security system armed, movement and door bits flicker across the building."""
+        rng = random.Random(seed)
+        steps = [(0.0, 'l_security', True)]
+        state = dict.fromkeys(INTRUSION_TAGS, False)
+        t = 0.1
+        while t < duration:
+            tag = rng.choice(INTRUSION_TAGS)
+            state[tag] = not state[tag]
+            steps.append((t, tag, state[tag]))
+            t += rng.expovariate(rate)
+        steps.append((duration, 'call_security', True))
+        steps += [(duration + 0.5, tag, False) for tag in INTRUSION_TAGS + ['call_security', 'l_security']]
+        return cls('intrusion', steps)
+
+    @classmethod
+    def randomized(cls, tags=None, duration: float = 10.0, rate: float = 50.0, seed: int = 1):
+        """
+        Independent random flips of `tags` at `rate` flips per second. By default every tag that
+        logs an event and is read from the PLC, except the config handshake bit the app raises itself.
+        """
+        rng = random.Random(seed)
+        tags = list(tags or (tag for tag in EVENT_DEFINITIONS
+                             if tag in READ_COILS_MAP and tag != 'warn_config_altered'))
+        state = dict.fromkeys(tags, False)
+        steps, t = [], 0.0
+        while t < duration:
+            tag = rng.choice(tags)
+            state[tag] = not state[tag]
+            steps.append((t, tag, state[tag]))
+            t += rng.expovariate(rate)
+        steps += [(duration, tag, False) for tag, value in state.items() if value]
+        return cls('randomized', steps)
+
+
+class _ExpectedJournal:
+    """Records the events check_and_log_events logs, without a database."""
+
+    def __init__(self):
+        self.logged = []
+
+    def write_events(self, records, timestamp=None):
+        self.logged += [(event_name, location_name) for action, event_name, location_name, _ in records
+                        if action == db.LOG_EVENT]
+
+
+class _TimedJournal:
+    """
+    Writes through to scada_db and matches every logged event to the flip that caused it.
+    A logged event with no flip waiting for it is a duplicate when the scenario can cause it,
+    and an unrelated event (such as the config handshake after connecting) otherwise.
+    """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.scenario_events = {key for events in expected for key in events}
+        self.pending = defaultdict(deque)
+        self.log_latencies = []
+        self.awaiting_ui = []
+        self.duplicated = 0
+        self.unrelated = 0
+
+    def write_events(self, records, timestamp=None):
+        db.write_events(records, timestamp)
+        logged_at = time.perf_counter()
+        for action, event_name, location_name, _ in records:
+            if action != db.LOG_EVENT:
+                continue
+            waiting = self.pending[(event_name, location_name)]
+            if waiting:
+                flipped_at = waiting.popleft()
+                self.log_latencies.append(logged_at - flipped_at)
+                self.awaiting_ui.append(flipped_at)
+            elif (event_name, location_name) in self.scenario_events:
+                self.duplicated += 1
+            else:
+                self.unrelated += 1
+
+
+class LoadReport:
+    def __init__(self, scenario, speed, flips, expected, journal, ui_latencies, cycles, rows, wall_time):
+        self.scenario = scenario
+        self.speed = speed
+        self.flips = flips
+        self.expected = expected
+        self.logged = len(journal.log_latencies)
+        self.dropped = expected - self.logged
+        self.duplicated = journal.duplicated
+        self.unrelated = journal.unrelated
+        self.log_latencies = sorted(journal.log_latencies)
+        self.ui_latencies = sorted(ui_latencies)
+        self.cycles = cycles
+        self.rows = rows
+        self.wall_time = wall_time
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return "n/a"
+        p95 = values[max(0, int(len(values) * 0.95) - 1)]
+        return f"p50 {statistics.median(values) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, max {values[-1] * 1000:.1f} ms"
+
+    def print(self):
+        print(f"Scenario '{self.scenario.name}': {self.flips} bit flips over {self.scenario.duration:.1f} s "
+              f"replayed in {self.wall_time:.2f} s ({self.speed:g}x), {self.cycles} poll cycles; latencies are wall clock")
+        print(f"  events expected {self.expected}, logged {self.logged}, dropped {self.dropped}, "
+              f"duplicated {self.duplicated}, unrelated {self.unrelated}, Log rows written {self.rows}")
+        print(f"  flip -> Log row:    {self._percentiles(self.log_latencies)}")
+        print(f"  flip -> UI refresh: {self._percentiles(self.ui_latencies)}")
+
+
+def _expected_events(scenario: Scenario):
+    """Replays the scenario through check_and_log_events as if every flip were seen on its own."""
+    journal = _ExpectedJournal()
+    state = AppState()
+    per_step = []
+    for _, tag, value in scenario.steps:
+        previous = state.get_snapshot()
+        for attr, address in READ_COILS_MAP.items():
+            if address == READ_COILS_MAP[tag]:
+                setattr(state, attr, value)
+        journal.logged = []
+        check_and_log_events(state, previous, journal)
+        per_step.append(journal.logged)
+    return per_step
+
+
+async def _replay(scenario, speed, rtt, refresh_ui):
+    memory = PLCMemory()
+    registry = SiteRegistry()
+    controller = registry.add('load', '127.0.0.1', 0,
+                              client_factory=lambda ip, **_: FakeAsyncModbusClient(memory, rtt=rtt))
+    controller.scheduler = PollScheduler([TagGroup(g.name, g.period / speed, g.priority, g.tags)
+                                          for g in controller.scheduler.groups])
+    state = controller.state
+    per_step = _expected_events(scenario)
+    journal = _TimedJournal(per_step)
+    ui_latencies = []
+    last_refresh = [0.0]
+
+    def on_cycle(_, changes):
+        if changes:
+            check_and_log_events(state, changes.previous, journal)
+        now = time.perf_counter()
+        if now - last_refresh[0] < UI_REFRESH_PERIOD / speed:
+            return
+        last_refresh[0] = now
+        if refresh_ui:
+            refresh_ui(state)
+        refreshed_at = time.perf_counter()
+        ui_latencies.extend(refreshed_at - flipped_at for flipped_at in journal.awaiting_ui)
+        journal.awaiting_ui = []
+
+    poller = asyncio.ensure_future(SitePoller(registry, on_cycle).run())
+    while not state.plc_connected:
+        await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    for (at, tag, value), events in zip(scenario.steps, per_step):
+        delay = started + at / speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        memory.coils[READ_COILS_MAP[tag]] = value
+        flipped_at = time.perf_counter()
+        for key in events:
+            journal.pending[key].append(flipped_at)
+    # Give the slowest group and the UI throttle time to catch up with the last flips.
+    settle = max(g.period for g in controller.scheduler.groups) + UI_REFRESH_PERIOD / speed
+    await asyncio.sleep(settle * 2)
+    poller.cancel()
+    controller.manager.close()
+    return journal, ui_latencies, controller.cycles, time.perf_counter() - started
+
+
+def run_scenario(scenario: Scenario, speed: float = 10.0, rtt: float = 0.0, refresh_ui=None,
+                 db_path: str = None) -> LoadReport:
+    """
+    Replays a scenario against the poller and the event logger, `speed` times faster than real
+    time: the timeline, the tag group periods and the UI refresh throttle are all compressed
+    by the same factor. PLC bits are served by an in-process fake client with `rtt` latency.
+    refresh_ui(state) stands for the dashboard repaint. Events go to a scratch database at
+    db_path (a temporary file by default), never to the app's own scada.db.
+    """
+    previous_db = db.DB_NAME
+    scratch = None
+    if db_path is None:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        scratch.close()
+        db_path = scratch.name
+    db.DB_NAME = db_path
+    try:
+        db.create_tables()
+        _, before, _ = db.execute_query("SELECT COUNT(*) FROM Log")
+        journal, ui_latencies, cycles, wall_time = asyncio.run(_replay(scenario, speed, rtt, refresh_ui))
+        _, after, _ = db.execute_query("SELECT COUNT(*) FROM Log")
+    finally:
+        db.DB_NAME = previous_db
+        if scratch:
+            db.remove_database(scratch.name)
+    flips = len(scenario.steps)
+    expected = sum(len(events) for events in journal.expected)
+    return LoadReport(scenario, speed, flips, expected, journal, ui_latencies, cycles,
+                      after[0][0] - before[0][0], wall_time)
+
+
+if __name__ == "__main__":
+    import sys
+    speed = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    for scenario in (Scenario.fire(), Scenario.intrusion(), Scenario.randomized()):
+        run_scenario(scenario, speed=speed).print()
@@ -0,0 +1,113 @@
+# log_retention.py
+import threading
+import time
+import scada_db as db
+
+
+class LogRetention:
+    """
+    Background upkeep of the event Log, run every `interval` seconds from its own thread:
+    rolls the resolved rows of finished months into monthly partitions with daily rollups
+    (scada_db.roll_log_partitions), exports the partitions older than the `keep_months` latest
+    months to archive files when keep_months is set (scada_db.archive_log_partitions), and
+    hands up to `vacuum_pages` free pages back to the filesystem (scada_db.incremental_vacuum).
+    Rows move in small transactions, so the EventJournal writer only ever waits for one chunk.
+    """
+
+    def __init__(self, interval: float = 3600.0, hot_months: int = db.LOG_HOT_MONTHS, keep_months: int = None,
+                 vacuum_pages: int = 2000, convert: bool = False):
+        self.interval = interval
+        self.hot_months = hot_months
+        self.keep_months = keep_months
+        self.vacuum_pages = vacuum_pages
+        self.convert = convert
+        self.runs = 0
+        self.last_run = None
+        self._stop = threading.Event()
+        self._worker = None
+
+    def start(self):
+        """Starts the upkeep thread, which runs once right away; returns the retention for chaining."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="log-retention", daemon=True)
+            self._worker.start()
+        return self
+
+    def run_once(self, now=None):
+        """Runs one upkeep pass and returns what it did as (rows moved, months archived, free pages left)."""
+        moved = db.roll_log_partitions(now, self.hot_months)
+        archived = db.archive_log_partitions(self.keep_months, now) if self.keep_months else []
+        free_pages = db.incremental_vacuum(self.vacuum_pages, self.convert)
+        self.runs += 1
+        self.last_run = (moved, archived, free_pages)
+        return self.last_run
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def close(self, timeout: float = 10.0):
+        """Stops the upkeep thread, letting a pass in progress finish."""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+
+def benchmark(months: int = 12, events_per_month: int = 20000, keep_months: int = 6):
+    """
+    Fills a scratch database with `months` months of events, then compares get_logs and the
+    file size before and after one retention pass.
+    """
+    import datetime
+    import os
+    import random
+    import tempfile
+
+    rng = random.Random(1)
+    previous_db = db.DB_NAME
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    db.DB_NAME = scratch.name
+    now = datetime.datetime(2026, 10, 15)
+    start = now - datetime.timedelta(days=30 * months)
+    span = (now - start).total_seconds()
+    archived = []
+    try:
+        db.create_tables()
+        event_ids, location_ids = db.reference_ids()
+        rows = [(rng.choice(list(event_ids.values())), start + datetime.timedelta(seconds=rng.random() * span),
+                 rng.choice(list(location_ids.values()))) for _ in range(months * events_per_month)]
+        db.connect_db().executemany("INSERT INTO Log (event_id, timestamp, location_id, is_resolved) "
+                                    "VALUES (?, ?, ?, 1)", rows)
+        db.connect_db().commit()
+
+        def measure():
+            runs = 50
+            started = time.perf_counter()
+            for _ in range(runs):
+                db.get_logs()
+            db.connect_db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return (time.perf_counter() - started) / runs, os.path.getsize(scratch.name)
+
+        before, size_before = measure()
+        started = time.perf_counter()
+        moved, archived, _ = LogRetention(keep_months=keep_months, vacuum_pages=0).run_once(now)
+        elapsed = time.perf_counter() - started
+        after, size_after = measure()
+        _, hot, _ = db.execute_query("SELECT COUNT(*) FROM Log")
+        _, history, _ = db.execute_query("SELECT COUNT(*) FROM LogHistory")
+    finally:
+        for month in archived:
+            os.unlink(db.log_archive_path(month))
+        db.DB_NAME = previous_db
+        db.remove_database(scratch.name)
+    print(f"{len(rows)} events over {months} months: retention pass {elapsed:.2f} s, {moved} rows partitioned, "
+          f"{len(archived)} months archived")
+    print(f"Log {hot[0][0]} rows, LogHistory {history[0][0]} rows")
+    print(f"get_logs {before * 1000:.2f} ms -> {after * 1000:.2f} ms, "
+          f"file {size_before / 2 ** 20:.1f} MiB -> {size_after / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    benchmark()
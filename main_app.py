@@ -1,13 +1,25 @@
 import flet as ft
+import asyncio
+import atexit
 import time
 import threading
 import scada_db as db
 from plc_logic import PLCManager
-from definitions import TEXTS, USERS
-from app_state import AppState
+from event_logger import check_and_log_events
+from event_journal import EventJournal
+from log_retention import LogRetention
+from definitions import TEXTS, USERS, SITES
+from state_store import StateStore
+from tag_history import TagHistory
+from analog_historian import AnalogHistorian
+from site_registry import SiteRegistry, SitePoller
+from poll_scheduler import PollScheduler
 from ui_factory import create_dashboard_view, create_config_view
 from ui_updater import update_dashboard_ui, update_config_ui, update_app_bar
 
+ASYNC_POLLING = True
+UI_REFRESH_PERIOD = 0.25
+
 
 def main(page: ft.Page):
     page.theme_mode = ft.ThemeMode.SYSTEM
@@ -15,98 +27,53 @@ def main(page: ft.Page):
     page.dark_theme = ft.Theme(color_scheme_seed=ft.Colors.INDIGO_600)
     page.window_min_width = 600
     db.create_tables()
-
-    state = AppState()
+    # Events are committed by a writer thread, so a burst of them never stalls the poll loop.
+    journal = EventJournal().start()
+    atexit.register(journal.close)
+    # Finished months leave the hot Log table for monthly partitions, hourly in the background,
+    # and partitions older than LOG_KEEP_MONTHS move out to archive files.
+    retention = LogRetention(keep_months=db.LOG_KEEP_MONTHS).start()
+    atexit.register(retention.close)
+    analog_history = AnalogHistorian().start()
+    atexit.register(analog_history.close)
+
+    # The poller thread is the only writer of state; UI handlers queue commands in the store.
+    store = StateStore()
+    state = store.state
+    # The last two hours of every tag, sampled by the poller on every cycle that changed something.
+    history = TagHistory()
 
     def get_text(key):
         return TEXTS.get(state.lang, TEXTS['en']).get(key, key)
 
     page.title = get_text("app_title")
 
-    def check_and_log_events(current, previous):
-        """Compares current and previous states to log significant events."""
-        if not previous:
-            return
-
-        event_definitions = {
-            'l_smoke': ('fire_detected', None, 'Lobby', False),
-            'o1_smoke': ('fire_detected', None, 'Office 1', False),
-            'o2_smoke': ('fire_detected', None, 'Office 2', False),
-            'o3_smoke': ('fire_detected', None, 'Office 3', False),
-            'c1_smoke': ('fire_detected', None, 'Corridor 1', False),
-            'c2_smoke': ('fire_detected', None, 'Corridor 2', False),
-            'l_security': ('alarm_was_activated', 'alarm_was_deactivated', 'Lobby', False),
-            'emergency': ('emergency_happened', None, 'System', True),
-            'call_fire_dept': ('fire_dept_was_called', None, 'System', True),
-            'call_security': ('security_was_called', None, 'System', True),
-            'warn_config_altered': ('config_altered', None, 'System', False),
-            'warn_auto_security_impossible': ('auto_security_impossible', None, 'System', False),
-            'warn_fire_det': ('fire_detected', None, 'System', False),
-            'warn_pgate_open': ('parking_gate_open_warning', None, 'Parking lot', False),
-            'warn_pspot_miscount': ('parking_spot_miscount', None, 'Parking lot', False),
-            'err_light_config': ('light_config_error', None, 'System', False),
-            'err_pgate_force': ('parking_gate_forced_error', None, 'Parking lot', False),
-            'err_pspot_config': ('parking_spot_config_error', None, 'Parking lot', False),
-            'err_temp_config': ('temp_config_error', None, 'System', False),
-            'err_work_day_config': ('work_day_config_error', None, 'System', False),
-            'err_cold_month_config': ('cold_month_config_error', None, 'System', False),
-        }
-
-        for attr, (event_on, event_off, location, is_momentary) in event_definitions.items():
-            if getattr(current, attr) and not getattr(previous, attr):
-                db.log_event(event_name=event_on, location_name=location, is_resolved=is_momentary)
-            elif not getattr(current, attr) and getattr(previous, attr):
-                if event_off:
-                    db.log_event(event_name=event_off, location_name=location, is_resolved=True)
-                db.resolve_event(event_name=event_on, location_name=location)
-
-        if current.force_park_open and not previous.force_park_open:
-            db.log_event('parking_lot_was_forced_open', 'Parking lot', is_resolved=False)
-        elif not current.force_park_open and previous.force_park_open:
-            db.resolve_event('parking_lot_was_forced_open', 'Parking lot')
-
-        if current.force_park_close and not previous.force_park_close:
-            db.log_event('parking_lot_was_forced_closed', 'Parking lot', is_resolved=False)
-        elif not current.force_park_close and previous.force_park_close:
-            db.resolve_event('parking_lot_was_forced_closed', 'Parking lot')
-
-        if current.l_security:
-            trigger_locations = {
-                'Lobby': (current.l_mvmnt and not previous.l_mvmnt) or (
-                            current.l_door_open and not previous.l_door_open),
-                'Office 1': (current.o1_mvmnt and not previous.o1_mvmnt) or (
-                            current.o1_door_open and not previous.o1_door_open),
-                'Office 2': (current.o2_mvmnt and not previous.o2_mvmnt) or (
-                            current.o2_door_open and not previous.o2_door_open),
-                'Office 3': (current.o3_mvmnt and not previous.o3_mvmnt) or (
-                            current.o3_door_open and not previous.o3_door_open),
-                'Corridor 1': current.c1_mvmnt and not previous.c1_mvmnt,
-                'Corridor 2': current.c2_mvmnt and not previous.c2_mvmnt,
-            }
-            for location, triggered in trigger_locations.items():
-                if triggered:
-                    db.log_event('alarm_was_triggered', location, is_resolved=True)
-
     def on_keep_lobby_door_open(e):
-        state.force_lobby_door = e.control.value
+        store.submit(force_lobby_door=e.control.value)
 
     def on_keep_parking_open(e):
-        state.force_park_open = e.control.value
-        if state.force_park_open:
-            state.force_park_close = False
+        if e.control.value:
+            store.submit(force_park_open=True, force_park_close=False)
+        else:
+            store.submit(force_park_open=False)
 
     def on_keep_parking_closed(e):
-        state.force_park_close = e.control.value
-        if state.force_park_close:
-            state.force_park_open = False
+        if e.control.value:
+            store.submit(force_park_close=True, force_park_open=False)
+        else:
+            store.submit(force_park_close=False)
 
     def on_update_pspots(e):
         try:
-            state.p_spots_taken = int(e.control.value)
+            store.submit(p_spots_taken=int(e.control.value))
         except (ValueError, TypeError):
             pass
 
+    def on_submit_plc_config(values):
+        store.submit(config_altered=True, **values)
+
     def toggle_lang(e):
+        # The language is only ever written here (state_store.UI_SETTINGS), so it bypasses the command queue.
         next_lang = "bg" if state.lang == "en" else "en"
         state.lang = next_lang
         route_change(page.route, is_lang_toggle=True)
@@ -127,31 +94,66 @@ def main(page: ft.Page):
         page.go("/")
         page.update()
 
+    last_ui_refresh = [0.0]
+    ui_changes = [None]
+
+    def refresh_after_poll(changes):
+        # The historian needs unchanged cycles too: it samples the analogs at most once a second.
+        analog_history.record(state)
+        # Events are checked on every cycle that changed something (as often as the alarm period),
+        # the UI is repainted at most every UI_REFRESH_PERIOD and only the controls bound to a tag
+        # that changed since the last repaint.
+        if changes:
+            check_and_log_events(state, changes.previous, journal)
+            ui_changes[0] = changes if ui_changes[0] is None else ui_changes[0] | changes
+        if ui_changes[0] is None or time.monotonic() - last_ui_refresh[0] < UI_REFRESH_PERIOD:
+            return
+        last_ui_refresh[0] = time.monotonic()
+        pending, ui_changes[0] = ui_changes[0], None
+        update_app_bar(state, get_text)
+        if page.route == "/dashboard":
+            update_dashboard_ui(state, get_text, pending)
+        elif page.route == "/config":
+            update_config_ui(state, get_text)
+        page.update()
+
     def update_state_on_interval():
-        plc_manager = PLCManager('127.0.0.1', 502)
-        previous_state = None
+        plc_manager = PLCManager(SITES[0]['ip'], SITES[0]['port'], store=store, journal=journal)
+        plc_manager.subscribe(history.record)
+        scheduler = PollScheduler(plc_manager.tag_groups())
         while True:
-            previous_state = state.get_snapshot()
-            plc_manager.update(state)
-            check_and_log_events(state, previous_state)
-            update_app_bar(state, get_text)
-            if page.route == "/dashboard":
-                update_dashboard_ui(state, get_text)
-            elif page.route == "/config":
-                update_config_ui(state, get_text)
-            page.update()
-            time.sleep(0.7)
+            groups = scheduler.due()
+            if groups:
+                changes = plc_manager.update(state, groups)
+                scheduler.complete(groups)
+                refresh_after_poll(changes)
+            time.sleep(scheduler.next_wakeup())
+
+    async def update_state_on_interval_async():
+        sites = SiteRegistry.from_config(SITES, primary_store=store, journal=journal)
+        sites.primary.manager.subscribe(history.record)
+
+        def on_site_cycle(controller, changes):
+            if controller.state is state:
+                refresh_after_poll(changes)
+
+        await SitePoller(sites, on_cycle=on_site_cycle).run()
 
     handlers = {
         "on_keep_lobby_door_open": on_keep_lobby_door_open,
         "on_keep_parking_open": on_keep_parking_open,
         "on_keep_parking_closed": on_keep_parking_closed,
         "on_update_pspots": on_update_pspots,
+        "on_submit_plc_config": on_submit_plc_config,
         "toggle_lang": toggle_lang,
         "logout": logout,
+        "analog_trends": analog_history.trend_report,
+        "pre_alarm_changes": history.pre_alarm_report,
     }
 
     def route_change(route, is_lang_toggle=False):
+        # Views are built from the latest published frame, never from the state the poller is writing.
+        view_state = store.view()
         page.views.clear()
 
         page.title = get_text("login_title")
@@ -184,7 +186,7 @@ def main(page: ft.Page):
                 return
             page.title = get_text("dashboard_title")
             page.views.append(
-                create_dashboard_view(page, state, get_text, handlers)
+                create_dashboard_view(page, view_state, get_text, handlers)
             )
 
         elif page.route == "/config":
@@ -193,11 +195,11 @@ def main(page: ft.Page):
                 return
             page.title = get_text("config_title")
             page.views.append(
-                create_config_view(page, state, get_text, handlers)
+                create_config_view(page, view_state, get_text, handlers)
             )
 
-        update_dashboard_ui(state, get_text)
-        update_app_bar(state, get_text)
+        update_dashboard_ui(view_state, get_text)
+        update_app_bar(view_state, get_text)
         page.update()
 
     user_field = ft.TextField(label=get_text("username"), on_submit=login, width=330, autofocus=True)
@@ -207,7 +209,10 @@ def main(page: ft.Page):
     login_btn = ft.ElevatedButton(get_text("login"), on_click=login, width=300)
 
     page.on_route_change = route_change
-    update_thread = threading.Thread(target=update_state_on_interval, daemon=True)
+    if ASYNC_POLLING:
+        update_thread = threading.Thread(target=asyncio.run, args=(update_state_on_interval_async(),), daemon=True)
+    else:
+        update_thread = threading.Thread(target=update_state_on_interval, daemon=True)
     update_thread.start()
     page.go(page.route)
 
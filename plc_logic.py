@@ -1,12 +1,97 @@
-from pymodbus.client import ModbusTcpClient
+from pymodbus.client import ModbusTcpClient, AsyncModbusTcpClient
+import asyncio
+import itertools
 import logging
-from scada_db import get_or_create_card, has_access, record_rfid_event
+import time
+from block_planner import (plan_read_blocks, MAX_READ_COILS, MAX_READ_REGISTERS,
+                           COIL_TRANSACTION_COST, REGISTER_TRANSACTION_COST)
+from card_guard import UnknownCardGuard
+from poll_scheduler import TagGroup
+from reconnect import ReconnectScheduler, AsyncReconnectScheduler
+from scada_db import authorize_card
+import scada_db
+from tag_registry import coil_map, register_map, group_tags
 
 
 logging.basicConfig()
 log = logging.getLogger()
 log.setLevel(logging.WARNING)
 
+READ_COILS_MAP = coil_map()
+READ_REGISTERS_MAP = register_map()
+
+RFID_GROUP = 'rfid'
+DEFAULT_GROUP = 'default'
+# name: (period in seconds, priority, tags). Members come from the `group` of each registry tag;
+# tags missing here are polled in the default group. The alarm, occupancy and status coils share
+# one planned coil block, read at the alarm period for all three (see PLCManager._reads_for).
+TAG_GROUPS = {
+    'alarms': (0.35, 0, group_tags('alarms')),
+    RFID_GROUP: (0.7, 1, []),
+    'occupancy': (1.0, 2, group_tags('occupancy')),
+    'status': (2.0, 3, group_tags('status')),
+    'analogs': (5.0, 4, group_tags('analogs')),
+}
+DEFAULT_GROUP_PERIOD = 0.7
+
+MAX_WRITE_COILS = 1968
+MAX_WRITE_REGISTERS = 123
+
+
+def coalesce_ranges(values: dict, fillers: dict = None, max_len: int = MAX_WRITE_REGISTERS):
+    """
+    Groups {address: value} writes into as few contiguous (start, [values]) frames as possible.
+    Two writes are merged when every address between them has a known value in fillers,
+    which is then written back unchanged. Frames never exceed max_len values.
+    """
+    fillers = fillers or {}
+    frames = []
+    for addr in sorted(values):
+        if frames:
+            start, frame_vals = frames[-1]
+            end = start + len(frame_vals)
+            gap = range(end, addr)
+            if addr - start < max_len and all(a in fillers for a in gap):
+                frame_vals.extend(fillers[a] for a in gap)
+                frame_vals.append(values[addr])
+                continue
+        frames.append((addr, [values[addr]]))
+    return frames
+
+
+class ConfigWriter:
+    """
+    Transfers the PLC configuration as a diff against the values last confirmed by the PLC.
+    Changed addresses are merged into as few write_coils/write_registers frames as possible,
+    bridging gaps only over addresses that belong to the configuration.
+    """
+
+    def __init__(self):
+        self.confirmed = {'write_coils': {}, 'write_registers': {}}
+
+    def reset(self):
+        """Forgets the confirmed values, so the next transfer rewrites the whole configuration."""
+        for values in self.confirmed.values():
+            values.clear()
+
+    def frames(self, coils: dict, registers: dict):
+        """Returns the (method, address, values) frames needed to bring the PLC to the given values."""
+        frames = []
+        for method, desired, max_len in (('write_coils', coils, MAX_WRITE_COILS),
+                                         ('write_registers', registers, MAX_WRITE_REGISTERS)):
+            confirmed = self.confirmed[method]
+            changed = {addr: value for addr, value in desired.items() if confirmed.get(addr) != value}
+            frames.extend((method, start_addr, values)
+                          for start_addr, values in coalesce_ranges(changed, desired, max_len))
+        return frames
+
+    def confirm(self, method, start_addr, values, response):
+        """Records the values of a frame the PLC accepted. Returns False if it was rejected."""
+        if response.isError():
+            return False
+        self.confirmed[method].update(zip(range(start_addr, start_addr + len(values)), values))
+        return True
+
 
 class PLCManager:
     """
@@ -14,59 +99,92 @@ class PLCManager:
     This version is optimized for bulk read/write operations and includes RFID handling.
     """
 
-    def __init__(self, ip: str, port: int):
-        """Initializes the PLC manager and defines memory mappings."""
-        self.client = ModbusTcpClient(ip, port=port)
+    def __init__(self, ip: str, port: int, read_coils_map: dict = None, read_registers_map: dict = None,
+                 client_factory=ModbusTcpClient, connect_timeout: float = 2.0, store=None, journal=None):
+        """
+        Initializes the PLC manager and defines memory mappings. Controllers with a different
+        address layout pass their own maps; client_factory(ip, port=port, timeout=...) builds
+        the Modbus client. Connecting is left to a background reconnect scheduler.
+        With a StateStore, its queued commands are applied at the start of every cycle and
+        a frame is published after every cycle that changed something. RFID decisions are
+        recorded in journal (an EventJournal, or the scada_db module by default); badges that
+        match no card are counted and rate limited per reader by card_guard.
+        """
+        self.client = client_factory(ip, port=port, timeout=connect_timeout)
         self.ip = ip
         self.port = port
-        self._define_mappings()
+        self.connect_timeout = connect_timeout
+        self.link = ReconnectScheduler(lambda: self.client.connect(), lambda: self.client.close())
+        self._define_mappings(read_coils_map, read_registers_map)
         self._last_written_controls = {}
-
-    def _define_mappings(self):
+        self.subscribers = []
+        self._published = None
+        self._last_responses = {}
+        self.config_writer = ConfigWriter()
+        self.store = store
+        self.journal = journal if journal is not None else scada_db
+        self.card_guard = UnknownCardGuard()
+        if store is not None:
+            self.subscribe(store.publish)
+
+    def _define_mappings(self, read_coils_map=None, read_registers_map=None):
         """
         Defines mappings from application state attributes to PLC addresses
-        and groups them into efficient, contiguous blocks for bulk reading.
-        """
-        self.read_coils_map = {
-            'l_mvmnt': 212, 'l_smoke': 221, 'l_light': 234, 'l_door_open': 202,
-            'l_rfid_ok': 226, 'l_security': 215,
-            'o1_mvmnt': 214, 'o1_smoke': 218, 'o1_door_open': 203, 'o1_rfid_ok': 227,
-            'o2_mvmnt': 214, 'o2_smoke': 219, 'o2_door_open': 204, 'o2_rfid_ok': 228,
-            'o3_mvmnt': 214, 'o3_smoke': 220, 'o3_door_open': 205, 'o3_rfid_ok': 229,
-            'o3_heating': 232, 'o3_cooling': 233,
-            'c1_mvmnt': 213, 'c1_smoke': 222, 'c1_light': 235,
-            'c2_mvmnt': 213, 'c2_smoke': 223, 'c2_light': 235,
-            'p_inside_cycle': 13, 'p_outside_cycle': 14,
-            'p_gate_closed': 207, 'p_obj_det': 208,
-            'p_gate_open': 230, 'p_gate_close': 231,
-            'p_full_bulb': 239,
-            'call_fire_dept': 238, 'call_security': 237, 'fire_sprinklers_on': 236,
-            'warn_config_altered': 495, 'warn_auto_security_impossible': 496,
-            'warn_fire_det': 497, 'warn_pgate_open': 498, 'warn_pspot_miscount': 499,
-            'err_light_config': 505, 'err_pgate_force': 506, 'err_pspot_config': 507,
-            'err_temp_config': 508, 'err_work_day_config': 509,
-            'err_cold_month_config': 510, 'emergency': 511,
-        }
-        self.read_registers_map = {
-            'p_spots_taken': 9, 'p_spots_total': 8,
-            'o3_temp': 200, 'measured_light': 201,
-        }
-
-        self.coil_read_blocks = [
-            (13, 2),  # Coils from M13 to M14
-            (202, 38),  # Coils from M202 to M239
-            (495, 17)  # Coils from M495 to M511
-        ]
-        self.register_read_blocks = [
-            (8, 2),  # Registers from MW8 to MW9
-            (200, 2)  # Registers from MW200 to MW201
+        and plans the contiguous blocks used to read them in bulk.
+        """
+        self.read_coils_map = dict(read_coils_map or READ_COILS_MAP)
+        self.read_registers_map = dict(read_registers_map or READ_REGISTERS_MAP)
+
+        self.coil_plan = plan_read_blocks(self.read_coils_map.values(), MAX_READ_COILS,
+                                          COIL_TRANSACTION_COST)
+        self.register_plan = plan_read_blocks(self.read_registers_map.values(), MAX_READ_REGISTERS,
+                                              REGISTER_TRANSACTION_COST, bits_per_item=16)
+        self.coil_read_blocks = self.coil_plan.blocks
+        self.register_read_blocks = self.register_plan.blocks
+        self.coil_decoders = self._compile_decoders(self.coil_read_blocks, self.read_coils_map)
+        self.register_decoders = self._compile_decoders(self.register_read_blocks, self.read_registers_map)
+        log.info(self.coil_plan.report("Coil reads"))
+        log.info(self.register_plan.report("Register reads"))
+        self._group_blocks = {}
+        self._block_read_at = {}
+
+        self.rfid_readers = [
+            dict(req_coil=100, regs_req=(100, 101, 102), resp_coil=101, regs_resp=(103, 104, 105),
+                 location="Lobby"),
+            dict(req_coil=106, regs_req=(106, 107, 108), resp_coil=107, regs_resp=(109, 110, 111),
+                 location="Office 1"),
+            dict(req_coil=112, regs_req=(112, 113, 114), resp_coil=113, regs_resp=(115, 116, 117),
+                 location="Office 2"),
+            dict(req_coil=118, regs_req=(118, 119, 120), resp_coil=119, regs_resp=(121, 122, 123),
+                 location="Office 3"),
+            dict(req_coil=124, regs_req=(124, 125, 126), resp_coil=125, regs_resp=(127, 128, 129),
+                 location="Parking lot"),
         ]
+        rfid_coils = [addr for r in self.rfid_readers for addr in (r['req_coil'], r['resp_coil'])]
+        rfid_regs = [addr for r in self.rfid_readers for addr in r['regs_req'] + r['regs_resp']]
+        self.rfid_coil_block = (min(rfid_coils), max(rfid_coils) - min(rfid_coils) + 1)  # M100 to M125
+        self.rfid_register_block = (min(rfid_regs), max(rfid_regs) - min(rfid_regs) + 1)  # MW100 to MW129
 
     def connect(self):
-        """Establishes a connection to the PLC if not already open."""
-        if not self.client.is_socket_open():
-            return self.client.connect()
-        return True
+        """
+        Returns True if the PLC link is up. Never blocks: when the link is down, a background
+        reconnect is scheduled (at most one at a time) and the caller keeps its cached state.
+        """
+        if self.link.connected and self._link_alive():
+            return True
+        if self.link.connected:
+            self.link.connection_lost()
+        else:
+            self.link.ensure_connecting()
+        return False
+
+    def _link_alive(self):
+        """Checks that the socket behind a connected link is still open."""
+        return self.client.is_socket_open()
+
+    def close(self):
+        """Closes the connection to the PLC."""
+        self.client.close()
 
     @staticmethod
     def _scale_temp_for_write(deg_c: float) -> int:
@@ -94,115 +212,279 @@ class PLCManager:
         """Scales PLC register value back to lux."""
         return raw * 100.0
 
-    def update(self, state):
+    def tag_groups(self):
+        """
+        Returns fresh TagGroup objects for a PollScheduler. Mapped tags that TAG_GROUPS does not
+        list are collected in a default group, so every tag is polled by some group.
+        """
+        groups = [TagGroup(name, period, priority, tags)
+                  for name, (period, priority, tags) in TAG_GROUPS.items()]
+        grouped = {tag for group in groups for tag in group.tags}
+        leftover = [tag for tag in list(self.read_coils_map) + list(self.read_registers_map) if tag not in grouped]
+        if leftover:
+            groups.append(TagGroup(DEFAULT_GROUP, DEFAULT_GROUP_PERIOD, len(groups), leftover))
+        return groups
+
+    def _blocks_of(self, group):
+        """Indexes of the planned (coil, register) read blocks that hold tags of the group."""
+        if group.name not in self._group_blocks:
+            tags = set(group.tags)
+            self._group_blocks[group.name] = tuple(
+                [index for index, (start, count) in enumerate(blocks)
+                 if any(start <= addr < start + count for tag, addr in address_map.items() if tag in tags)]
+                for blocks, address_map in ((self.coil_read_blocks, self.read_coils_map),
+                                            (self.register_read_blocks, self.read_registers_map))
+            )
+        return self._group_blocks[group.name]
+
+    def _reads_for(self, groups=None):
+        """
+        Returns the (coil_reads, register_reads) for the due groups as lists of ((start, count), table).
+        Groups are served from the blocks of the full read plan, which several groups share: a block
+        is read when it holds a tag of a due group and was not already read within the last half
+        period of that group. A shared block is thus read once, at the rate of its fastest group,
+        and the slower groups are refreshed from it for free.
+        """
+        coil_reads = list(zip(self.coil_read_blocks, self.coil_decoders))
+        register_reads = list(zip(self.register_read_blocks, self.register_decoders))
+        if groups is None:
+            return coil_reads, register_reads
+        now = time.monotonic()
+        wanted = (set(), set())
+        for group in groups:
+            for reads, indexes, selected in zip((coil_reads, register_reads), self._blocks_of(group), wanted):
+                selected.update(index for index in indexes
+                                if now - self._block_read_at.get(id(reads[index][1]), float('-inf')) >= group.period / 2)
+        return ([read for index, read in enumerate(coil_reads) if index in wanted[0]],
+                [read for index, read in enumerate(register_reads) if index in wanted[1]])
+
+    @staticmethod
+    def _scans_rfid(groups):
+        return groups is None or any(group.name == RFID_GROUP for group in groups)
+
+    def subscribe(self, callback):
+        """Registers callback(state, changes), called after every update cycle that changed something."""
+        self.subscribers.append(callback)
+
+    def _publish(self, state):
+        """
+        Computes the ChangeSet since the end of the previous cycle, so changes made between
+        cycles (e.g. by UI handlers) are included, notifies the subscribers and returns it.
+        """
+        changes = state.changes_since(self._published)
+        if changes:
+            self._published = state.get_snapshot()
+            for callback in self.subscribers:
+                callback(state, changes)
+        return changes
+
+    def _begin_cycle(self, state):
+        """Takes the first baseline for _publish, then applies the commands queued in the store."""
+        if self._published is None:
+            self._published = state.get_snapshot()
+        if self.store is not None:
+            self.store.apply_commands(state)
+
+    def update(self, state, groups=None):
         """
         Reads data from and writes data to the PLC in a single, optimized update cycle.
+        With groups (from a PollScheduler) only the blocks those groups need are read and the
+        RFID readers are scanned only when the RFID group is due; otherwise everything is polled.
+        Returns the ChangeSet of the cycle.
         """
+        self._begin_cycle(state)
         if not self.connect():
-            if state.plc_connected:
-                state.plc_connected = False
-                state.reset_to_defaults()
-            return
-
-        if not state.plc_connected:
-            state.plc_connected = True
-            state.config_altered = True
+            self._mark_disconnected(state)
+            return self._publish(state)
 
+        self._mark_connected(state)
         try:
-            self._write_to_plc(state)
-            self._read_from_plc(state)
+            self._write_to_plc(state, self._scans_rfid(groups))
+            self._read_from_plc(state, groups)
         except Exception as e:
             print(f"PLC Communication Error: {e}")
-            self.client.close()
+            self.link.connection_lost()
+            self._mark_disconnected(state)
+        return self._publish(state)
+
+    @staticmethod
+    def _mark_disconnected(state):
+        """Keeps the last values on display but flags them as stale while the PLC is unreachable."""
+        if state.plc_connected:
             state.plc_connected = False
-            state.reset_to_defaults()
+            state.data_stale = True
+
+    def _mark_connected(self, state):
+        """Flags the configuration for a full rewrite after every (re)connect."""
+        if not state.plc_connected:
+            state.plc_connected = True
+            state.data_stale = False
+            state.config_altered = True
+            self.config_writer.reset()
+            self._last_responses.clear()
+            self._block_read_at.clear()
 
-    def _read_from_plc(self, state):
+    @staticmethod
+    def _compile_decoders(blocks, address_map):
+        """
+        Compiles an address map into one decode table per read block. A table lists the
+        (index in the response, attribute names) pairs of the block in address order,
+        so tags sharing an address are unpacked from a single lookup.
+        """
+        attrs_by_addr = {}
+        for attr, addr in address_map.items():
+            attrs_by_addr.setdefault(addr, []).append(attr)
+        return [
+            [(addr - start_addr, tuple(attrs)) for addr, attrs in sorted(attrs_by_addr.items())
+             if start_addr <= addr < start_addr + count]
+            for start_addr, count in blocks
+        ]
+
+    def _decode_block(self, state, table, values):
+        """
+        Unpacks one block response in a single pass, writing only the attributes that changed.
+        A response identical to the previous one of the same block is skipped entirely.
+        """
+        self._block_read_at[id(table)] = time.monotonic()
+        if self._last_responses.get(id(table)) == values:
+            return
+        self._last_responses[id(table)] = values
+        limit = len(values)
+        for index, attrs in table:
+            if index < limit:
+                value = values[index]
+                for attr in attrs:
+                    if getattr(state, attr) != value:
+                        setattr(state, attr, value)
+
+    def _send_write(self, client, method, address, values):
+        """
+        Issues a write (a coroutine on an async client) after forgetting the cached responses of
+        the read blocks it overlaps. Their next read is then decoded even if the PLC kept its
+        values, e.g. because the write failed, so a value changed locally by a command is
+        replaced by the PLC's.
+        """
+        count = len(values) if isinstance(values, list) else 1
+        if method in ('write_coil', 'write_coils'):
+            blocks, tables = self.coil_read_blocks, self.coil_decoders
+        else:
+            blocks, tables = self.register_read_blocks, self.register_decoders
+        for (start, length), table in zip(blocks, tables):
+            if start < address + count and address < start + length:
+                self._last_responses.pop(id(table), None)
+        return getattr(client, method)(address, values)
+
+    def _read_from_plc(self, state, groups=None):
         """Reads all required data points from the PLC using optimized block requests."""
-        for start_addr, count in self.coil_read_blocks:
+        coil_reads, register_reads = self._reads_for(groups)
+        for (start_addr, count), table in coil_reads:
             response = self.client.read_coils(start_addr, count=count)
             if not response.isError():
-                bits = response.bits
-                for attr, addr in self.read_coils_map.items():
-                    if start_addr <= addr < start_addr + count:
-                        index = addr - start_addr
-                        if 0 <= index < len(bits):
-                            setattr(state, attr, bits[index])
-
-        for start_addr, count in self.register_read_blocks:
+                self._decode_block(state, table, response.bits)
+
+        for (start_addr, count), table in register_reads:
             response = self.client.read_holding_registers(start_addr, count=count)
             if not response.isError():
-                regs = response.registers
-                for attr, addr in self.read_registers_map.items():
-                    if start_addr <= addr < start_addr + count:
-                        index = addr - start_addr
-                        if 0 <= index < len(regs):
-                            setattr(state, attr, regs[index])
+                self._decode_block(state, table, response.registers)
 
-    def _process_rfid_request(self, req_coil, regs_req, resp_coil, regs_resp, location):
+    def _process_rfid_requests(self):
         """
-        If the PLC has raised req_coil, read the card number from regs_req,
-        look up access rights in the DB, write a response to regs_resp,
-        raise resp_coil, log the event, and clear the request coil.
+        Scans all RFID readers with one coil block read. Only when a reader has raised its
+        request coil are the card registers of all readers fetched, again in one block read.
+        Access decisions are answered for every pending reader in the same cycle.
         """
-        req_bit_resp = self.client.read_coils(req_coil, count=1)
-        if req_bit_resp.isError() or not req_bit_resp.bits[0]:
+        coil_start, coil_count = self.rfid_coil_block
+        pending = self._pending_rfid_readers(self.client.read_coils(coil_start, count=coil_count))
+        if not pending:
             return
 
-        card_regs_resp = self.client.read_holding_registers(regs_req[0], count=3)
+        reg_start, reg_count = self.rfid_register_block
+        card_regs_resp = self.client.read_holding_registers(reg_start, count=reg_count)
         if card_regs_resp.isError():
             return
 
-        x, y, z = card_regs_resp.registers
+        register_frames, coil_frames = self._rfid_responses(pending, card_regs_resp.registers)
+        for start_addr, values in register_frames:
+            self._send_write(self.client, 'write_registers', start_addr, values)
+        for start_addr, values in coil_frames:
+            self._send_write(self.client, 'write_coils', start_addr, values)
+
+    def _pending_rfid_readers(self, response):
+        """Returns the readers whose request coil is raised in the RFID coil block response."""
+        if response.isError():
+            return []
+        coil_start = self.rfid_coil_block[0]
+        bits = response.bits
+        return [reader for reader in self.rfid_readers if bits[reader['req_coil'] - coil_start]]
+
+    def _rfid_responses(self, pending, registers):
+        """
+        Decides access for every pending reader and returns the (register_frames, coil_frames)
+        that answer them. Response registers of neighbouring pending readers are merged into one
+        frame by echoing back the card registers in between, which the PLC holds still until the
+        request is answered. Only the response coils are raised: the PLC grants access while it sees
+        its request coil and the response coil together, and then resets both itself. Clearing the
+        request coil in the same frame would make the PLC reject every card. Each reader's response
+        coil gets its own write_coils frame: the coils between them include the request coils of the
+        other readers, which the PLC may raise at any time, so they are never echoed back.
+        """
+        reg_start = self.rfid_register_block[0]
+        register_writes, card_fillers, coil_writes = {}, {}, {}
+        for reader in pending:
+            card_regs = [registers[addr - reg_start] for addr in reader['regs_req']]
+            card_fillers.update(zip(reader['regs_req'], card_regs))
+            resp_vals = self._authorize_card(card_regs, reader['location'])
+            register_writes.update(zip(reader['regs_resp'], resp_vals))
+            coil_writes[reader['resp_coil']] = True
+        return (coalesce_ranges(register_writes, card_fillers),
+                coalesce_ranges(coil_writes, max_len=MAX_WRITE_COILS))
+
+    def _authorize_card(self, card_regs, location):
+        """
+        Decodes the three card registers, decides access from the in-memory access index of
+        scada_db, records the decision and returns the register values to echo back (the card
+        on success, zeros otherwise).
+        """
+        x, y, z = card_regs
         full_card_value = (x << 32) | (y << 16) | z
         card_str = f"{full_card_value:010d}"
 
-        card_id = get_or_create_card(card_str)
-        has_permission = has_access(card_id, location) if card_id is not None else False
+        card_id, has_permission = authorize_card(card_str, location)
         if card_id is not None:
-            record_rfid_event(location, card_id, has_permission)
-
-        if has_permission:
-            resp_vals = [x, y, z]
+            self.journal.record_rfid_event(location, card_id, has_permission)
         else:
-            resp_vals = [0, 0, 0]
-        self.client.write_registers(regs_resp[0], resp_vals)
-
-        self.client.write_coil(resp_coil, True)
+            self.journal.write_events(self.card_guard.unknown_card_records(location, card_str))
 
-        self.client.write_coil(req_coil, False)
+        return [x, y, z] if has_permission else [0, 0, 0]
 
-    def _write_to_plc(self, state):
+    def _write_to_plc(self, state, scan_rfid=True):
         """
         Writes data to the PLC, handling RFID, immediate controls, and configuration.
         """
+        if scan_rfid:
+            self._process_rfid_requests()
 
-        self._process_rfid_request(
-            req_coil=100, regs_req=(100, 101, 102),
-            resp_coil=101, regs_resp=(103, 104, 105),
-            location="Lobby",
-        )
-        self._process_rfid_request(
-            req_coil=106, regs_req=(106, 107, 108),
-            resp_coil=107, regs_resp=(109, 110, 111),
-            location="Office 1",
-        )
-        self._process_rfid_request(
-            req_coil=112, regs_req=(112, 113, 114),
-            resp_coil=113, regs_resp=(115, 116, 117),
-            location="Office 2",
-        )
-        self._process_rfid_request(
-            req_coil=118, regs_req=(118, 119, 120),
-            resp_coil=119, regs_resp=(121, 122, 123),
-            location="Office 3",
-        )
-        self._process_rfid_request(
-            req_coil=124, regs_req=(124, 125, 126),
-            resp_coil=125, regs_resp=(127, 128, 129),
-            location="Parking lot",
-        )
+        for method, address, value in self._control_writes(state):
+            self._send_write(self.client, method, address, value)
+            self._last_written_controls[address] = value
 
+        if not state.config_altered:
+            return
+
+        frames = self.config_writer.frames(*self._config_values(state))
+        accepted = True
+        for method, address, values in frames:
+            response = self._send_write(self.client, method, address, values)
+            accepted = self.config_writer.confirm(method, address, values, response) and accepted
+
+        if frames and accepted:
+            self._send_write(self.client, 'write_coil', 495, True)
+
+        state.config_altered = not accepted
+
+    def _control_writes(self, state):
+        """Returns the (method, address, value) writes for controls that changed since the last cycle."""
+        writes = []
         control_coils = {
             128: state.force_park_open,
             129: state.force_park_close,
@@ -210,52 +492,168 @@ class PLCManager:
         }
         for addr, value in control_coils.items():
             if self._last_written_controls.get(addr) != value:
-                self.client.write_coil(addr, value)
-                self._last_written_controls[addr] = value
+                writes.append(('write_coil', addr, value))
 
         spots_taken_value = int(state.p_spots_taken)
         if self._last_written_controls.get(9) != spots_taken_value:
-            self.client.write_register(9, spots_taken_value)
-            self._last_written_controls[9] = spots_taken_value
+            writes.append(('write_register', 9, spots_taken_value))
+        return writes
+
+    def _config_values(self, state):
+        """Returns the ({coil: value}, {register: value}) image of the configuration held in state."""
+        coils = {0: state.cfg_heat_off_days}
+        coils.update(zip(range(1, 8), state.cfg_work_days))
+        coils.update({
+            26: state.cfg_test_fire,
+            27: state.cfg_test_security,
+            28: state.cfg_auto_lights_lobby,
+            29: state.cfg_wdonly_lights_l,
+            32: state.cfg_lobby_lights_mode == 'movement',
+            35: state.cfg_auto_lights_bldg,
+            36: state.cfg_wdonly_lights_b,
+            39: state.cfg_bldg_lights_mode == 'movement',
+            199: state.cfg_sim_io,
+        })
+        registers = {
+            0: self._scale_temp_for_write(state.cfg_work_temp),
+            1: self._scale_temp_tol_for_write(state.cfg_work_temp_tol),
+            2: self._scale_temp_for_write(state.cfg_non_work_temp),
+            3: int(state.cfg_work_start),
+            4: int(state.cfg_work_end),
+            5: int(state.cfg_cold_start),
+            6: int(state.cfg_cold_end),
+            8: int(state.cfg_park_spots),
+            10: int(state.cfg_max_park_spots),
+            14: self._scale_lux_for_write(state.cfg_light_thresh),
+            15: self._scale_lux_for_write(state.cfg_light_tol),
+        }
+        return coils, registers
 
-        if not state.config_altered:
+
+class AsyncPLCManager(PLCManager):
+    """
+    Asyncio variant of PLCManager built on AsyncModbusTcpClient.
+    pymodbus serializes the transactions of one connection, so the manager keeps a small
+    pool of connections and spreads independent requests over them. Block reads and the RFID
+    scan are sent concurrently and awaited together, so a cycle costs about the slowest
+    round trip instead of the sum of all of them.
+    """
+
+    def __init__(self, ip: str, port: int, connections: int = 4, client_factory=AsyncModbusTcpClient,
+                 connect_timeout: float = 2.0, store=None, journal=None, **mappings):
+        """
+        Initializes the manager and reuses the memory mappings and the store handling of PLCManager.
+        The async clients bind to the running event loop, so the pool is created when connecting.
+        """
+        super().__init__(ip, port, connect_timeout=connect_timeout, store=store, journal=journal, **mappings)
+        self.client_factory = client_factory
+        self.connections = max(1, connections)
+        self.clients = []
+        self._lanes = None
+        self.link = AsyncReconnectScheduler(self._open_pool, self.close, connect_timeout=connect_timeout)
+
+    def _next_client(self):
+        """Returns the next connection of the pool in round-robin order."""
+        return next(self._lanes)
+
+    def _link_alive(self):
+        return bool(self.clients) and all(client.connected for client in self.clients)
+
+    async def _open_pool(self):
+        """Creates a fresh connection pool and opens all of its connections concurrently."""
+        self.close()
+        self.clients = [self.client_factory(self.ip, port=self.port, timeout=self.connect_timeout)
+                        for _ in range(self.connections)]
+        self.client = self.clients[0]
+        self._lanes = itertools.cycle(self.clients)
+        await asyncio.gather(*(client.connect() for client in self.clients))
+        return self._link_alive()
+
+    def close(self):
+        """Closes every pooled connection."""
+        for client in self.clients:
+            client.close()
+
+    async def update(self, state, groups=None):
+        """
+        Runs one update cycle: pending control and configuration writes go first, then the
+        block reads and the RFID scan are issued concurrently. groups limits the cycle to
+        the tag groups that are due, as in PLCManager.update. Returns the ChangeSet of the cycle.
+        """
+        self._begin_cycle(state)
+        if not self.connect():
+            self._mark_disconnected(state)
+            return self._publish(state)
+
+        self._mark_connected(state)
+        try:
+            await self._write_to_plc(state)
+            await asyncio.gather(
+                self._read_from_plc(state, groups),
+                self._process_rfid_requests() if self._scans_rfid(groups) else asyncio.sleep(0),
+            )
+        except Exception as e:
+            print(f"PLC Communication Error: {e}")
+            self.link.connection_lost()
+            self._mark_disconnected(state)
+        return self._publish(state)
+
+    async def _read_from_plc(self, state, groups=None):
+        """Reads all blocks concurrently and decodes them once every response has arrived."""
+        coil_reads, register_reads = self._reads_for(groups)
+        responses = await asyncio.gather(
+            *(self._next_client().read_coils(start_addr, count=count) for (start_addr, count), _ in coil_reads),
+            *(self._next_client().read_holding_registers(start_addr, count=count)
+              for (start_addr, count), _ in register_reads),
+        )
+
+        for (_, table), response in zip(coil_reads, responses[:len(coil_reads)]):
+            if not response.isError():
+                self._decode_block(state, table, response.bits)
+        for (_, table), response in zip(register_reads, responses[len(coil_reads):]):
+            if not response.isError():
+                self._decode_block(state, table, response.registers)
+
+    async def _process_rfid_requests(self):
+        """Async counterpart of PLCManager._process_rfid_requests."""
+        client = self._next_client()
+        coil_start, coil_count = self.rfid_coil_block
+        pending = self._pending_rfid_readers(await client.read_coils(coil_start, count=coil_count))
+        if not pending:
             return
 
-        work_day_vals = [state.cfg_heat_off_days] + state.cfg_work_days
-        self.client.write_coils(0, work_day_vals)
-
-        test_mode_vals = [state.cfg_test_fire, state.cfg_test_security]
-        self.client.write_coils(26, test_mode_vals)
-
-        self.client.write_coil(28, state.cfg_auto_lights_lobby)
-        self.client.write_coil(29, state.cfg_wdonly_lights_l)
-        self.client.write_coil(32, state.cfg_lobby_lights_mode == 'movement')
-        self.client.write_coil(35, state.cfg_auto_lights_bldg)
-        self.client.write_coil(36, state.cfg_wdonly_lights_b)
-        self.client.write_coil(39, state.cfg_bldg_lights_mode == 'movement')
-
-        self.client.write_coil(199, state.cfg_sim_io)
-
-        temp_config_vals = [
-            self._scale_temp_for_write(state.cfg_work_temp),
-            self._scale_temp_tol_for_write(state.cfg_work_temp_tol),
-            self._scale_temp_for_write(state.cfg_non_work_temp),
-            int(state.cfg_work_start),
-            int(state.cfg_work_end),
-            int(state.cfg_cold_start),
-            int(state.cfg_cold_end)
-        ]
+        reg_start, reg_count = self.rfid_register_block
+        card_regs_resp = await client.read_holding_registers(reg_start, count=reg_count)
+        if card_regs_resp.isError():
+            return
+
+        register_frames, coil_frames = self._rfid_responses(pending, card_regs_resp.registers)
+        await asyncio.gather(*(self._send_write(self._next_client(), 'write_registers', start_addr, values)
+                               for start_addr, values in register_frames))
+        await asyncio.gather(*(self._send_write(self._next_client(), 'write_coils', start_addr, values)
+                               for start_addr, values in coil_frames))
 
-        self.client.write_registers(0, temp_config_vals)
+    async def _write_to_plc(self, state):
+        """
+        Writes changed controls and, when requested, the configuration diff. Writes to different
+        addresses are independent and are sent concurrently; the config handshake coil is
+        raised only after all configuration frames were accepted.
+        """
+        control_writes = self._control_writes(state)
+        frames = self.config_writer.frames(*self._config_values(state)) if state.config_altered else []
+        responses = await asyncio.gather(*(self._send_write(self._next_client(), method, address, value)
+                                           for method, address, value in control_writes + frames))
+        for _, address, value in control_writes:
+            self._last_written_controls[address] = value
 
-        self.client.write_registers(14, [
-            self._scale_lux_for_write(state.cfg_light_thresh),
-            self._scale_lux_for_write(state.cfg_light_tol),
-        ])
+        if not state.config_altered:
+            return
 
-        self.client.write_register(8, int(state.cfg_park_spots))
-        self.client.write_register(10, int(state.cfg_max_park_spots))
+        accepted = True
+        for (method, address, values), response in zip(frames, responses[len(control_writes):]):
+            accepted = self.config_writer.confirm(method, address, values, response) and accepted
 
-        self.client.write_coil(495, True)
+        if frames and accepted:
+            await self._send_write(self.client, 'write_coil', 495, True)
 
-        state.config_altered = False
+        state.config_altered = not accepted
@@ -0,0 +1,451 @@
+import asyncio
+import datetime
+import logging
+import time
+from pymodbus.datastore import ModbusBaseDeviceContext, ModbusServerContext
+from pymodbus.pdu import ExceptionResponse
+from pymodbus.server import StartAsyncTcpServer
+from fake_plc import PLCMemory
+
+log = logging.getLogger(__name__)
+
+# %I0.x digital inputs of the M221, by symbol. The program copies them to %M200 + x every scan.
+INPUTS = {
+    'o3_heater_enable': 0, 'o3_cooler_enable': 1,
+    'l_door_opened': 2, 'o1_door_opened': 3, 'o2_door_opened': 4, 'o3_door_opened': 5,
+    'p_gate_opened': 6, 'p_gate_closed': 7, 'p_gate_object': 8, 'p_gate_btn': 9,
+    'l_man_light': 10, 'b_man_light': 11, 'l_motion': 12, 'c_motion': 13, 'o_motion': 14,
+    'security_key': 15, 'f_alarm_btn': 16, 'f_alarm_stop': 17,
+    'o1_smoke': 18, 'o2_smoke': 19, 'o3_smoke': 20, 'l_smoke': 21, 'c1_smoke': 22, 'c2_smoke': 23,
+}
+SMOKE_COILS = (223, 222, 218, 219, 221, 220)
+
+# RFID reader: base address. Coils base..base+3 are request, response, accept and denied;
+# registers base..base+2 hold the card read by the reader, base+3..base+5 the app's response.
+RFID_READERS = {'lobby': 100, 'office1': 106, 'office2': 112, 'office3': 118, 'parking': 124}
+# Door lock output opened by an accepted card, per office reader.
+RFID_LOCKS = {'lobby': 226, 'office1': 227, 'office2': 228, 'office3': 229}
+
+RFID_LOCK_TIME = 3.0
+PGATE_TIMEOUT = 20.0
+ARMING_TIME = 60.0
+SECURITY_CALL_DELAY = 45.0
+MOVEMENT_LIGHT_TIME = 60.0
+GATE_TRAVEL_TIME = 2.0
+
+
+class BuildingSimulator:
+    """
+    Emulates the Building.smbp program of the Modicon M221 on a PLCMemory image, so the
+    app can be run and tested without EcoStruxure Machine Expert's simulator.
+    scan() executes one PLC cycle: input copy, fire system, RTC work day check, config checks,
+    security system, temperature regulation, RFID handshakes, parking gate and lights, in the
+    order of the MAIN task. Timers run on the simulated clock `now`, which advance() steps
+    forward, so tests can script minutes of building activity in milliseconds.
+    The parking gate motor is modelled too: while %Q0.6/%Q0.7 are on, the gate travels and
+    drives its open/closed limit switches.
+    """
+
+    def __init__(self, memory: PLCMemory = None, rtc=datetime.datetime.now, simulate_gate: bool = True):
+        self.memory = memory or PLCMemory()
+        self.inputs = [False] * len(INPUTS)
+        self.analog_inputs = [0, 0]
+        self.rtc = rtc
+        self.simulate_gate = simulate_gate
+        self.gate_position = 0.0
+        self.inputs[INPUTS['p_gate_closed']] = True
+        self.now = 0.0
+        self.scans = 0
+        self._last_scan = None
+        self._previous_coils = list(self.memory.coils)
+        self._previous_inputs = list(self.inputs)
+        self._pulse_triggers = {}
+        self._timers = {}
+
+    # --- Scripting -------------------------------------------------------------------------
+
+    def set_input(self, name: str, value: bool = True):
+        self.inputs[INPUTS[name]] = bool(value)
+
+    def input(self, name: str) -> bool:
+        return self.inputs[INPUTS[name]]
+
+    def set_temperature(self, deg_c: float):
+        """Sets the measured temperature (%IW0.0), scaled like the app's config registers."""
+        self.analog_inputs[0] = int(round((float(deg_c) + 50.0) * 10.0))
+
+    def set_light(self, lux: float):
+        """Sets the measured light level (%IW0.1), in units of 100 lux."""
+        self.analog_inputs[1] = int(max(0.0, min(100000.0, float(lux))) / 100.0)
+
+    def badge(self, reader: str, card_number: int):
+        """Presents a card to a reader: the reader stores it and raises its request coil."""
+        base = RFID_READERS[reader]
+        card_number = int(card_number)
+        self.memory.registers[base:base + 3] = [(card_number >> 32) & 0xFFFF,
+                                                (card_number >> 16) & 0xFFFF, card_number & 0xFFFF]
+        self.memory.coils[base] = True
+
+    def advance(self, seconds: float, scan_time: float = 0.01):
+        """Runs the program for `seconds` of simulated time, one scan every scan_time."""
+        end = self.now + seconds
+        while self.now < end:
+            self.now = min(end, self.now + scan_time)
+            self.scan()
+
+    def pulse_input(self, name: str, seconds: float, scan_time: float = 0.01):
+        """Holds an input on for `seconds` of simulated time, then releases it for one scan."""
+        self.set_input(name, True)
+        self.advance(seconds, scan_time)
+        self.set_input(name, False)
+        self.advance(scan_time, scan_time)
+
+    # --- Ladder primitives -----------------------------------------------------------------
+
+    def _rose(self, address: int) -> bool:
+        """LDR %M: the coil is set now and was not at the end of the previous scan."""
+        return self.memory.coils[address] and not self._previous_coils[address]
+
+    def _fell(self, address: int) -> bool:
+        """LDF %M: the coil was set at the end of the previous scan and is not now."""
+        return self._previous_coils[address] and not self.memory.coils[address]
+
+    def _input_rose(self, index: int) -> bool:
+        """LDR %I0.x."""
+        return self.inputs[index] and not self._previous_inputs[index]
+
+    def _input_fell(self, index: int) -> bool:
+        """LDF %I0.x."""
+        return self._previous_inputs[index] and not self.inputs[index]
+
+    def _on_delay(self, key, enabled: bool, preset: float) -> bool:
+        """TON timer: Q is set once IN has been on for preset seconds."""
+        if not enabled:
+            self._timers.pop(key, None)
+            return False
+        return self.now - self._timers.setdefault(key, self.now) >= preset
+
+    def _pulse(self, key, trigger: bool, preset: float) -> bool:
+        """TP timer: Q is set for preset seconds from a rising edge of IN."""
+        started = trigger and not self._pulse_triggers.get(key, False)
+        self._pulse_triggers[key] = trigger
+        if started and key not in self._timers:
+            self._timers[key] = self.now
+        if key in self._timers and self.now - self._timers[key] >= preset:
+            del self._timers[key]
+        return key in self._timers
+
+    def _word(self, address: int) -> int:
+        """Reads a %MW register as the signed INT the program compares it as."""
+        value = self.memory.registers[address]
+        return value - 0x10000 if value & 0x8000 else value
+
+    def _set_word(self, address: int, value: int):
+        self.memory.registers[address] = value & 0xFFFF
+
+    # --- Program ---------------------------------------------------------------------------
+
+    def scan(self):
+        """Executes one PLC cycle."""
+        m = self.memory.coils
+        if not m[199]:
+            self._simulate_gate()
+            self._record_inputs()
+        self._fire_system()
+        self._rtc_logic()
+        if m[495]:
+            self._config_checks()
+        if not m[511]:
+            self._security_system()
+        self._temp_regulator()
+        if not m[511]:
+            self._rfid('lobby')
+        if not m[511] and not m[25]:
+            self._rfid('office1')
+        if not m[511]:
+            self._rfid('office2')
+            self._rfid('office3')
+        if not m[511] and not m[13]:
+            self._rfid('parking')
+        self._pgate_logic()
+        if not m[511] and (m[13] or m[14]):
+            self._pgate_occupancy()
+        self._special_behavior()
+        if not m[511] and not m[20]:
+            self._lights(auto=28, weekdays_only=29, button_enable=30, output=234, changed=33,
+                         changed_set=33, movement=34, movement_mode=32, timer='TM8')
+            self._lights(auto=35, weekdays_only=36, button_enable=37, output=235, changed=40,
+                         changed_set=41, movement=41, movement_mode=39, timer='TM9')
+        self._previous_coils[:] = self.memory.coils
+        self._previous_inputs[:] = self.inputs
+        self.scans += 1
+
+    def _simulate_gate(self):
+        m = self.memory.coils
+        if self.simulate_gate:
+            elapsed = self.now - self._last_scan if self._last_scan is not None else 0.0
+            direction = (1 if m[230] else 0) - (1 if m[231] else 0)
+            self.gate_position = max(0.0, min(1.0, self.gate_position + direction * elapsed / GATE_TRAVEL_TIME))
+            self.inputs[INPUTS['p_gate_opened']] = self.gate_position >= 1.0
+            self.inputs[INPUTS['p_gate_closed']] = self.gate_position <= 0.0
+        self._last_scan = self.now
+
+    def _record_inputs(self):
+        self.memory.coils[200:200 + len(self.inputs)] = self.inputs
+        self._set_word(200, self.analog_inputs[0])
+        self._set_word(201, self.analog_inputs[1])
+
+    def _fire_system(self):
+        m, i = self.memory.coils, self.inputs
+        smoke_rose = any(self._rose(a) for a in SMOKE_COILS)
+        if smoke_rose or self._rose(216):
+            m[497] = True
+            if not m[26]:
+                m[238] = True
+        if smoke_rose:
+            self._set_word(13, self._word(13) + 1)
+        if any(self._fell(a) for a in SMOKE_COILS):
+            self._set_word(13, self._word(13) - 1)
+        if m[497] and self._word(13) > 1:
+            m[511] = True
+            if not m[26]:
+                m[236] = True
+        if (m[497] and self._word(13) == 0) or self._fell(497):
+            m[236] = False
+        if self._fell(497):
+            m[511] = False
+        m[224] = m[497]
+        if self._input_rose(17) and not i[16] and not any(i[18:24]):
+            m[497] = False
+            m[238] = False
+
+    def _rtc_logic(self):
+        m = self.memory.coils
+        now = self.rtc()
+        work_day = m[now.isoweekday()]
+        m[8] = (not m[509] and work_day
+                and self._word(3) <= now.hour <= self._word(4))
+
+    def _config_checks(self):
+        m, w = self.memory.coils, self._word
+        if m[0]:
+            m[510] = not (1 <= w(5) <= 12 and 1 <= w(6) <= 12)
+        any_work_day = any(m[1:8])
+        if any_work_day:
+            m[509] = not (0 < w(3) < 24 and 0 < w(4) < 24 and w(3) <= w(4))
+        else:
+            m[509] = False
+        if any_work_day:
+            m[508] = not (0 <= w(0) <= 1000 and w(0) + w(1) <= 1000 and w(0) - w(1) >= 0)
+        if m[0]:
+            m[508] = not (0 <= w(2) <= 1000 and w(2) + w(1) <= 1000 and w(2) - w(1) >= 0)
+        if m[28] or m[35]:
+            m[505] = not (0 <= w(14) <= 1000 and w(14) - w(15) >= 0 and w(14) + w(15) <= 1000)
+        if w(8) > w(10) or w(8) < 0 or w(10) < 0 or w(9) < 0 or w(9) > w(10):
+            m[507] = True
+        if w(8) <= w(10) and w(8) >= 0 and w(10) >= 0 and w(9) >= 0:
+            m[507] = False
+        if not m[507] and m[499]:
+            m[499] = False
+        m[495] = False
+
+    def _security_system(self):
+        m = self.memory.coils
+        if self._input_rose(15):
+            m[18] = True
+        if self._on_delay('TM5', m[18], ARMING_TIME):
+            m[18] = False
+            m[19] = True
+        if self._input_fell(15):
+            m[18] = m[19] = m[20] = False
+        if any(m[a] for a in (202, 203, 204, 205, 212, 213, 214)) and m[19]:
+            m[20] = True
+        m[237] = self._on_delay('TM6', m[20], SECURITY_CALL_DELAY) and not m[27]
+        m[225] = m[20]
+
+    def _temp_regulator(self):
+        m, w, i = self.memory.coils, self._word, self.inputs
+        month = self.rtc().month
+        m[9] = not m[510] and ((w(5) <= w(6) and w(5) <= month <= w(6))
+                                or (w(5) > w(6) and (1 <= month <= w(6) or w(5) <= month <= 12)))
+        temp = self.analog_inputs[0]
+        m[232] = (not m[511] and i[0]
+                  and ((m[8] and temp < w(0) - w(1)) or (m[0] and m[9] and temp < w(2) - w(1))))
+        m[233] = not m[511] and i[1] and m[8] and temp > w(0) + w(1)
+
+    def _rfid(self, reader: str):
+        m, w = self.memory.coils, self._word
+        base = RFID_READERS[reader]
+        request, response, accept, denied = base, base + 1, base + 2, base + 3
+        card = [w(base), w(base + 1), w(base + 2)]
+        if m[request] and card == [0, 0, 0]:
+            m[denied] = True
+        if not m[request] and m[response]:
+            m[denied] = True
+        if not m[denied] and m[request] and m[response] and card == [w(base + 3), w(base + 4), w(base + 5)]:
+            m[accept] = True
+        if not m[denied] and m[request] and m[response] and not m[accept]:
+            m[denied] = True
+
+        if reader in RFID_LOCKS:
+            lock = RFID_LOCKS[reader]
+            unlocked = self._pulse(('lock', reader), m[accept], RFID_LOCK_TIME)
+            if unlocked:
+                m[lock] = True
+            if m[accept] and not unlocked:
+                m[accept] = False
+                m[lock] = False
+        elif self._rose(accept):
+            m[14] = True
+
+        if self._rose(accept) or self._rose(denied):
+            self.memory.registers[base:base + 6] = [0] * 6
+            m[request] = m[response] = False
+        if self._rose(denied):
+            m[denied] = False
+
+    def _pgate_logic(self):
+        m = self.memory.coils
+        m[239] = m[17] or m[511]
+        if not m[511] and not m[14] and self._input_rose(9):
+            m[13] = m[126] = True
+        if self._rose(511):
+            m[128] = True
+            m[129] = False
+        m[498] = not m[13] and not m[14] and not m[207]
+        if (self._rose(128) and not m[129]) or (self._rose(129) and not m[128]):
+            m[13] = m[14] = m[126] = False
+        m[230] = m[128] and not m[129] and not m[206]
+        m[231] = m[129] and not m[128] and not m[208] and not m[207]
+        m[506] = m[128] and m[129]
+
+    def _pgate_occupancy(self):
+        m, i, w = self.memory.coils, self.inputs, self._word
+        if self._input_rose(7):
+            if m[14]:
+                m[14] = False
+            if m[13]:
+                m[13] = False
+            self._set_word(11, 0)
+        m[230] = m[126] and not i[6]
+        timed_out = self._on_delay('TM4', m[126] and i[6], PGATE_TIMEOUT)
+        car_passed = self._input_fell(8)
+        if timed_out or car_passed:
+            m[126] = False
+        if car_passed:
+            if m[14]:
+                self._set_word(9, w(9) + 1)
+            if m[13]:
+                self._set_word(9, w(9) - 1)
+            self._set_word(11, w(11) + 1)
+        if car_passed and (w(9) > w(10) or w(9) < 0 or w(11) > 1):
+            m[499] = True
+        if car_passed:
+            m[17] = w(9) >= w(8)
+        m[231] = not i[7] and not m[126] and not i[8]
+
+    def _special_behavior(self):
+        m = self.memory.coils
+        if self._rose(511):
+            m[234] = m[235] = True
+        if self._fell(511):
+            m[234] = m[235] = False
+        if not m[511] and self._rose(20):
+            m[234] = True
+            m[235] = False
+        if not m[511]:
+            if self._rose(25):
+                m[226] = True
+            if self._fell(25):
+                m[226] = False
+        if self._rose(511):
+            m[226] = m[227] = m[228] = m[229] = True
+        if self._fell(511):
+            m[226] = m[227] = m[228] = m[229] = False
+
+    def _lights(self, auto, weekdays_only, button_enable, output, changed, changed_set, movement,
+                movement_mode, timer):
+        m, w = self.memory.coils, self._word
+        m[button_enable] = not m[auto] or (m[auto] and m[weekdays_only] and not m[8])
+        if self._fell(button_enable):
+            m[output] = False
+        button_pressed = self._rose(211)
+        if m[button_enable] and button_pressed and not m[output]:
+            m[output] = True
+            m[changed_set] = True
+        if not m[changed] and m[button_enable] and button_pressed and m[output]:
+            m[output] = False
+        if m[changed]:
+            m[changed] = False
+        if m[212] and m[movement_mode]:
+            m[movement] = True
+        if not m[button_enable] and (m[movement] or not m[movement_mode]) and w(201) <= w(14):
+            m[output] = True
+        if self._pulse(timer, m[movement], MOVEMENT_LIGHT_TIME):
+            m[output] = False
+            m[movement] = False
+        if m[output] and not m[movement_mode] and w(201) > w(14) + w(15):
+            m[output] = False
+
+    # --- Real time -------------------------------------------------------------------------
+
+    async def run(self, scan_time: float = 0.01):
+        """Scans the program forever in real time, as the PLC does."""
+        started = time.monotonic() - self.now
+        while True:
+            self.now = time.monotonic() - started
+            self.scan()
+            await asyncio.sleep(scan_time)
+
+
+class SimulatorContext(ModbusBaseDeviceContext):
+    """Serves the %M coils and %MW holding registers of a PLCMemory to pymodbus requests."""
+
+    def __init__(self, memory: PLCMemory):
+        self.memory = memory
+
+    def reset(self):
+        self.memory.coils[:] = [False] * len(self.memory.coils)
+        self.memory.registers[:] = [0] * len(self.memory.registers)
+
+    def _table(self, fc_as_hex):
+        table = {'c': self.memory.coils, 'h': self.memory.registers}.get(self.decode(fc_as_hex))
+        if table is None:
+            raise ValueError(f"Function code {fc_as_hex} is not supported by the M221 simulator")
+        return table
+
+    def getValues(self, fc_as_hex, address, count=1):
+        table = self._table(fc_as_hex)
+        if address < 0 or address + count > len(table):
+            raise ValueError(f"Address range {address}..{address + count - 1} is out of bounds")
+        return table[address:address + count]
+
+    def setValues(self, fc_as_hex, address, values):
+        table = self._table(fc_as_hex)
+        if address < 0 or address + len(values) > len(table):
+            return ExceptionResponse.ILLEGAL_ADDRESS
+        if table is self.memory.coils:
+            table[address:address + len(values)] = [bool(v) for v in values]
+        else:
+            table[address:address + len(values)] = [int(v) & 0xFFFF for v in values]
+        return None
+
+
+async def serve(simulator: BuildingSimulator, host: str = '127.0.0.1', port: int = 502, scan_time: float = 0.01):
+    """Runs the simulator's scan loop and a Modbus TCP server on host:port until cancelled."""
+    context = ModbusServerContext(devices=SimulatorContext(simulator.memory), single=True)
+    scan_task = asyncio.ensure_future(simulator.run(scan_time))
+    log.info(f"M221 simulator listening on {host}:{port}")
+    try:
+        await StartAsyncTcpServer(context=context, address=(host, port))
+    finally:
+        scan_task.cancel()
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    simulator = BuildingSimulator()
+    simulator.set_temperature(21.0)
+    simulator.set_light(30000)
+    asyncio.run(serve(simulator, port=int(sys.argv[1]) if len(sys.argv) > 1 else 502))
@@ -0,0 +1,61 @@
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class TagGroup:
+    """A set of tags polled together, with its own period (s) and priority (0 = most urgent)."""
+
+    def __init__(self, name: str, period: float, priority: int, tags=()):
+        self.name = name
+        self.period = period
+        self.priority = priority
+        self.tags = tuple(tags)
+        self.release = 0.0
+        self.runs = 0
+        self.misses = 0
+        self.max_lateness = 0.0
+
+
+class PollScheduler:
+    """
+    Decides which tag groups are due for polling. Releases are kept on a fixed grid
+    (release += period) instead of sleeping a fixed time after each cycle, so the schedule
+    does not drift with cycle duration. A group misses its deadline when its read completes
+    after release + period; missed periods are counted, reported to on_miss(group, overrun)
+    and skipped so the group realigns with the grid instead of bursting to catch up.
+    """
+
+    def __init__(self, groups, clock=time.monotonic, on_miss=None):
+        self.groups = sorted(groups, key=lambda group: group.priority)
+        self.clock = clock
+        self.on_miss = on_miss
+        now = clock()
+        for group in self.groups:
+            group.release = now
+
+    def due(self):
+        """Returns the groups whose release time has come, most urgent first."""
+        now = self.clock()
+        return [group for group in self.groups if group.release <= now]
+
+    def complete(self, groups):
+        """Records that the given groups were polled and schedules their next release."""
+        now = self.clock()
+        for group in groups:
+            group.runs += 1
+            group.max_lateness = max(group.max_lateness, now - group.release)
+            overrun = now - (group.release + group.period)
+            if group.period > 0 and overrun > 0:
+                missed = int((now - group.release) // group.period)
+                group.misses += missed
+                group.release += missed * group.period
+                log.warning(f"Poll group '{group.name}' missed its deadline by {overrun * 1000:.0f} ms")
+                if self.on_miss:
+                    self.on_miss(group, overrun)
+            group.release += group.period
+
+    def next_wakeup(self) -> float:
+        """Seconds until the next group is due."""
+        return max(0.0, min(group.release for group in self.groups) - self.clock())
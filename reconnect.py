@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import random
+import threading
+
+log = logging.getLogger(__name__)
+
+DISCONNECTED = 'disconnected'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+BACKOFF = 'backoff'
+
+
+class Backoff:
+    """Exponential backoff with jitter: base * 2^attempt, capped at max_delay, randomized by +-jitter."""
+
+    def __init__(self, base_delay: float = 0.5, max_delay: float = 30.0, jitter: float = 0.5):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** self.attempt))
+        self.attempt += 1
+        return delay * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class ReconnectScheduler:
+    """
+    Keeps a PLC link connected from a background thread, so the poll loop never blocks on a
+    TCP connect. At most one reconnect worker runs at a time; failed attempts are retried with
+    exponential backoff and jitter. Every state change is reported to the listeners as
+    listener(old_state, new_state).
+    """
+
+    def __init__(self, connect, close, backoff: Backoff = None):
+        self._connect = connect
+        self._close = close
+        self.backoff = backoff or Backoff()
+        self.state = DISCONNECTED
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stop = threading.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self.state == CONNECTED
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _set_state(self, new_state):
+        old_state, self.state = self.state, new_state
+        if old_state != new_state:
+            log.info(f"PLC link: {old_state} -> {new_state}")
+            for listener in self.listeners:
+                listener(old_state, new_state)
+
+    def ensure_connecting(self):
+        """Starts the reconnect worker unless the link is up or a worker is already running."""
+        with self._lock:
+            if self.connected or (self._worker and self._worker.is_alive()):
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def connection_lost(self):
+        """Called by the poller when a request failed: closes the link and schedules a reconnect."""
+        self._close()
+        self._set_state(DISCONNECTED)
+        self.ensure_connecting()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._set_state(CONNECTING)
+            try:
+                ok = self._connect()
+            except Exception as e:
+                log.info(f"PLC connect error: {e}")
+                ok = False
+            if ok:
+                self.backoff.reset()
+                self._set_state(CONNECTED)
+                return
+            self._close()
+            self._set_state(BACKOFF)
+            self._stop.wait(self.backoff.next_delay())
+        self._set_state(DISCONNECTED)
+
+
+class AsyncReconnectScheduler(ReconnectScheduler):
+    """ReconnectScheduler for asyncio links: the worker is a task on the running event loop."""
+
+    def __init__(self, connect, close, backoff: Backoff = None, connect_timeout: float = 3.0):
+        super().__init__(connect, close, backoff)
+        self.connect_timeout = connect_timeout
+
+    def ensure_connecting(self):
+        if self.connected or (self._worker and not self._worker.done()):
+            return
+        self._stop.clear()
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while not self._stop.is_set():
+            self._set_state(CONNECTING)
+            try:
+                ok = await asyncio.wait_for(self._connect(), self.connect_timeout)
+            except Exception as e:
+                log.info(f"PLC connect error: {e!r}")
+                ok = False
+            if ok:
+                self.backoff.reset()
+                self._set_state(CONNECTED)
+                return
+            self._close()
+            self._set_state(BACKOFF)
+            await asyncio.sleep(self.backoff.next_delay())
+        self._set_state(DISCONNECTED)
@@ -1,15 +1,218 @@
 import sqlite3
 import datetime
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 
 DB_NAME = 'scada.db'
+# Each thread keeps one long-lived connection per database file. Set to False to open and close
+# a connection on every call, as the module did originally (see benchmark).
+POOL_CONNECTIONS = True
+# Applied to every pooled connection. WAL lets readers run while the poller writes; with WAL,
+# synchronous=NORMAL only syncs at checkpoints and stays safe against corruption. auto_vacuum
+# only takes effect in a new file, before WAL writes its header; see incremental_vacuum.
+CONNECTION_PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA temp_store = MEMORY",
+)
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT = 5.0
+_local = threading.local()
+# {DB_NAME: ({event name: event_id}, {location name: location_id})}, see reference_ids.
+_reference_ids = {}
+# Statements run through execute_query that can change the Events or Locations tables.
+_REFERENCE_TABLE_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE|DROP|ALTER)\b.*\b(Events|Locations)\b',
+                                    re.IGNORECASE | re.DOTALL)
+# {DB_NAME: {card_number: (card_id, frozenset of the location names it may enter)}}, see access_index.
+_access_index = {}
+# {DB_NAME: OrderedDict of card numbers known not to be in Cards}, least recently seen first.
+_unknown_cards = {}
+UNKNOWN_CARD_CACHE_SIZE = 4096
+# UnknownCards keeps the counters of at most this many (card, reader) pairs, the most recently seen.
+UNKNOWN_CARDS_LIMIT = 10000
+# Statements run through execute_query that can change an access decision.
+_ACCESS_TABLE_WRITE = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE|DROP|ALTER)\b.*\b(People|Cards|Accesses|Locations)\b',
+                                 re.IGNORECASE | re.DOTALL)
+# Actions of the event records handled by write_events: (action, event_name, location_name, detail).
+# detail is is_resolved for LOG_EVENT, unused for RESOLVE_EVENT, the card_id for RFID_EVENT and
+# the card number for UNKNOWN_CARD, which counts an attempt in UnknownCards instead of the Log.
+LOG_EVENT = 'log'
+RESOLVE_EVENT = 'resolve'
+RFID_EVENT = 'rfid'
+UNKNOWN_CARD = 'unknown_card'
+# Resolved Log rows move from the hot Log table to monthly partition tables once their month is
+# older than the LOG_HOT_MONTHS latest ones (the current month counts), see roll_log_partitions.
+LOG_HOT_MONTHS = 1
+# Partitions of the months before the LOG_KEEP_MONTHS latest ones are exported to archive files
+# and dropped from the database; their LogDaily rollups stay. See archive_log_partitions.
+LOG_KEEP_MONTHS = 12
+LOG_ROLL_CHUNK = 5000
+_LOG_COLUMNS = "log_id, event_id, timestamp, location_id, card_id, is_resolved"
+# Schema changes on top of the tables create_tables creates, as (description, statements), applied
+# in order by migrate. PRAGMA user_version records how many a database file has had, so an
+# existing scada.db is upgraded in place the next time it is opened.
+MIGRATIONS = [
+    ('hot-path indexes', (
+        # Only unresolved rows are indexed: the duplicate check of log_event and the subquery of
+        # resolve_event find them by event and location, latest timestamp first. Replaced by
+        # ActiveAlarms in migration 3.
+        "CREATE INDEX IF NOT EXISTS idx_log_unresolved ON Log (event_id, location_id, timestamp) "
+        "WHERE is_resolved = 0",
+        "CREATE INDEX IF NOT EXISTS idx_log_timestamp ON Log (timestamp)",
+        # Lets deleting a card find its Log rows (ON DELETE SET NULL); most rows have no card.
+        "CREATE INDEX IF NOT EXISTS idx_log_card ON Log (card_id) WHERE card_id IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_accesses_card_location ON Accesses (card_id, location_id)",
+        "CREATE INDEX IF NOT EXISTS idx_cards_person ON Cards (person_id)",
+    )),
+    ('unknown card counters', (
+        # Badges that match no card are counted per reader here instead of being added to Cards.
+        '''
+        CREATE TABLE IF NOT EXISTS UnknownCards (
+            card_number TEXT NOT NULL,
+            location_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            first_seen DATETIME NOT NULL,
+            last_seen DATETIME NOT NULL,
+            PRIMARY KEY (card_number, location_id),
+            FOREIGN KEY (location_id) REFERENCES Locations (location_id)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_unknown_cards_last_seen ON UnknownCards (last_seen)",
+    )),
+    ('active alarms', (
+        # One pointer to the open Log row of every unresolved (event, location), maintained by
+        # triggers on Log whoever writes it, so raising and resolving is a primary key lookup.
+        '''
+        CREATE TABLE IF NOT EXISTS ActiveAlarms (
+            event_id INTEGER NOT NULL,
+            location_id INTEGER NOT NULL,
+            log_id INTEGER NOT NULL,
+            PRIMARY KEY (event_id, location_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS log_opens_alarm AFTER INSERT ON Log WHEN NEW.is_resolved = 0
+        BEGIN
+            INSERT OR REPLACE INTO ActiveAlarms (event_id, location_id, log_id)
+            VALUES (NEW.event_id, NEW.location_id, NEW.log_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS log_closes_alarm AFTER UPDATE OF is_resolved ON Log WHEN NEW.is_resolved != 0
+        BEGIN
+            DELETE FROM ActiveAlarms
+            WHERE event_id = NEW.event_id AND location_id = NEW.location_id AND log_id = NEW.log_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS log_drops_alarm AFTER DELETE ON Log WHEN OLD.is_resolved = 0
+        BEGIN
+            DELETE FROM ActiveAlarms
+            WHERE event_id = OLD.event_id AND location_id = OLD.location_id AND log_id = OLD.log_id;
+        END
+        ''',
+        # The newest unresolved row of each pair is the one resolve_event used to pick.
+        '''
+        INSERT OR IGNORE INTO ActiveAlarms (event_id, location_id, log_id)
+        SELECT event_id, location_id, log_id FROM Log WHERE is_resolved = 0 ORDER BY timestamp DESC
+        ''',
+        "DROP INDEX IF EXISTS idx_log_unresolved",
+    )),
+    ('log partitions', (
+        # Months moved out of Log, with the archive file of those whose table has been dropped.
+        '''
+        CREATE TABLE IF NOT EXISTS LogPartitions (
+            month TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            archive_path TEXT
+        )
+        ''',
+        # Events per day, event and location of the rows moved out of Log.
+        '''
+        CREATE TABLE IF NOT EXISTS LogDaily (
+            day TEXT NOT NULL,
+            event_id INTEGER NOT NULL,
+            location_id INTEGER NOT NULL,
+            events INTEGER NOT NULL,
+            PRIMARY KEY (day, event_id, location_id)
+        ) WITHOUT ROWID
+        ''',
+        # Log and every partition still in the file; rebuilt when partitions come and go.
+        f"CREATE VIEW IF NOT EXISTS LogHistory AS SELECT {_LOG_COLUMNS} FROM Log",
+    )),
+    ('analog history', (
+        # Blocks of compressed analog points, see analog_historian. times and vals are separately
+        # compressed columns of the block's points; the open block of a tag is rewritten in place.
+        '''
+        CREATE TABLE IF NOT EXISTS AnalogHistory (
+            tag TEXT NOT NULL,
+            start_time REAL NOT NULL,
+            end_time REAL NOT NULL,
+            points INTEGER NOT NULL,
+            times BLOB NOT NULL,
+            vals BLOB NOT NULL,
+            PRIMARY KEY (tag, start_time)
+        )
+        ''',
+    )),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
 
 
 def connect_db():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+    """
+    Returns the calling thread's connection to DB_NAME, opening and configuring it on first use.
+    Callers hand it back with release_db instead of closing it.
+    """
+    if not POOL_CONNECTIONS:
+        conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(DB_NAME)
+    if conn is None:
+        conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute("PRAGMA foreign_keys = ON")
+        connections[DB_NAME] = conn
     return conn
 
 
+def release_db(conn):
+    """
+    Ends a call's use of a connection: rolls back a transaction left open by an error, and
+    closes the connection unless it is pooled.
+    """
+    if conn.in_transaction:
+        conn.rollback()
+    if not POOL_CONNECTIONS:
+        conn.close()
+
+
+def close_connections():
+    """Closes the calling thread's pooled connections, e.g. before deleting a database file."""
+    for conn in getattr(_local, 'connections', {}).values():
+        conn.close()
+    _local.connections = {}
+
+
+def remove_database(path: str):
+    """Deletes a scratch database file with its WAL files, closing this thread's connections first."""
+    close_connections()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+
 def create_tables():
     """Creates all necessary tables in the database if they don't already exist."""
     conn = connect_db()
@@ -85,61 +288,221 @@ def create_tables():
     ''')
 
     conn.commit()
-    conn.close()
+    try:
+        migrate(conn)
+    finally:
+        release_db(conn)
+    invalidate_reference_ids()
+    reload_access_index()
 
 
-def log_event(event_name: str, location_name: str, card_number: str = None, is_resolved: bool = False):
-    """Logs a generic event, checking for existing unresolved events to avoid duplicates."""
-    conn = connect_db()
+def schema_version(cursor) -> int:
+    """The number of MIGRATIONS the database has had."""
+    return cursor.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """
+    Applies the MIGRATIONS the database has not had yet, each in its own transaction together
+    with its user_version bump, and returns the schema version reached.
+    """
     cursor = conn.cursor()
-    cursor.execute('SELECT event_id FROM Events WHERE name = ?', (event_name,))
-    event_id_res = cursor.fetchone()
-    cursor.execute('SELECT location_id FROM Locations WHERE name = ?', (location_name,))
-    location_id_res = cursor.fetchone()
+    for number, (description, statements) in enumerate(MIGRATIONS, start=1):
+        if schema_version(cursor) >= number:
+            continue
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another process may have just applied it.
+            if schema_version(cursor) < number:
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error in migration {number} ({description}): {e}")
+            conn.rollback()
+            raise
+    return schema_version(cursor)
+
+
+def reference_ids(cursor=None):
+    """
+    The ({event name: event_id}, {location name: location_id}) maps of the small reference tables,
+    loaded once per database file and kept until invalidate_reference_ids.
+    """
+    tables = _reference_ids.get(DB_NAME)
+    if tables is None:
+        conn = None
+        if cursor is None:
+            conn = connect_db()
+            cursor = conn.cursor()
+        events = dict(cursor.execute('SELECT name, event_id FROM Events').fetchall())
+        locations = dict(cursor.execute('SELECT name, location_id FROM Locations').fetchall())
+        if conn is not None:
+            release_db(conn)
+        tables = _reference_ids[DB_NAME] = (events, locations)
+    return tables
+
+
+def invalidate_reference_ids():
+    """Drops the cached Events and Locations ids of DB_NAME; they are reloaded on next use."""
+    _reference_ids.pop(DB_NAME, None)
+
+
+_ACTIVE_ALARM_SQL = "SELECT log_id FROM ActiveAlarms WHERE event_id = ? AND location_id = ?"
+_RESOLVE_LOG_SQL = "UPDATE Log SET is_resolved = 1 WHERE log_id = ?"
+_HAS_ACCESS_SQL = "SELECT 1 FROM Accesses WHERE card_id = ? AND location_id = ?"
+
+
+def _log_event(cursor, event_name, location_name, card_number=None, is_resolved=False, timestamp=None):
+    """Inserts a Log row unless the same event is already active (unresolved) at the location."""
+    event_ids, location_ids = reference_ids(cursor)
+    event_id = event_ids.get(event_name)
+    location_id = location_ids.get(location_name)
     int_card_id = None
     if card_number:
         cursor.execute('SELECT card_id FROM Cards WHERE card_number = ?', (card_number,))
         card_pk_res = cursor.fetchone()
         if card_pk_res:
             int_card_id = card_pk_res[0]
-    if event_id_res and location_id_res:
-        event_id = event_id_res[0]
-        location_id = location_id_res[0]
-        cursor.execute('''
-            SELECT log_id FROM Log
-            WHERE event_id = ? AND location_id = ? AND is_resolved = 0
-        ''', (event_id, location_id))
+    if event_id is not None and location_id is not None:
+        cursor.execute(_ACTIVE_ALARM_SQL, (event_id, location_id))
         if not cursor.fetchone():
             cursor.execute('''
                 INSERT INTO Log (event_id, timestamp, location_id, card_id, is_resolved)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (event_id, datetime.datetime.now(), location_id, int_card_id, is_resolved))
-    conn.commit()
-    conn.close()
+            ''', (event_id, timestamp or datetime.datetime.now(), location_id, int_card_id, is_resolved))
+
+
+def _resolve_event(cursor, event_name, location_name):
+    """Marks the active Log row of the event at the location as resolved, which closes the alarm."""
+    event_ids, location_ids = reference_ids(cursor)
+    event_id = event_ids.get(event_name)
+    location_id = location_ids.get(location_name)
+    if event_id is not None and location_id is not None:
+        cursor.execute(_ACTIVE_ALARM_SQL, (event_id, location_id))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute(_RESOLVE_LOG_SQL, (row[0],))
+
+
+def log_event(event_name: str, location_name: str, card_number: str = None, is_resolved: bool = False):
+    """Logs a generic event, checking for existing unresolved events to avoid duplicates."""
+    conn = connect_db()
+    try:
+        _log_event(conn.cursor(), event_name, location_name, card_number, is_resolved)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error in log_event: {e}")
+        conn.rollback()
+    finally:
+        release_db(conn)
 
 
 def resolve_event(event_name: str, location_name: str):
     """Marks the latest unresolved event of a specific type and location as resolved."""
     conn = connect_db()
+    try:
+        _resolve_event(conn.cursor(), event_name, location_name)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error in resolve_event: {e}")
+        conn.rollback()
+    finally:
+        release_db(conn)
+
+
+def _record_rfid_event(cursor, event_name, location_name, card_id, timestamp=None):
+    """Inserts an already resolved RFID access row for the card."""
+    event_ids, location_ids = reference_ids(cursor)
+    event_id = event_ids.get(event_name)
+    location_id = location_ids.get(location_name)
+    if event_id is not None and location_id is not None:
+        cursor.execute(
+            "INSERT INTO Log (event_id, timestamp, location_id, card_id, is_resolved) VALUES (?, ?, ?, ?, ?)",
+            (event_id, timestamp or datetime.datetime.now(), location_id, card_id, True)
+        )
+
+
+_COUNT_UNKNOWN_CARD_SQL = '''
+    INSERT INTO UnknownCards (card_number, location_id, attempts, first_seen, last_seen)
+    VALUES (?, ?, 1, ?, ?)
+    ON CONFLICT (card_number, location_id) DO UPDATE
+    SET attempts = attempts + 1, last_seen = excluded.last_seen
+'''
+_PRUNE_UNKNOWN_CARDS_SQL = '''
+    DELETE FROM UnknownCards
+    WHERE last_seen < (SELECT last_seen FROM UnknownCards ORDER BY last_seen DESC LIMIT 1 OFFSET ?)
+'''
+
+
+def _count_unknown_card(cursor, location_name, card_number, timestamp):
+    """Counts one attempt of an unknown card at the location in UnknownCards."""
+    location_id = reference_ids(cursor)[1].get(location_name)
+    if location_id is not None:
+        cursor.execute(_COUNT_UNKNOWN_CARD_SQL, (card_number, location_id, timestamp, timestamp))
+
+
+def _write_event_record(cursor, record, timestamp) -> bool:
+    """Applies one event record; returns True for an UNKNOWN_CARD record."""
+    action, event_name, location_name, detail = record
+    if action == LOG_EVENT:
+        _log_event(cursor, event_name, location_name, is_resolved=detail, timestamp=timestamp)
+    elif action == RESOLVE_EVENT:
+        _resolve_event(cursor, event_name, location_name)
+    elif action == UNKNOWN_CARD:
+        _count_unknown_card(cursor, location_name, detail, timestamp)
+        return True
+    else:
+        _record_rfid_event(cursor, event_name, location_name, detail, timestamp)
+    return False
+
+
+def write_event_batches(batches) -> bool:
+    """
+    Applies (records, timestamp) batches in order, all in a single transaction. Each record is
+    (action, event_name, location_name, detail): LOG_EVENT records are logged as by log_event,
+    RESOLVE_EVENT records resolved as by resolve_event, RFID_EVENT records inserted as by
+    record_rfid_event and UNKNOWN_CARD records counted in UnknownCards, which is then pruned
+    to UNKNOWN_CARDS_LIMIT rows. Rows get the timestamp of their batch, or the current time.
+    Every record runs in its own savepoint, so a record that fails is rolled back and reported
+    on its own while the rest are written. Returns False when the transaction itself failed
+    (e.g. the database stayed locked) and nothing was written, so the caller can retry.
+    """
+    try:
+        conn = connect_db()
+    except sqlite3.Error as e:
+        print(f"Database error in write_event_batches: {e}")
+        return False
     cursor = conn.cursor()
-    cursor.execute('SELECT event_id FROM Events WHERE name = ?', (event_name,))
-    event_id_res = cursor.fetchone()
-    cursor.execute('SELECT location_id FROM Locations WHERE name = ?', (location_name,))
-    location_id_res = cursor.fetchone()
-    if event_id_res and location_id_res:
-        event_id = event_id_res[0]
-        location_id = location_id_res[0]
-        cursor.execute('''
-            UPDATE Log
-            SET is_resolved = 1
-            WHERE log_id = (
-                SELECT log_id FROM Log
-                WHERE event_id = ? AND location_id = ? AND is_resolved = 0
-                ORDER BY timestamp DESC LIMIT 1
-            )
-        ''', (event_id, location_id))
-    conn.commit()
-    conn.close()
+    unknown_cards = False
+    try:
+        cursor.execute("BEGIN")
+        for records, timestamp in batches:
+            timestamp = timestamp or datetime.datetime.now()
+            for record in records:
+                cursor.execute("SAVEPOINT event_record")
+                try:
+                    unknown_cards |= _write_event_record(cursor, record, timestamp)
+                except (sqlite3.Error, ValueError, TypeError) as e:
+                    print(f"Skipped event record {record!r} in write_event_batches: {e}")
+                    cursor.execute("ROLLBACK TO event_record")
+                cursor.execute("RELEASE event_record")
+        if unknown_cards:
+            cursor.execute(_PRUNE_UNKNOWN_CARDS_SQL, (UNKNOWN_CARDS_LIMIT - 1,))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error in write_event_batches: {e}")
+        conn.rollback()
+        return False
+    finally:
+        release_db(conn)
+
+
+def write_events(records, timestamp=None) -> bool:
+    """Applies one batch of event records in a single transaction; see write_event_batches."""
+    return write_event_batches([(records, timestamp)])
 
 
 def execute_query(query: str, params=()):
@@ -147,22 +510,26 @@ def execute_query(query: str, params=()):
     conn = connect_db()
     cursor = conn.cursor()
     try:
-        cursor.execute("PRAGMA foreign_keys = ON;")
         cursor.execute(query, params)
         columns = [description[0] for description in cursor.description] if cursor.description else []
         results = cursor.fetchall()
         conn.commit()
+        if _REFERENCE_TABLE_WRITE.match(query):
+            invalidate_reference_ids()
+        if _ACCESS_TABLE_WRITE.match(query):
+            reload_access_index()
         return columns, results, None
     except sqlite3.Error as e:
         conn.rollback()
         return [], [], str(e)
     finally:
-        conn.close()
+        release_db(conn)
 
 
-def get_logs():
-    """Retrieves the last 25 log entries with detailed information."""
-    query = """
+# The 25 latest rows of the Log and its partitions; each one is read newest first from its
+# timestamp index and merged, so only the top of each index is touched.
+_RECENT_LOG_ROWS_SQL = "SELECT * FROM LogHistory ORDER BY timestamp DESC LIMIT 25"
+_RECENT_LOGS_SQL = f"""
     SELECT
         l.log_id AS id,
         e.name AS event,
@@ -171,12 +538,64 @@ def get_logs():
         COALESCE(c.card_number, 'N/A') AS card,
         COALESCE(p.first_name || ' ' || p.last_name, 'N/A') AS owner,
         l.is_resolved AS resolved
-    FROM Log l
+    FROM ({_RECENT_LOG_ROWS_SQL}) l
     JOIN Events e ON l.event_id = e.event_id
     JOIN Locations loc ON l.location_id = loc.location_id
     LEFT JOIN Cards c ON l.card_id = c.card_id
     LEFT JOIN People p ON c.person_id = p.person_id
-    ORDER BY l.timestamp DESC
+    ORDER BY l.timestamp DESC;
+"""
+
+
+def get_logs():
+    """Retrieves the last 25 log entries with detailed information."""
+    return execute_query(_RECENT_LOGS_SQL)
+
+
+def get_daily_summary(days: int = 31):
+    """Retrieves the number of events per day, event and location over the last `days` days."""
+    query = """
+    SELECT d.day, e.name AS event, loc.name AS location, SUM(d.events) AS events
+    FROM (
+        SELECT day, event_id, location_id, events FROM LogDaily WHERE day >= date('now', 'localtime', ?)
+        UNION ALL
+        SELECT date(timestamp), event_id, location_id, 1 FROM Log WHERE timestamp >= date('now', 'localtime', ?)
+    ) d
+    JOIN Events e ON d.event_id = e.event_id
+    JOIN Locations loc ON d.location_id = loc.location_id
+    GROUP BY d.day, d.event_id, d.location_id
+    ORDER BY d.day DESC, events DESC;
+    """
+    since = f'-{days} days'
+    return execute_query(query, (since, since))
+
+
+def get_active_alarms():
+    """Retrieves every unresolved event, newest first, from ActiveAlarms without scanning the Log."""
+    query = """
+    SELECT
+        l.log_id AS id,
+        e.name AS event,
+        loc.name AS location,
+        l.timestamp AS since,
+        COALESCE(c.card_number, 'N/A') AS card
+    FROM ActiveAlarms a
+    JOIN Log l ON a.log_id = l.log_id
+    JOIN Events e ON a.event_id = e.event_id
+    JOIN Locations loc ON a.location_id = loc.location_id
+    LEFT JOIN Cards c ON l.card_id = c.card_id
+    ORDER BY l.timestamp DESC;
+    """
+    return execute_query(query)
+
+
+def get_unknown_cards():
+    """Retrieves the 25 unknown card numbers with the most attempts, per reader location."""
+    query = """
+    SELECT u.card_number, loc.name AS location, u.attempts, u.first_seen, u.last_seen
+    FROM UnknownCards u
+    JOIN Locations loc ON u.location_id = loc.location_id
+    ORDER BY u.attempts DESC, u.last_seen DESC
     LIMIT 25;
     """
     return execute_query(query)
@@ -276,7 +695,7 @@ def get_or_create_card(card_number: str) -> int:
         print(f"Database error in get_or_create_card: {e}")
         conn.rollback()
     finally:
-        conn.close()
+        release_db(conn)
     return card_id
 
 
@@ -289,47 +708,398 @@ def has_access(card_id: int, location_name: str) -> bool:
     cur = conn.cursor()
     ok = False
     try:
-        cur.execute("""
-            SELECT 1 FROM Accesses A
-            JOIN Locations L ON A.location_id = L.location_id
-            WHERE A.card_id = ? AND L.name = ?
-        """, (card_id, location_name))
-        ok = cur.fetchone() is not None
+        location_id = reference_ids(cur)[1].get(location_name)
+        if location_id is not None:
+            cur.execute(_HAS_ACCESS_SQL, (card_id, location_id))
+            ok = cur.fetchone() is not None
     except sqlite3.Error as e:
         print(f"Database error in has_access: {e}")
     finally:
-        conn.close()
+        release_db(conn)
     return ok
 
 
-def record_rfid_event(location_name: str, card_id: int, success: bool):
+_CARD_ACCESS_SQL = '''
+    SELECT c.card_number, c.card_id, loc.name
+    FROM Cards c
+    LEFT JOIN Accesses a ON a.card_id = c.card_id
+    LEFT JOIN Locations loc ON loc.location_id = a.location_id
+'''
+
+
+def _load_card_access(cursor, where='', params=()):
+    """{card_number: (card_id, frozenset of location names)} of the cards matching the WHERE clause."""
+    cards = {}
+    for card_number, card_id, location_name in cursor.execute(_CARD_ACCESS_SQL + where, params).fetchall():
+        locations = cards.setdefault(card_number, (card_id, set()))[1]
+        if location_name is not None:
+            locations.add(location_name)
+    return {card_number: (card_id, frozenset(locations)) for card_number, (card_id, locations) in cards.items()}
+
+
+def reload_access_index():
     """
-    Logs 'successful_rfid_access' or 'unsuccessful_rfid_access' for a
-    specific card at a location with the current timestamp.
-    These events are considered momentary and are immediately marked as resolved.
+    Rebuilds the access index of DB_NAME from Cards and Accesses and swaps it in whole, so a
+    poller deciding meanwhile sees either the old index or the new one. Returns it.
+    """
+    conn = connect_db()
+    try:
+        index = _load_card_access(conn.cursor())
+    finally:
+        release_db(conn)
+    _access_index[DB_NAME] = index
+    _unknown_cards.pop(DB_NAME, None)
+    return index
+
+
+def access_index():
+    """
+    The {card_number: (card_id, frozenset of allowed location names)} index of DB_NAME. It is
+    built by create_tables and rebuilt after every write through execute_query to the tables
+    it is derived from (add_card, add_access, remove_card, remove_access, remove_person, ...).
+    """
+    index = _access_index.get(DB_NAME)
+    return index if index is not None else reload_access_index()
+
+
+def authorize_card(card_number: str, location_name: str):
+    """
+    Returns (card_id, allowed) for a badge at a location from the access index, without a query
+    for cards it knows. A card missing from the index is looked up once, in case another
+    process added it; card numbers found in neither are remembered in a bounded negative
+    cache, so they cost one probe from then on. Unknown cards are never added to Cards:
+    card_id is None for them (see unknown_card_record).
+    """
+    index = access_index()
+    entry = index.get(card_number)
+    if entry is None:
+        unknown = _unknown_cards.setdefault(DB_NAME, OrderedDict())
+        if card_number in unknown:
+            unknown.move_to_end(card_number)
+            return None, False
+        conn = connect_db()
+        try:
+            entry = _load_card_access(conn.cursor(), 'WHERE c.card_number = ?', (card_number,)).get(card_number)
+        except sqlite3.Error as e:
+            print(f"Database error in authorize_card: {e}")
+            return None, False
+        finally:
+            release_db(conn)
+        if entry is None:
+            unknown[card_number] = True
+            if len(unknown) > UNKNOWN_CARD_CACHE_SIZE:
+                unknown.popitem(last=False)
+            return None, False
+        index[card_number] = entry
+    card_id, locations = entry
+    return card_id, location_name in locations
+
+
+_ANALOG_BLOCKS_SQL = '''
+    SELECT start_time, points, times, vals FROM AnalogHistory
+    WHERE tag = ? AND start_time <= ? AND start_time >= COALESCE(
+        (SELECT MAX(start_time) FROM AnalogHistory WHERE tag = ? AND start_time <= ?), 0)
+    ORDER BY start_time
+'''
+
+
+def write_analog_blocks(blocks) -> bool:
+    """
+    Stores (tag, start_time, end_time, points, times, vals) AnalogHistory blocks, replacing those
+    with the same start, in one transaction. Returns False when nothing was written.
+    """
+    conn = connect_db()
+    try:
+        conn.executemany("INSERT OR REPLACE INTO AnalogHistory (tag, start_time, end_time, points, times, vals) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", blocks)
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error in write_analog_blocks: {e}")
+        conn.rollback()
+        return False
+    finally:
+        release_db(conn)
+
+
+def read_analog_blocks(tag: str, since: float, until: float):
+    """
+    The (start_time, points, times, vals) AnalogHistory blocks of a tag that overlap since..until
+    (epoch seconds), oldest first: the block holding `since` and every later one starting by `until`.
     """
-    event_name = 'successful_rfid_access' if success else 'unsuccessful_rfid_access'
     conn = connect_db()
-    cur = conn.cursor()
     try:
-        cur.execute("SELECT event_id FROM Events WHERE name = ?", (event_name,))
-        event_id_res = cur.fetchone()
-        cur.execute("SELECT location_id FROM Locations WHERE name = ?", (location_name,))
-        location_id_res = cur.fetchone()
-
-        if event_id_res and location_id_res:
-            event_id = event_id_res[0]
-            location_id = location_id_res[0]
-            cur.execute(
-                "INSERT INTO Log (event_id, timestamp, location_id, card_id, is_resolved) VALUES (?, ?, ?, ?, ?)",
-                (event_id, datetime.datetime.now(), location_id, card_id, True)
+        return conn.execute(_ANALOG_BLOCKS_SQL, (tag, until, tag, since)).fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error in read_analog_blocks: {e}")
+        return []
+    finally:
+        release_db(conn)
+
+
+def _month_start(day, months_back: int = 0) -> str:
+    """The 'YYYY-MM-01' first day of the month `months_back` months before the month of day."""
+    index = day.year * 12 + day.month - 1 - months_back
+    return f"{index // 12:04d}-{index % 12 + 1:02d}-01"
+
+
+def _rebuild_log_history(cursor):
+    """Recreates the LogHistory view over Log and the partitions still in the file."""
+    tables = [row[0] for row in cursor.execute(
+        "SELECT table_name FROM LogPartitions WHERE archive_path IS NULL ORDER BY month").fetchall()]
+    cursor.execute("DROP VIEW IF EXISTS LogHistory")
+    cursor.execute("CREATE VIEW LogHistory AS "
+                   + " UNION ALL ".join(f'SELECT {_LOG_COLUMNS} FROM "{table}"' for table in ['Log'] + tables))
+
+
+def _partition_table(cursor, month: str) -> str:
+    """The partition table of a 'YYYY-MM' month, created (again, if it was archived) when missing."""
+    table = f"Log_{month.replace('-', '_')}"
+    row = cursor.execute("SELECT archive_path FROM LogPartitions WHERE month = ?", (month,)).fetchone()
+    if row is None or row[0] is not None:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS "{table}" (
+                log_id INTEGER PRIMARY KEY,
+                event_id INTEGER NOT NULL,
+                timestamp DATETIME NOT NULL,
+                location_id INTEGER NOT NULL,
+                card_id INTEGER,
+                is_resolved BOOLEAN NOT NULL
             )
+        ''')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table.lower()}_timestamp" ON "{table}" (timestamp)')
+        cursor.execute("INSERT OR REPLACE INTO LogPartitions (month, table_name) VALUES (?, ?)", (month, table))
+        _rebuild_log_history(cursor)
+    return table
+
+
+_ROLL_UP_SQL = '''
+    INSERT INTO LogDaily (day, event_id, location_id, events)
+    SELECT date(timestamp), event_id, location_id, COUNT(*) FROM Log
+    WHERE log_id IN (SELECT log_id FROM temp.rolling)
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, event_id, location_id) DO UPDATE SET events = events + excluded.events
+'''
+
+
+def roll_log_partitions(now=None, hot_months: int = LOG_HOT_MONTHS, chunk: int = LOG_ROLL_CHUNK) -> int:
+    """
+    Moves the resolved Log rows older than the `hot_months` latest months into the partition
+    table of their month, adding them to the LogDaily rollups. Rows move `chunk` at a time, each
+    chunk in its own transaction, so the event writer never waits long. Unresolved rows stay
+    in Log until they are resolved. Returns the number of rows moved.
+    """
+    cutoff = _month_start(now or datetime.datetime.now(), hot_months - 1)
+    conn = connect_db()
+    cursor = conn.cursor()
+    moved = 0
+    try:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS rolling (log_id INTEGER PRIMARY KEY)")
+        while True:
+            cursor.execute("BEGIN IMMEDIATE")
+            row = cursor.execute("SELECT substr(timestamp, 1, 7) FROM Log WHERE timestamp < ? AND is_resolved != 0 "
+                                 "ORDER BY timestamp LIMIT 1", (cutoff,)).fetchone()
+            if row is None:
+                conn.commit()
+                break
+            month_start = row[0] + '-01'
+            table = _partition_table(cursor, row[0])
+            cursor.execute('''
+                INSERT INTO temp.rolling
+                SELECT log_id FROM Log
+                WHERE timestamp >= ? AND timestamp < ? AND is_resolved != 0
+                ORDER BY timestamp LIMIT ?
+            ''', (month_start, _month_start(datetime.date.fromisoformat(month_start), -1), chunk))
+            cursor.execute(f'INSERT INTO "{table}" SELECT {_LOG_COLUMNS} FROM Log '
+                           'WHERE log_id IN (SELECT log_id FROM temp.rolling)')
+            cursor.execute(_ROLL_UP_SQL)
+            cursor.execute("DELETE FROM Log WHERE log_id IN (SELECT log_id FROM temp.rolling)")
+            moved += cursor.rowcount
+            cursor.execute("DELETE FROM temp.rolling")
             conn.commit()
     except sqlite3.Error as e:
-        print(f"Database error in record_rfid_event: {e}")
+        print(f"Database error in roll_log_partitions: {e}")
         conn.rollback()
     finally:
-        conn.close()
+        release_db(conn)
+    return moved
+
+
+def log_archive_path(month: str) -> str:
+    """The archive file of a 'YYYY-MM' partition, next to DB_NAME."""
+    return f"{os.path.splitext(DB_NAME)[0]}_log_{month}.db"
+
+
+def archive_log_partitions(keep_months: int, now=None):
+    """
+    Exports the partitions of the months before the `keep_months` latest ones to standalone
+    archive files (log_archive_path), with their LogDaily rollups and copies of Events and
+    Locations, then drops them from the database and from LogHistory. The rollups stay. An
+    export is idempotent, so an interrupted one is simply redone. Returns the archived months.
+    """
+    oldest_kept = _month_start(now or datetime.datetime.now(), keep_months - 1)[:7]
+    conn = connect_db()
+    cursor = conn.cursor()
+    archived = []
+    try:
+        partitions = cursor.execute("SELECT month, table_name FROM LogPartitions "
+                                    "WHERE archive_path IS NULL AND month < ? ORDER BY month",
+                                    (oldest_kept,)).fetchall()
+        for month, table in partitions:
+            path = log_archive_path(month)
+            cursor.execute("ATTACH DATABASE ? AS archive", (path,))
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                for name in ('Events', 'Locations'):
+                    cursor.execute(f"CREATE TABLE IF NOT EXISTS archive.{name} AS SELECT * FROM main.{name}")
+                cursor.execute(f'CREATE TABLE IF NOT EXISTS archive.Log AS SELECT * FROM "{table}" WHERE 0')
+                cursor.execute(f'INSERT INTO archive.Log SELECT * FROM "{table}" '
+                               'WHERE log_id NOT IN (SELECT log_id FROM archive.Log)')
+                cursor.execute("CREATE TABLE IF NOT EXISTS archive.LogDaily AS SELECT * FROM main.LogDaily WHERE 0")
+                cursor.execute("DELETE FROM archive.LogDaily WHERE substr(day, 1, 7) = ?", (month,))
+                cursor.execute("INSERT INTO archive.LogDaily SELECT * FROM main.LogDaily WHERE substr(day, 1, 7) = ?",
+                               (month,))
+                conn.commit()
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                cursor.execute("DETACH DATABASE archive")
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(f'DROP TABLE "{table}"')
+            cursor.execute("UPDATE LogPartitions SET archive_path = ? WHERE month = ?", (path, month))
+            _rebuild_log_history(cursor)
+            conn.commit()
+            archived.append(month)
+    except sqlite3.Error as e:
+        print(f"Database error in archive_log_partitions: {e}")
+        conn.rollback()
+    finally:
+        release_db(conn)
+    return archived
+
+
+def incremental_vacuum(pages: int = 0, convert: bool = False):
+    """
+    Returns up to `pages` free pages (all of them with 0) to the filesystem. Files created before
+    auto_vacuum=INCREMENTAL was set are left alone unless `convert` is set, which switches them
+    with a one-off full VACUUM that locks the database while it runs. Returns the number of
+    free pages left, or None on error.
+    """
+    conn = connect_db()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if not convert:
+                return conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        # The pragma frees one page per step, and only executescript steps it to the end.
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Database error in incremental_vacuum: {e}")
+        return None
+    finally:
+        release_db(conn)
+
+
+def rfid_event_record(location_name: str, card_id: int, success: bool):
+    """The RFID_EVENT record of an access decision."""
+    event_name = 'successful_rfid_access' if success else 'unsuccessful_rfid_access'
+    return RFID_EVENT, event_name, location_name, card_id
+
+
+def unknown_card_record(location_name: str, card_number: str):
+    """The UNKNOWN_CARD record of a badge that matches no card."""
+    return UNKNOWN_CARD, 'unsuccessful_rfid_access', location_name, card_number
+
+
+def record_rfid_event(location_name: str, card_id: int, success: bool):
+    """
+    Logs 'successful_rfid_access' or 'unsuccessful_rfid_access' for a
+    specific card at a location with the current timestamp.
+    These events are considered momentary and are immediately marked as resolved.
+    """
+    write_events([rfid_event_record(location_name, card_id, success)])
+
+
+# The queries on the poll and RFID paths, with sample parameters, for check_query_plans.
+HOT_QUERIES = {
+    'active alarm lookup': (_ACTIVE_ALARM_SQL, (1, 1)),
+    'resolve_event': (_RESOLVE_LOG_SQL, (1,)),
+    'has_access': (_HAS_ACCESS_SQL, (1, 1)),
+    # get_logs then joins the names to these rows and sorts them again.
+    'get_logs': (_RECENT_LOG_ROWS_SQL, ()),
+    'unknown card pruning': (_PRUNE_UNKNOWN_CARDS_SQL, (UNKNOWN_CARDS_LIMIT - 1,)),
+    'analog trend blocks': (_ANALOG_BLOCKS_SQL, ('o3_temp', 0.0, 'o3_temp', 0.0)),
+}
+
+
+def query_plan(query: str, params=()):
+    """The detail lines of EXPLAIN QUERY PLAN for a query on DB_NAME."""
+    conn = connect_db()
+    try:
+        return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()]
+    finally:
+        release_db(conn)
+
+
+def check_query_plans():
+    """
+    Returns {name: plan lines} of the HOT_QUERIES that scan a table or sort rows in a temporary
+    b-tree instead of using an index; empty when they all use indexes.
+    """
+    failing = {}
+    for name, (query, params) in HOT_QUERIES.items():
+        plan = query_plan(query, params)
+        if any(line.startswith('SCAN') and 'USING' not in line or 'TEMP B-TREE' in line for line in plan):
+            failing[name] = plan
+    return failing
+
+
+def benchmark(calls: int = 300):
+    """
+    Per-call latency of the current functions on the poll and RFID paths, first unpooled (a fresh
+    connection per call, rollback journal mode), then with pooled connections in WAL mode. Both
+    runs time the same code with POOL_CONNECTIONS switched, not the implementation before pooling,
+    so the difference is what pooling and WAL alone buy. Each run uses its own scratch database.
+    """
+    import tempfile
+    global DB_NAME, POOL_CONNECTIONS
+
+    saved = DB_NAME, POOL_CONNECTIONS
+    results = {}
+    try:
+        for pooled in (False, True):
+            scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+            scratch.close()
+            DB_NAME, POOL_CONNECTIONS = scratch.name, pooled
+            create_tables()
+            card_id = get_or_create_card('0000012345')
+            add_access(card_id, 1)
+            timed = {
+                'has_access': lambda: has_access(card_id, 'Lobby'),
+                'authorize_card': lambda: authorize_card('0000012345', 'Lobby'),
+                'get_or_create_card': lambda: get_or_create_card('0000012345'),
+                'log_event': lambda: log_event('alarm_was_triggered', 'Lobby', is_resolved=True),
+                'record_rfid_event': lambda: record_rfid_event('Lobby', card_id, True),
+                'get_logs': get_logs,
+            }
+            for name, call in timed.items():
+                started = time.perf_counter()
+                for _ in range(calls):
+                    call()
+                results[name, pooled] = (time.perf_counter() - started) / calls
+            remove_database(scratch.name)
+    finally:
+        DB_NAME, POOL_CONNECTIONS = saved
+    print(f"{'call':<20} {'unpooled':>16} {'pooled + WAL':>14}")
+    for name in timed:
+        print(f"{name:<20} {results[name, False] * 1e6:>13.1f} us {results[name, True] * 1e6:>11.1f} us")
+
 
+create_tables()
 
-create_tables()
\ No newline at end of file
+if __name__ == "__main__":
+    for name, plan in check_query_plans().items():
+        print(f"{name} does not use an index: {'; '.join(plan)}")
+    benchmark()
@@ -0,0 +1,152 @@
+import asyncio
+import statistics
+import time
+from app_state import AppState
+from plc_logic import AsyncPLCManager
+from poll_scheduler import PollScheduler, TagGroup
+
+
+class Controller:
+    """One PLC of the site: its connection settings, its manager and the state it keeps up to date."""
+
+    def __init__(self, name: str, ip: str, port: int, state=None, manager=None, tag_groups=None,
+                 **manager_options):
+        self.name = name
+        self.ip = ip
+        self.port = port
+        self.state = state if state is not None else AppState()
+        self.manager = manager or AsyncPLCManager(ip, port, **manager_options)
+        self.scheduler = PollScheduler(tag_groups or self.manager.tag_groups())
+        self.cycles = 0
+        self.cycle_times = []
+
+    def record_cycle(self, elapsed: float, keep: int = 1000):
+        """Keeps the duration of the last `keep` poll cycles for reporting."""
+        self.cycles += 1
+        self.cycle_times.append(elapsed)
+        if len(self.cycle_times) > keep:
+            del self.cycle_times[0]
+
+
+class SiteRegistry:
+    """The controllers of a site, keyed by name. The first one added is the primary building."""
+
+    def __init__(self):
+        self.controllers = {}
+
+    @classmethod
+    def from_config(cls, sites, primary_state=None, primary_store=None, **common):
+        """
+        Builds a registry from a list of {'name', 'ip', 'port', ...} dicts (see definitions.SITES).
+        The primary controller shares primary_state, which is the state the UI displays, or
+        polls the state of primary_store and drains its commands. common options (e.g. journal)
+        are passed to every controller.
+        """
+        registry = cls()
+        for index, site in enumerate(sites):
+            options = dict(common, **site)
+            if index == 0 and primary_store is not None:
+                options['state'], options['store'] = primary_store.state, primary_store
+            elif index == 0 and primary_state is not None:
+                options['state'] = primary_state
+            registry.add(**options)
+        return registry
+
+    def add(self, name: str, ip: str, port: int, **options) -> Controller:
+        if name in self.controllers:
+            raise ValueError(f"Controller '{name}' is already registered")
+        controller = Controller(name, ip, port, **options)
+        self.controllers[name] = controller
+        return controller
+
+    def get(self, name: str) -> Controller:
+        return self.controllers[name]
+
+    @property
+    def primary(self) -> Controller:
+        return next(iter(self.controllers.values()))
+
+    def __iter__(self):
+        return iter(self.controllers.values())
+
+    def __len__(self):
+        return len(self.controllers)
+
+
+class SitePoller:
+    """
+    Polls every controller of a registry on one shared event loop. Each controller runs in its
+    own task driven by its own PollScheduler, so a slow or unreachable PLC only ever delays itself.
+    on_cycle(controller, changes) is called after every completed cycle with its ChangeSet.
+    """
+
+    def __init__(self, registry: SiteRegistry, on_cycle=None):
+        self.registry = registry
+        self.on_cycle = on_cycle
+
+    async def run(self):
+        await asyncio.gather(*(self._poll(controller) for controller in self.registry))
+
+    async def _poll(self, controller: Controller):
+        scheduler = controller.scheduler
+        while True:
+            groups = scheduler.due()
+            if groups:
+                started = time.monotonic()
+                changes = await controller.manager.update(controller.state, groups)
+                scheduler.complete(groups)
+                controller.record_cycle(time.monotonic() - started)
+                if self.on_cycle:
+                    self.on_cycle(controller, changes)
+            await asyncio.sleep(scheduler.next_wakeup())
+
+
+async def _benchmark_site(count: int, duration: float, rtt: float, period_scale: float):
+    from fake_plc import PLCMemory, FakeAsyncModbusClient
+
+    registry = SiteRegistry()
+    clients = []
+
+    def fake_client(memory, **options):
+        client = FakeAsyncModbusClient(memory, **options)
+        clients.append(client)
+        return client
+
+    for i in range(count):
+        memory = PLCMemory()
+        controller = registry.add(f"plc{i}", '127.0.0.1', 5020 + i,
+                                  client_factory=lambda ip, mem=memory, **_: fake_client(mem, rtt=rtt, jitter=rtt))
+        controller.scheduler = PollScheduler([TagGroup(g.name, g.period * period_scale, g.priority, g.tags)
+                                              for g in controller.scheduler.groups])
+    # One controller is unreachable and takes 2 s to time out on every connect attempt.
+    registry.add("offline", '127.0.0.1', 1,
+                 client_factory=lambda ip, **_: FakeAsyncModbusClient(PLCMemory(), reachable=False,
+                                                                       connect_delay=2.0))
+    task = asyncio.ensure_future(SitePoller(registry).run())
+    await asyncio.sleep(duration)
+    task.cancel()
+
+    online = [c for c in registry if c.name != "offline"]
+    times = sorted(t for c in online for t in c.cycle_times)
+    cycles = sum(c.cycles for c in online)
+    misses = sum(g.misses for c in online for g in c.scheduler.groups)
+    return (cycles / duration, sum(c.transactions for c in clients) / duration, statistics.median(times) * 1000,
+            times[int(len(times) * 0.99) - 1] * 1000, misses)
+
+
+def benchmark(counts=(10, 50, 100), duration: float = 5.0, rtt: float = 0.005, period_scale: float = 0.0):
+    """
+    Measures polling throughput for simulated controllers served from in-process fake clients
+    with rtt..2*rtt latency. Group periods are multiplied by period_scale; 0 polls every
+    controller back to back, 1 uses the production schedule.
+    """
+    print(f"{'PLCs':>5} {'cycles/s':>10} {'Modbus tx/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'misses':>7}")
+    for count in counts:
+        rate, tx_rate, p50, p99, misses = asyncio.run(_benchmark_site(count, duration, rtt, period_scale))
+        print(f"{count:>5} {rate:>10.1f} {tx_rate:>12.1f} {p50:>8.2f} {p99:>8.2f} {misses:>7}")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(period_scale=float(sys.argv[1]) if len(sys.argv) > 1 else 0.0)
+
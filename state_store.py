@@ -0,0 +1,67 @@
+# state_store.py
+from collections import deque
+from app_state import AppState
+
+# Settings only the UI thread writes and the poller never reads; views take them from the live state.
+UI_SETTINGS = ('lang',)
+
+
+class StateStore:
+    """
+    Single-writer home of the live AppState of one PLC. Only the poller thread changes `state`:
+    other threads queue commands with submit(), which the poller applies between cycles, and
+    read published frames, immutable snapshots swapped in with a single reference assignment.
+    Neither side ever waits for the other: the queue is a deque, whose append and popleft are
+    atomic, and a frame is replaced rather than modified.
+    """
+
+    def __init__(self, state=None):
+        self.state = state if state is not None else AppState()
+        self.commands = deque()
+        self._latest = (0, self.state.get_snapshot())
+
+    def submit(self, **values):
+        """Queues attribute assignments that the poller applies together, e.g. submit(force_park_open=True)."""
+        self.commands.append(values)
+
+    def apply_commands(self, state=None) -> int:
+        """
+        Poller side: applies the commands queued so far, in order, and publishes a frame if there
+        were any. Commands submitted meanwhile wait for the next cycle, so a busy UI cannot stall
+        the poller. Returns the number of commands applied.
+        """
+        state = state if state is not None else self.state
+        applied = len(self.commands)
+        for _ in range(applied):
+            for attr, value in self.commands.popleft().items():
+                setattr(state, attr, value)
+        if applied:
+            self.publish(state)
+        return applied
+
+    def publish(self, state=None, changes=None):
+        """Poller side: publishes a snapshot of the state as the next frame. Fits PLCManager.subscribe."""
+        state = state if state is not None else self.state
+        version = self._latest[0] + 1
+        self._latest = (version, state.get_snapshot())
+
+    @property
+    def latest(self):
+        """The (version, frame) pair last published; the version grows by one per frame."""
+        return self._latest
+
+    def snapshot(self):
+        """The frame last published. Treat it as read-only: other readers share it."""
+        return self._latest[1]
+
+    def view(self):
+        """
+        A private copy of the latest frame for the UI thread to build views from. It shares ui_refs
+        with the live state, so the poller's repaints reach the controls it creates, and takes the
+        UI_SETTINGS from the live state.
+        """
+        view = self._latest[1].get_snapshot()
+        for name in UI_SETTINGS:
+            setattr(view, name, getattr(self.state, name))
+        view.ui_refs = self.state.ui_refs
+        return view
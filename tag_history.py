@@ -0,0 +1,196 @@
+# tag_history.py
+import datetime
+import threading
+import time
+from array import array
+from app_state import BOOL_TAGS, ANALOG_TAGS, bit_index
+from tag_registry import TAGS
+import scada_db as db
+
+DEFAULT_HORIZON = 2 * 3600.0
+# Enough for the horizon at 100 ms poll cycles, faster than any group period, even if
+# something changed on every cycle.
+DEFAULT_CAPACITY = int(DEFAULT_HORIZON / 0.1)
+# How far before an alarm pre_alarm_report looks, in seconds.
+PRE_ALARM_WINDOW = 600.0
+
+_BIT_BYTES = (len(BOOL_TAGS) + 7) // 8
+_ANALOG_INDEX = {tag: index for index, tag in enumerate(ANALOG_TAGS)}
+# For each bit position, a bytes.translate table that maps a byte to 1 when that bit is set, else 0.
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+
+class TagHistory:
+    """
+    Short-term history of every AppState tag in fixed memory. Each sample is a timestamp, a
+    copy of the bitset and a copy of the analogs, stored in flat ring buffers of `capacity`
+    samples; the oldest sample is overwritten once the ring is full. record(state, changes)
+    fits PLCManager.subscribe, so a sample is taken on every poll cycle that changed something,
+    which keeps every value at poll resolution. Queries ignore samples older than `horizon` seconds.
+    Samples are written by the poller thread; a lock keeps queries from other threads (the UI)
+    from reading a sample while it is being overwritten.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, horizon: float = DEFAULT_HORIZON, clock=time.time):
+        self.capacity = capacity
+        self.horizon = horizon
+        self.clock = clock
+        self.times = array('d', bytes(8 * capacity))
+        self.bits = bytearray(_BIT_BYTES * capacity)
+        self.analogs = array('i', bytes(4 * len(ANALOG_TAGS) * capacity))
+        self.head = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the ring buffers; fixed at construction."""
+        return (len(self.times) * self.times.itemsize + len(self.bits)
+                + len(self.analogs) * self.analogs.itemsize)
+
+    def __len__(self):
+        return self.count
+
+    def record(self, state, changes=None):
+        """Appends a sample of the state, overwriting the oldest one when the ring is full."""
+        analog_count = len(ANALOG_TAGS)
+        with self._lock:
+            slot = self.head
+            self.times[slot] = self.clock()
+            self.bits[slot * _BIT_BYTES:(slot + 1) * _BIT_BYTES] = state.bits
+            self.analogs[slot * analog_count:(slot + 1) * analog_count] = state.analogs
+            self.head = (slot + 1) % self.capacity
+            if self.count < self.capacity:
+                self.count += 1
+
+    def _time_at(self, index: int) -> float:
+        return self.times[(self.head - self.count + index) % self.capacity]
+
+    def _bisect(self, t: float) -> int:
+        """Logical index of the first sample taken at or after t."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._time_at(mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _window(self, since, until):
+        """Logical index range [lo, hi) of the samples between since and until, within the horizon."""
+        oldest = self.clock() - self.horizon
+        since = oldest if since is None else max(since, oldest)
+        lo = self._bisect(since)
+        hi = self.count if until is None else self._bisect(until + 1e-9)
+        return lo, max(lo, hi)
+
+    def _column(self, buffer, stride: int, offset: int, lo: int, hi: int):
+        """Logical samples lo..hi of one column of a flat ring buffer holding `stride` items per sample."""
+        first = (self.head - self.count + lo) % self.capacity
+        last = first + (hi - lo)
+        if last <= self.capacity:
+            return buffer[first * stride + offset:last * stride:stride]
+        return buffer[first * stride + offset::stride] + buffer[offset:(last - self.capacity) * stride:stride]
+
+    def _values(self, tag: str, lo: int, hi: int):
+        """The values of a tag in logical samples lo..hi: an array for analogs, bytes of 0/1 for boolean tags."""
+        if tag in _ANALOG_INDEX:
+            return self._column(self.analogs, len(ANALOG_TAGS), _ANALOG_INDEX[tag], lo, hi)
+        index = bit_index(tag)
+        return self._column(self.bits, _BIT_BYTES, index >> 3, lo, hi).translate(_BIT_TABLES[index & 7])
+
+    def series(self, tag: str, since: float = None, until: float = None):
+        """Every sample of a tag between since and until (epoch seconds) as (timestamp, value) pairs."""
+        with self._lock:
+            lo, hi = self._window(since, until)
+            values = self._values(tag, lo, hi)
+            times = self._column(self.times, 1, 0, lo, hi)
+        if tag not in _ANALOG_INDEX:
+            values = map(bool, values)
+        return list(zip(times, values))
+
+    def changes(self, tag: str, since: float = None, until: float = None):
+        """
+        The changes of a tag between since and until as (timestamp, new value) pairs, oldest first.
+        The sample before the window is the reference for the first one, so a change right at the
+        start of the window is reported.
+        """
+        with self._lock:
+            lo, hi = self._window(since, until)
+            if hi == lo:
+                return []
+            start = max(lo - 1, 0)
+            times = self._column(self.times, 1, 0, start, hi)
+            values = self._values(tag, start, hi)
+        if tag in _ANALOG_INDEX:
+            return [(times[i], values[i]) for i in range(1, len(values)) if values[i] != values[i - 1]]
+        # One byte per sample, 0 or 1: XOR with the same sequence shifted by one sample leaves
+        # a 1 exactly where the value changed, and bytes.find skips the runs of 0 in C.
+        flipped = int.from_bytes(values[1:], 'little') ^ int.from_bytes(values[:-1], 'little')
+        flipped = flipped.to_bytes(len(values) - 1, 'little')
+        found, position = [], flipped.find(1)
+        while position >= 0:
+            found.append((times[position + 1], bool(values[position + 1])))
+            position = flipped.find(1, position + 1)
+        return found
+
+    def value_at(self, tag: str, t: float):
+        """The value a tag had at time t, or None when t is before the oldest sample."""
+        with self._lock:
+            index = self._bisect(t + 1e-9) - 1
+            if index < 0:
+                return None
+            value = self._values(tag, index, index + 1)[0]
+        return value if tag in _ANALOG_INDEX else bool(value)
+
+    def pre_alarm_report(self, window: float = PRE_ALARM_WINDOW):
+        """
+        What the tags at the location of every active alarm did in the `window` seconds before it
+        fired, newest alarm first and oldest change first, as the (columns, rows, error) triple of
+        the scada_db query helpers.
+        """
+        columns, alarms, error = db.get_active_alarms()
+        if error:
+            return [], [], error
+        field = {column: index for index, column in enumerate(columns)}
+        rows = []
+        for alarm in alarms:
+            fired = datetime.datetime.fromisoformat(str(alarm[field['since']])).timestamp()
+            changes = [(t, tag, value) for tag in TAGS if tag.location == alarm[field['location']]
+                       for t, value in self.changes(tag.name, fired - window, fired)]
+            changes.sort(key=lambda change: change[0])
+            for t, tag, value in changes:
+                rows.append((alarm[field['id']], alarm[field['event']], alarm[field['location']], tag.name,
+                             datetime.datetime.fromtimestamp(t).strftime('%H:%M:%S.%f')[:-3],
+                             tag.scaled(value), round(fired - t, 1)))
+        return ['alarm', 'event', 'location', 'tag', 'changed at', 'value', 's before alarm'], rows, None
+
+
+def benchmark(capacity: int = DEFAULT_CAPACITY, flips_per_second: float = 10.0, window: float = 600.0):
+    """Fills a full ring with random flips at flips_per_second and times change queries over `window` seconds."""
+    import random
+    import timeit
+    from app_state import AppState
+
+    rng = random.Random(1)
+    clock = [0.0]
+    history = TagHistory(capacity, horizon=capacity / flips_per_second, clock=lambda: clock[0])
+    state, tags = AppState(), list(BOOL_TAGS)
+    for _ in range(capacity):
+        clock[0] += 1.0 / flips_per_second
+        tag = rng.choice(tags)
+        setattr(state, tag, not getattr(state, tag))
+        state.o3_temp = 700 + rng.randint(-5, 5)
+        history.record(state)
+    since = clock[0] - window
+    for tag in ('o1_smoke', 'o3_temp'):
+        runs = 200
+        elapsed = timeit.timeit(lambda: history.changes(tag, since), number=runs) / runs
+        print(f"{tag}: {len(history.changes(tag, since))} changes in the last {window:g} s of "
+              f"{len(history)} samples, {elapsed * 1e6:.0f} us per query")
+    print(f"ring buffers: {history.nbytes / 1024:.0f} KiB for {capacity} samples")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,206 @@
+# tag_registry.py
+# Every signal of the building is declared once here. plc_logic, app_state, event_logger and
+# ui_updater compile their read maps, bit layout, event masks and widget tables from TAGS.
+
+
+class Icon:
+    """
+    A dashboard icon bound to a boolean tag. Icons and colours are flet attribute names
+    (ft.Icons.<on_icon>, ft.Colors.<on_color>) so this module does not import flet; tooltips are
+    TEXTS keys. invert shows the "on" look while the tag is False.
+    """
+
+    def __init__(self, ref: str, on_icon: str, off_icon: str, on_color: str, on_tooltip: str,
+                 off_tooltip: str, invert: bool = False):
+        self.ref = ref
+        self.on_icon = on_icon
+        self.off_icon = off_icon
+        self.on_color = on_color
+        self.on_tooltip = on_tooltip
+        self.off_tooltip = off_tooltip
+        self.invert = invert
+
+
+class Tag:
+    """
+    One signal: where the PLC keeps it (coil or holding register, None for app-only tags),
+    its default, the poll group that reads it, the location it belongs to, the event it logs
+    (event when set, event_off when cleared, momentary events are logged already resolved),
+    its role in the room alarm colours ('smoke' or 'intrusion') and its dashboard icon.
+    Register tags are integers; scale=(factor, offset) converts the raw value for display, and
+    compression=(deadband, deviation), in raw units, has the analog historian record the tag.
+    """
+
+    def __init__(self, name: str, coil: int = None, register: int = None, default=None, group: str = None,
+                 location: str = None, event: str = None, event_off: str = None, momentary: bool = False,
+                 alarm: str = None, scale=None, icon: Icon = None, compression=None):
+        self.name = name
+        self.coil = coil
+        self.register = register
+        self.kind = 'int' if register is not None else 'bool'
+        self.default = default if default is not None else (0 if self.kind == 'int' else False)
+        self.group = group
+        self.location = location
+        self.event = event
+        self.event_off = event_off
+        self.momentary = momentary
+        self.alarm = alarm
+        self.scale = scale
+        self.icon = icon
+        self.compression = compression
+
+    def scaled(self, raw):
+        """The raw value converted to engineering units with `scale`."""
+        if self.scale is None:
+            return raw
+        factor, offset = self.scale
+        return raw * factor + offset
+
+
+def _movement(ref):
+    return Icon(ref, 'PERSON', 'PERSON_OUTLINE', 'BLUE_ACCENT', 'movement_detected', 'no_movement')
+
+
+def _smoke(ref, color='ORANGE'):
+    return Icon(ref, 'LOCAL_FIRE_DEPARTMENT', 'LOCAL_FIRE_DEPARTMENT_OUTLINED', color, 'smoke_detected', 'no_smoke')
+
+
+def _light(ref, color='YELLOW'):
+    return Icon(ref, 'LIGHTBULB', 'LIGHTBULB_OUTLINE', color, 'light_on', 'light_off')
+
+
+def _door(ref):
+    return Icon(ref, 'DOOR_FRONT_DOOR', 'DOOR_FRONT_DOOR_OUTLINED', 'RED_ACCENT', 'door_open', 'door_closed_tooltip')
+
+
+def _rfid(ref):
+    return Icon(ref, 'LOCK_PERSON', 'LOCK_PERSON_OUTLINED', 'GREEN_ACCENT', 'rfid_accepted', 'no_card')
+
+
+# The order of the boolean tags is the bit layout of AppState.bits.
+TAGS = [
+    # Link status, maintained by the PLC managers.
+    Tag('plc_connected'), Tag('data_stale'), Tag('config_altered'),
+
+    Tag('l_mvmnt', coil=212, group='occupancy', location='Lobby', alarm='intrusion', icon=_movement('l_mvmnt_icon')),
+    Tag('l_smoke', coil=221, group='alarms', location='Lobby', event='fire_detected', alarm='smoke',
+        icon=_smoke('l_smoke_icon', 'ORANGE_ACCENT')),
+    Tag('l_light', coil=234, group='occupancy', location='Lobby', icon=_light('l_light_icon')),
+    Tag('l_door_open', coil=202, group='occupancy', location='Lobby', alarm='intrusion', icon=_door('l_door_icon')),
+    Tag('l_rfid_ok', coil=226, group='occupancy', location='Lobby', icon=_rfid('l_rfid_icon')),
+    Tag('l_security', coil=215, group='alarms', location='Lobby',
+        event='alarm_was_activated', event_off='alarm_was_deactivated',
+        icon=Icon('l_sec_icon', 'SHIELD', 'SHIELD_OUTLINED', 'BLUE_ACCENT', 'security_active', 'security_inactive')),
+
+    Tag('o1_smoke', coil=218, group='alarms', location='Office 1', event='fire_detected', alarm='smoke',
+        icon=_smoke('o1_smoke_icon')),
+    Tag('o1_mvmnt', coil=214, group='occupancy', location='Office 1', alarm='intrusion',
+        icon=_movement('o1_mvmnt_icon')),
+    Tag('o1_door_open', coil=203, group='occupancy', location='Office 1', alarm='intrusion',
+        icon=_door('o1_door_icon')),
+    Tag('o1_rfid_ok', coil=227, group='occupancy', location='Office 1', icon=_rfid('o1_rfid_icon')),
+
+    Tag('o2_smoke', coil=219, group='alarms', location='Office 2', event='fire_detected', alarm='smoke',
+        icon=_smoke('o2_smoke_icon')),
+    Tag('o2_mvmnt', coil=214, group='occupancy', location='Office 2', alarm='intrusion',
+        icon=_movement('o2_mvmnt_icon')),
+    Tag('o2_door_open', coil=204, group='occupancy', location='Office 2', alarm='intrusion',
+        icon=_door('o2_door_icon')),
+    Tag('o2_rfid_ok', coil=228, group='occupancy', location='Office 2', icon=_rfid('o2_rfid_icon')),
+
+    Tag('c1_smoke', coil=222, group='alarms', location='Corridor 1', event='fire_detected', alarm='smoke',
+        icon=_smoke('c1_smoke_icon')),
+    Tag('c1_mvmnt', coil=213, group='occupancy', location='Corridor 1', alarm='intrusion',
+        icon=_movement('c1_mvmnt_icon')),
+    Tag('c1_light', coil=235, group='occupancy', location='Corridor 1', icon=_light('c1_light_icon', 'YELLOW_ACCENT')),
+
+    Tag('o3_smoke', coil=220, group='alarms', location='Office 3', event='fire_detected', alarm='smoke',
+        icon=_smoke('o3_smoke_icon')),
+    Tag('o3_mvmnt', coil=214, group='occupancy', location='Office 3', alarm='intrusion',
+        icon=_movement('o3_mvmnt_icon')),
+    Tag('o3_door_open', coil=205, group='occupancy', location='Office 3', alarm='intrusion',
+        icon=_door('o3_door_icon')),
+    Tag('o3_rfid_ok', coil=229, group='occupancy', location='Office 3', icon=_rfid('o3_rfid_icon')),
+    Tag('o3_heating', coil=232, group='status', location='Office 3',
+        icon=Icon('o3_heating_icon', 'WB_SUNNY_ROUNDED', 'WB_SUNNY_OUTLINED', 'YELLOW_700', 'heating_on', 'heating_off')),
+    Tag('o3_cooling', coil=233, group='status', location='Office 3',
+        icon=Icon('o3_cooling_icon', 'AC_UNIT', 'AC_UNIT_OUTLINED', 'LIGHT_BLUE_ACCENT_400', 'cooling_on', 'cooling_off')),
+
+    Tag('c2_smoke', coil=223, group='alarms', location='Corridor 2', event='fire_detected', alarm='smoke',
+        icon=_smoke('c2_smoke_icon')),
+    Tag('c2_mvmnt', coil=213, group='occupancy', location='Corridor 2', alarm='intrusion',
+        icon=_movement('c2_mvmnt_icon')),
+    Tag('c2_light', coil=235, group='occupancy', location='Corridor 2', icon=_light('c2_light_icon')),
+
+    Tag('p_obj_det', coil=208, group='occupancy', location='Parking lot',
+        icon=Icon('p_obj_icon', 'CAR_CRASH', 'CAR_CRASH_OUTLINED', 'YELLOW', 'object_in_front', 'no_object')),
+    Tag('p_gate_open', coil=230, group='occupancy', location='Parking lot',
+        icon=Icon('p_open_icon', 'ARROW_CIRCLE_LEFT', 'ARROW_CIRCLE_LEFT_OUTLINED', 'GREEN_ACCENT',
+                  'opening_gate', 'gate_not_opening')),
+    Tag('p_gate_closed', coil=207, default=True, group='occupancy', location='Parking lot',
+        icon=Icon('p_closed_icon', 'GARAGE', 'GARAGE_OUTLINED', 'RED_ACCENT', 'gate_not_closed',
+                  'gate_closed_tooltip', invert=True)),
+    Tag('p_gate_close', coil=231, group='occupancy', location='Parking lot',
+        icon=Icon('p_close_icon', 'ARROW_CIRCLE_RIGHT', 'ARROW_CIRCLE_RIGHT_OUTLINED', 'RED_ACCENT',
+                  'closing_gate', 'gate_not_closing')),
+    Tag('p_inside_cycle', coil=13, group='occupancy', location='Parking lot',
+        icon=Icon('p_rfid_icon', 'RADIO_BUTTON_CHECKED', 'RADIO_BUTTON_OFF', 'GREEN_ACCENT',
+                  'button_pressed_inside', 'button_not_pressed_inside')),
+    Tag('p_outside_cycle', coil=14, group='occupancy', location='Parking lot',
+        icon=Icon('p_inside_btn_icon', 'LOCK_PERSON', 'LOCK_PERSON_OUTLINED', 'GREEN_ACCENT',
+                  'rfid_accepted_outside', 'no_card_outside')),
+    Tag('p_full_bulb', coil=239, group='occupancy', location='Parking lot'),
+
+    # Operator commands, set from the UI and written to the PLC.
+    Tag('force_lobby_door', location='Lobby'),
+    Tag('force_park_open', location='Parking lot', event='parking_lot_was_forced_open'),
+    Tag('force_park_close', location='Parking lot', event='parking_lot_was_forced_closed'),
+
+    Tag('warn_config_altered', coil=495, group='status', location='System', event='config_altered'),
+    Tag('warn_auto_security_impossible', coil=496, group='status', location='System',
+        event='auto_security_impossible'),
+    Tag('warn_fire_det', coil=497, group='alarms', location='System', event='fire_detected'),
+    Tag('warn_pgate_open', coil=498, group='status', location='Parking lot', event='parking_gate_open_warning'),
+    Tag('warn_pspot_miscount', coil=499, group='status', location='Parking lot', event='parking_spot_miscount'),
+    Tag('err_light_config', coil=505, group='status', location='System', event='light_config_error'),
+    Tag('err_pgate_force', coil=506, group='status', location='Parking lot', event='parking_gate_forced_error'),
+    Tag('err_pspot_config', coil=507, group='status', location='Parking lot', event='parking_spot_config_error'),
+    Tag('err_temp_config', coil=508, group='status', location='System', event='temp_config_error'),
+    Tag('err_work_day_config', coil=509, group='status', location='System', event='work_day_config_error'),
+    Tag('err_cold_month_config', coil=510, group='status', location='System', event='cold_month_config_error'),
+
+    Tag('call_security', coil=237, group='alarms', location='System', event='security_was_called', momentary=True),
+    Tag('call_fire_dept', coil=238, group='alarms', location='System', event='fire_dept_was_called',
+        momentary=True),
+    Tag('fire_sprinklers_on', coil=236, group='alarms', location='System'),
+    Tag('emergency', coil=511, group='alarms', location='System', event='emergency_happened', momentary=True),
+
+    Tag('o3_temp', register=200, group='analogs', location='Office 3', scale=(0.1, -50.0), compression=(1, 2)),
+    Tag('p_spots_total', register=8, group='analogs', location='Parking lot', compression=(0, 0)),
+    Tag('p_spots_taken', register=9, group='occupancy', location='Parking lot', compression=(0, 0)),
+    Tag('measured_light', register=201, group='analogs', location='System', compression=(0, 1)),
+]
+TAGS_BY_NAME = {tag.name: tag for tag in TAGS}
+
+# The boolean tag that arms intrusion detection for the 'intrusion' tags.
+SECURITY_TAG = 'l_security'
+
+
+def coil_map() -> dict:
+    """{tag: coil address} of every tag read from a coil."""
+    return {tag.name: tag.coil for tag in TAGS if tag.coil is not None}
+
+
+def register_map() -> dict:
+    """{tag: register address} of every tag read from a holding register."""
+    return {tag.name: tag.register for tag in TAGS if tag.register is not None}
+
+
+def group_tags(group: str) -> list:
+    """Names of the tags polled by a group, in declaration order."""
+    return [tag.name for tag in TAGS if tag.group == group]
+
+
+def locations() -> list:
+    """Every location that has a tag, in declaration order."""
+    return list(dict.fromkeys(tag.location for tag in TAGS if tag.location))
@@ -531,26 +531,29 @@ def create_config_view(page, state, get_text, handlers):
          'cfg_force_close_switch': cfg_parking_closed_switch})
 
     def on_submit_plc_config(e):
-        state.cfg_work_start, state.cfg_work_end = validate_sensor_number(work_start_field), validate_sensor_number(
-            work_end_field)
-        state.cfg_cold_start, state.cfg_cold_end = validate_sensor_number(cold_start_field), validate_sensor_number(
-            cold_end_field)
-
-        state.cfg_work_temp = validate_temp(work_temp_field)
-        state.cfg_non_work_temp = validate_temp(non_work_temp_field)
         tolerance_value = validate_temp_tol(temp_tol_field)
-        state.cfg_work_temp_tol = tolerance_value
-        state.cfg_non_work_temp_tol = tolerance_value
-        state.p_spots_taken = int(validate_sensor_number(cfg_pspots_taken_field))
-        state.cfg_park_spots, state.p_spots_total = validate_sensor_number(park_spots_field), int(
-            validate_sensor_number(park_spots_field))
-        state.cfg_max_park_spots = validate_sensor_number(max_spots_field)
-        state.cfg_light_thresh, state.cfg_light_tol = validate_lux(light_thresh_field), validate_lux(light_tol_field)
-        state.cfg_work_days = [cb.value for cb in work_days_controls]
-        state.cfg_heat_off_days, state.cfg_auto_lights_lobby, state.cfg_wdonly_lights_l = heating_off_days_switch.value, lobby_auto_switch.value, wd_only_lobby_switch.value
-        state.cfg_lobby_lights_mode, state.cfg_auto_lights_bldg, state.cfg_wdonly_lights_b = lobby_lights_radiogroup.value, building_auto_switch.value, wd_only_bldg_switch.value
-        state.cfg_bldg_lights_mode, state.cfg_sim_io, state.cfg_test_fire, state.cfg_test_security = building_lights_radiogroup.value, sim_io_switch.value, test_fire_switch.value, test_security_switch.value
-        state.config_altered = True
+        park_spots = validate_sensor_number(park_spots_field)
+        handlers['on_submit_plc_config']({
+            'cfg_work_start': validate_sensor_number(work_start_field),
+            'cfg_work_end': validate_sensor_number(work_end_field),
+            'cfg_cold_start': validate_sensor_number(cold_start_field),
+            'cfg_cold_end': validate_sensor_number(cold_end_field),
+            'cfg_work_temp': validate_temp(work_temp_field),
+            'cfg_non_work_temp': validate_temp(non_work_temp_field),
+            'cfg_work_temp_tol': tolerance_value, 'cfg_non_work_temp_tol': tolerance_value,
+            'p_spots_taken': int(validate_sensor_number(cfg_pspots_taken_field)),
+            'cfg_park_spots': park_spots, 'p_spots_total': int(park_spots),
+            'cfg_max_park_spots': validate_sensor_number(max_spots_field),
+            'cfg_light_thresh': validate_lux(light_thresh_field), 'cfg_light_tol': validate_lux(light_tol_field),
+            'cfg_work_days': [cb.value for cb in work_days_controls],
+            'cfg_heat_off_days': heating_off_days_switch.value,
+            'cfg_auto_lights_lobby': lobby_auto_switch.value, 'cfg_wdonly_lights_l': wd_only_lobby_switch.value,
+            'cfg_lobby_lights_mode': lobby_lights_radiogroup.value,
+            'cfg_auto_lights_bldg': building_auto_switch.value, 'cfg_wdonly_lights_b': wd_only_bldg_switch.value,
+            'cfg_bldg_lights_mode': building_lights_radiogroup.value,
+            'cfg_sim_io': sim_io_switch.value, 'cfg_test_fire': test_fire_switch.value,
+            'cfg_test_security': test_security_switch.value,
+        })
 
     submit_button = ft.ElevatedButton(get_text("submit_changes"), icon=ft.Icons.SAVE, on_click=on_submit_plc_config,
                                       width=300, style=ft.ButtonStyle(color=ft.Colors.GREEN))
@@ -593,7 +596,18 @@ def create_config_view(page, state, get_text, handlers):
                                   style=ft.ButtonStyle(color=ft.Colors.GREEN), expand=True,
                                   on_click=lambda e: handle_db_query(e, query_str=sql_query_field.value)),
                 ft.ElevatedButton(get_text("view_log"), icon=ft.Icons.TABLE_CHART, expand=True,
-                                  on_click=lambda e: handle_db_query(e, query_func=db.get_logs))]),
+                                  on_click=lambda e: handle_db_query(e, query_func=db.get_logs)),
+                ft.ElevatedButton(get_text("view_active_alarms"), icon=ft.Icons.NOTIFICATIONS_ACTIVE,
+                                  expand=True,
+                                  on_click=lambda e: handle_db_query(e, query_func=db.get_active_alarms)),
+                ft.ElevatedButton(get_text("view_pre_alarm_changes"), icon=ft.Icons.HISTORY, expand=True,
+                                  on_click=lambda e: handle_db_query(e, query_func=handlers['pre_alarm_changes']))]),
+        ft.Row([ft.ElevatedButton(get_text("view_daily_summary"), icon=ft.Icons.CALENDAR_MONTH, expand=True,
+                                  on_click=lambda e: handle_db_query(e, query_func=db.get_daily_summary)),
+                ft.ElevatedButton(get_text("view_unknown_cards"), icon=ft.Icons.CREDIT_CARD_OFF, expand=True,
+                                  on_click=lambda e: handle_db_query(e, query_func=db.get_unknown_cards)),
+                ft.ElevatedButton(get_text("view_analog_trends"), icon=ft.Icons.SHOW_CHART, expand=True,
+                                  on_click=lambda e: handle_db_query(e, query_func=handlers['analog_trends']))]),
         ft.Row([ft.ElevatedButton(get_text("view_people"), icon=ft.Icons.PEOPLE, expand=True,
                                   on_click=lambda e: handle_db_query(e, query_func=db.get_people)),
                 ft.ElevatedButton(get_text("view_cards"), icon=ft.Icons.CREDIT_CARD, expand=True,
@@ -1,5 +1,40 @@
 import flet as ft
 from definitions import ALERT_TEXTS, ALERT_DEFS
+from tag_registry import TAGS, TAGS_BY_NAME, SECURITY_TAG
+
+# Background of each room container when it shows no alarm.
+ROOM_CONTAINERS = {
+    'Lobby': ('lobby_container', ft.Colors.TRANSPARENT),
+    'Office 1': ('o1_container', ft.Colors.TRANSPARENT),
+    'Office 2': ('o2_container', ft.Colors.with_opacity(0.13, ft.Colors.INVERSE_PRIMARY)),
+    'Corridor 1': ('c1_container', ft.Colors.ON_INVERSE_SURFACE),
+    'Office 3': ('o3_container', ft.Colors.TRANSPARENT),
+    'Corridor 2': ('c2_container', ft.Colors.ON_INVERSE_SURFACE),
+}
+# The tags that turn each room red: location -> (smoke tags, intrusion tags). Written out rather than
+# derived from the registry so a registry edit cannot move a room onto another room's sensors.
+# Office 3 follows its own door (o3_door_open, coil 205); it used to follow Office 2's (o2_door_open).
+ROOM_ALARM_TAGS = {
+    'Lobby': (['l_smoke'], ['l_mvmnt', 'l_door_open']),
+    'Office 1': (['o1_smoke'], ['o1_mvmnt', 'o1_door_open']),
+    'Office 2': (['o2_smoke'], ['o2_mvmnt', 'o2_door_open']),
+    'Corridor 1': (['c1_smoke'], ['c1_mvmnt']),
+    'Office 3': (['o3_smoke'], ['o3_mvmnt', 'o3_door_open']),
+    'Corridor 2': (['c2_smoke'], ['c2_mvmnt']),
+}
+# Compiled from the registry: tag -> (ref, on_icon, off_icon, on_color, on_tooltip, off_tooltip, invert),
+# and the rooms to recolour when a tag changes.
+ICON_BINDINGS = {
+    tag.name: (tag.icon.ref, getattr(ft.Icons, tag.icon.on_icon), getattr(ft.Icons, tag.icon.off_icon),
+               getattr(ft.Colors, tag.icon.on_color), tag.icon.on_tooltip, tag.icon.off_tooltip, tag.icon.invert)
+    for tag in TAGS if tag.icon
+}
+ROOMS_BY_TAG = {SECURITY_TAG: list(ROOM_CONTAINERS)}
+for _location, (_smoke_tags, _intrusion_tags) in ROOM_ALARM_TAGS.items():
+    for _tag in _smoke_tags + _intrusion_tags:
+        ROOMS_BY_TAG.setdefault(_tag, []).append(_location)
+ALERT_TAGS = {state_key for _, state_key, _, _, _ in ALERT_DEFS}
+ALL_TAGS = set(TAGS_BY_NAME)
 
 
 def update_icon(key, state, status, on_icon, off_icon, on_color, on_tooltip, off_tooltip):
@@ -23,120 +58,62 @@ def update_app_bar(state, get_text):
         is_connected = state.plc_connected
         plc_icon.icon = ft.Icons.PHONELINK if is_connected else ft.Icons.PHONELINK_OFF
         plc_icon.icon_color = ft.Colors.GREEN_ACCENT_700 if is_connected else ft.Colors.RED_ACCENT
-        plc_icon.tooltip = get_text("plc_connected") if is_connected else get_text("plc_disconnected")
+        if is_connected:
+            plc_icon.tooltip = get_text("plc_connected")
+        else:
+            plc_icon.tooltip = get_text("plc_disconnected_stale" if state.data_stale else "plc_disconnected")
 
 
-def update_dashboard_ui(state, get_text):
-    """Updates all dynamic controls on the dashboard view."""
+def update_room(state, location):
+    """Paints a room red while it has smoke, or movement or an open door with security armed."""
+    key, idle_color = ROOM_CONTAINERS[location]
+    if key not in state.ui_refs:
+        return
+    smoke_tags, intrusion_tags = ROOM_ALARM_TAGS[location]
+    alarm = any(getattr(state, tag) for tag in smoke_tags) or (
+        getattr(state, SECURITY_TAG) and any(getattr(state, tag) for tag in intrusion_tags))
+    for ctrl in state.ui_refs[key]:
+        ctrl.bgcolor = ft.Colors.RED_600 if alarm else idle_color
+
+
+def update_dashboard_ui(state, get_text, changes=None):
+    """
+    Updates the dynamic controls on the dashboard view: all of them, or with a ChangeSet only
+    the ones bound to a changed tag.
+    """
     if not state.ui_refs:
         return
+    changed = ALL_TAGS if changes is None else set(changes.tags())
 
     if 'force_open_switch' in state.ui_refs:
         state.ui_refs['force_open_switch'].value = state.force_park_open
     if 'force_close_switch' in state.ui_refs:
         state.ui_refs['force_close_switch'].value = state.force_park_close
 
-    alarm_on = state.l_security
-    l_color = ft.Colors.RED_600 if state.l_smoke or ((state.l_mvmnt or state.l_door_open) and alarm_on) else ft.Colors.TRANSPARENT
-    o1_color = ft.Colors.RED_600 if state.o1_smoke or ((state.o1_mvmnt or state.o1_door_open) and alarm_on) else ft.Colors.TRANSPARENT
-    o2_color = ft.Colors.RED_600 if state.o2_smoke or ((state.o2_mvmnt or state.o2_door_open) and alarm_on) else ft.Colors.with_opacity(0.13, ft.Colors.INVERSE_PRIMARY)
-    c1_color = ft.Colors.RED_600 if state.c1_smoke or (state.c2_mvmnt and alarm_on) else ft.Colors.ON_INVERSE_SURFACE
-    o3_color = ft.Colors.RED_600 if state.o3_smoke or ((state.o2_mvmnt or state.o2_door_open) and alarm_on) else ft.Colors.TRANSPARENT
-    c2_color = ft.Colors.RED_600 if state.c2_smoke or (state.c2_mvmnt and alarm_on) else ft.Colors.ON_INVERSE_SURFACE
-
-    for key, color in [('o1_container', o1_color), ('o2_container', o2_color), ('c1_container', c1_color),
-                       ('lobby_container', l_color), ('o3_container', o3_color), ('c2_container', c2_color)]:
-        if key in state.ui_refs:
-            for ctrl in state.ui_refs[key]:
-                ctrl.bgcolor = color
-
-    update_icon('l_mvmnt_icon', state, state.l_mvmnt, ft.Icons.PERSON, ft.Icons.PERSON_OUTLINE,
-                ft.Colors.BLUE_ACCENT, get_text("movement_detected"), get_text("no_movement"))
-    update_icon('l_smoke_icon', state, state.l_smoke, ft.Icons.LOCAL_FIRE_DEPARTMENT,
-                ft.Icons.LOCAL_FIRE_DEPARTMENT_OUTLINED, ft.Colors.ORANGE_ACCENT, get_text("smoke_detected"),
-                get_text("no_smoke"))
-    update_icon('l_light_icon', state, state.l_light, ft.Icons.LIGHTBULB, ft.Icons.LIGHTBULB_OUTLINE,
-                ft.Colors.YELLOW, get_text("light_on"), get_text("light_off"))
-    update_icon('l_door_icon', state, state.l_door_open, ft.Icons.DOOR_FRONT_DOOR, ft.Icons.DOOR_FRONT_DOOR_OUTLINED,
-                ft.Colors.RED_ACCENT, get_text("door_open"), get_text("door_closed_tooltip"))
-    update_icon('l_rfid_icon', state, state.l_rfid_ok, ft.Icons.LOCK_PERSON, ft.Icons.LOCK_PERSON_OUTLINED,
-                ft.Colors.GREEN_ACCENT, get_text("rfid_accepted"), get_text("no_card"))
-    update_icon('l_sec_icon', state, state.l_security, ft.Icons.SHIELD, ft.Icons.SHIELD_OUTLINED,
-                ft.Colors.BLUE_ACCENT, get_text("security_active"), get_text("security_inactive"))
-    update_icon('o1_mvmnt_icon', state, state.o1_mvmnt, ft.Icons.PERSON, ft.Icons.PERSON_OUTLINE,
-                ft.Colors.BLUE_ACCENT, get_text("movement_detected"), get_text("no_movement"))
-    update_icon('o1_smoke_icon', state, state.o1_smoke, ft.Icons.LOCAL_FIRE_DEPARTMENT,
-                ft.Icons.LOCAL_FIRE_DEPARTMENT_OUTLINED, ft.Colors.ORANGE, get_text("smoke_detected"),
-                get_text("no_smoke"))
-    update_icon('o1_door_icon', state, state.o1_door_open, ft.Icons.DOOR_FRONT_DOOR, ft.Icons.DOOR_FRONT_DOOR_OUTLINED,
-                ft.Colors.RED_ACCENT, get_text("door_open"), get_text("door_closed_tooltip"))
-    update_icon('o1_rfid_icon', state, state.o1_rfid_ok, ft.Icons.LOCK_PERSON, ft.Icons.LOCK_PERSON_OUTLINED,
-                ft.Colors.GREEN_ACCENT, get_text("rfid_accepted"), get_text("no_card"))
-    update_icon('o2_mvmnt_icon', state, state.o2_mvmnt, ft.Icons.PERSON, ft.Icons.PERSON_OUTLINE,
-                ft.Colors.BLUE_ACCENT, get_text("movement_detected"), get_text("no_movement"))
-    update_icon('o2_smoke_icon', state, state.o2_smoke, ft.Icons.LOCAL_FIRE_DEPARTMENT,
-                ft.Icons.LOCAL_FIRE_DEPARTMENT_OUTLINED, ft.Colors.ORANGE, get_text("smoke_detected"),
-                get_text("no_smoke"))
-    update_icon('o2_door_icon', state, state.o2_door_open, ft.Icons.DOOR_FRONT_DOOR, ft.Icons.DOOR_FRONT_DOOR_OUTLINED,
-                ft.Colors.RED_ACCENT, get_text("door_open"), get_text("door_closed_tooltip"))
-    update_icon('o2_rfid_icon', state, state.o2_rfid_ok, ft.Icons.LOCK_PERSON, ft.Icons.LOCK_PERSON_OUTLINED,
-                ft.Colors.GREEN_ACCENT, get_text("rfid_accepted"), get_text("no_card"))
-    update_icon('c1_mvmnt_icon', state, state.c1_mvmnt, ft.Icons.PERSON, ft.Icons.PERSON_OUTLINE,
-                ft.Colors.BLUE_ACCENT, get_text("movement_detected"), get_text("no_movement"))
-    update_icon('c1_smoke_icon', state, state.c1_smoke, ft.Icons.LOCAL_FIRE_DEPARTMENT,
-                ft.Icons.LOCAL_FIRE_DEPARTMENT_OUTLINED, ft.Colors.ORANGE, get_text("smoke_detected"),
-                get_text("no_smoke"))
-    update_icon('c1_light_icon', state, state.c1_light, ft.Icons.LIGHTBULB, ft.Icons.LIGHTBULB_OUTLINE,
-                ft.Colors.YELLOW_ACCENT, get_text("light_on"), get_text("light_off"))
-    update_icon('o3_mvmnt_icon', state, state.o3_mvmnt, ft.Icons.PERSON, ft.Icons.PERSON_OUTLINE,
-                ft.Colors.BLUE_ACCENT, get_text("movement_detected"), get_text("no_movement"))
-    update_icon('o3_smoke_icon', state, state.o3_smoke, ft.Icons.LOCAL_FIRE_DEPARTMENT,
-                ft.Icons.LOCAL_FIRE_DEPARTMENT_OUTLINED, ft.Colors.ORANGE, get_text("smoke_detected"),
-                get_text("no_smoke"))
-    update_icon('o3_door_icon', state, state.o3_door_open, ft.Icons.DOOR_FRONT_DOOR, ft.Icons.DOOR_FRONT_DOOR_OUTLINED,
-                ft.Colors.RED_ACCENT, get_text("door_open"), get_text("door_closed_tooltip"))
-    update_icon('o3_rfid_icon', state, state.o3_rfid_ok, ft.Icons.LOCK_PERSON, ft.Icons.LOCK_PERSON_OUTLINED,
-                ft.Colors.GREEN_ACCENT, get_text("rfid_accepted"), get_text("no_card"))
-    update_icon('o3_heating_icon', state, state.o3_heating, ft.Icons.WB_SUNNY_ROUNDED, ft.Icons.WB_SUNNY_OUTLINED,
-                ft.Colors.YELLOW_700, get_text("heating_on"), get_text("heating_off"))
-    update_icon('o3_cooling_icon', state, state.o3_cooling, ft.Icons.AC_UNIT, ft.Icons.AC_UNIT_OUTLINED,
-                ft.Colors.LIGHT_BLUE_ACCENT_400, get_text("cooling_on"), get_text("cooling_off"))
+    rooms = dict.fromkeys(location for tag in changed for location in ROOMS_BY_TAG.get(tag, ()))
+    for location in rooms:
+        update_room(state, location)
+
+    for tag in changed:
+        binding = ICON_BINDINGS.get(tag)
+        if binding:
+            key, on_icon, off_icon, on_color, on_tooltip, off_tooltip, invert = binding
+            update_icon(key, state, getattr(state, tag) != invert, on_icon, off_icon, on_color,
+                        get_text(on_tooltip), get_text(off_tooltip))
+
     temp_text_ctrl = state.ui_refs.get('o3_temp_text')
-    if temp_text_ctrl:
-        celsius_temp = (state.o3_temp / 10.0) - 50.0
+    if temp_text_ctrl and 'o3_temp' in changed:
+        celsius_temp = TAGS_BY_NAME['o3_temp'].scaled(state.o3_temp)
         temp_text_ctrl.value = f"{celsius_temp:.1f}°C"
-    update_icon('c2_mvmnt_icon', state, state.c2_mvmnt, ft.Icons.PERSON, ft.Icons.PERSON_OUTLINE,
-                ft.Colors.BLUE_ACCENT, get_text("movement_detected"), get_text("no_movement"))
-    update_icon('c2_smoke_icon', state, state.c2_smoke, ft.Icons.LOCAL_FIRE_DEPARTMENT,
-                ft.Icons.LOCAL_FIRE_DEPARTMENT_OUTLINED, ft.Colors.ORANGE, get_text("smoke_detected"),
-                get_text("no_smoke"))
-    update_icon('c2_light_icon', state, state.c2_light, ft.Icons.LIGHTBULB, ft.Icons.LIGHTBULB_OUTLINE,
-                ft.Colors.YELLOW, get_text("light_on"), get_text("light_off"))
     spots_text_ctrl = state.ui_refs.get('p_spots_text')
-    if spots_text_ctrl:
+    if spots_text_ctrl and not changed.isdisjoint(('p_spots_taken', 'p_spots_total', 'p_full_bulb')):
         spots_text_ctrl.value = f"{state.p_spots_taken}/{state.p_spots_total}"
         spots_text_ctrl.color = ft.Colors.RED_ACCENT if state.p_full_bulb else ft.Colors.ON_SURFACE
     spots_textfield_ctrl = state.ui_refs.get('pspots_taken_field')
     if spots_textfield_ctrl and not spots_textfield_ctrl.focus:
         spots_textfield_ctrl.value = str(state.p_spots_taken)
-    update_icon('p_obj_icon', state, state.p_obj_det, ft.Icons.CAR_CRASH, ft.Icons.CAR_CRASH_OUTLINED,
-                ft.Colors.YELLOW, get_text("object_in_front"), get_text("no_object"))
-    update_icon('p_open_icon', state, state.p_gate_open, ft.Icons.ARROW_CIRCLE_LEFT,
-                ft.Icons.ARROW_CIRCLE_LEFT_OUTLINED, ft.Colors.GREEN_ACCENT, get_text("opening_gate"),
-                get_text("gate_not_opening"))
-    update_icon('p_closed_icon', state, not state.p_gate_closed, ft.Icons.GARAGE, ft.Icons.GARAGE_OUTLINED,
-                ft.Colors.RED_ACCENT, get_text("gate_not_closed"), get_text("gate_closed_tooltip"))
-    update_icon('p_close_icon', state, state.p_gate_close, ft.Icons.ARROW_CIRCLE_RIGHT,
-                ft.Icons.ARROW_CIRCLE_RIGHT_OUTLINED, ft.Colors.RED_ACCENT, get_text("closing_gate"),
-                get_text("gate_not_closing"))
-    update_icon('p_inside_btn_icon', state, state.p_outside_cycle, ft.Icons.LOCK_PERSON,
-                ft.Icons.LOCK_PERSON_OUTLINED, ft.Colors.GREEN_ACCENT, get_text("rfid_accepted_outside"),
-                get_text("no_card_outside"))
-    update_icon('p_rfid_icon', state, state.p_inside_cycle, ft.Icons.RADIO_BUTTON_CHECKED,
-                ft.Icons.RADIO_BUTTON_OFF, ft.Colors.GREEN_ACCENT, get_text("button_pressed_inside"),
-                get_text("button_not_pressed_inside"))
     alerts_cont = state.ui_refs.get('alerts_container')
-    if alerts_cont:
+    if alerts_cont and not changed.isdisjoint(ALERT_TAGS):
         alert_texts = ALERT_TEXTS[state.lang]
         alerts_definition = [
             (p, state_key, alert_texts[text_key], i, c)